@@ -17,6 +17,7 @@ pio.renderers.default = "svg"
 import sys
 
 sys.path.append("../../code/evaluation")
+sys.path.append("../../code/preprocessing")
 
 from scoring import (
     outside_interval,
@@ -27,12 +28,17 @@ from scoring import (
     mape_score,
     confidence_to_predictive,
 )
+from storage import read_delay_store
 
 
 # ### Load ground truth
 
 data_status = "2020-05-06"
-truth_df = pd.read_pickle(f"../../data/processed/delay_{data_status}_imputation_01.pl")
+truth_df = read_delay_store(
+    f"../../data/processed/delay_{data_status}_imputed.parquet",
+    columns=["date_onset", "imputed"],
+    imputations=["original", "imputation_01"],
+)
 truth_df = (
     truth_df.groupby(["date_onset", "imputed"])
     .size()
@@ -17,9 +17,16 @@ import plotly.io as pio
 pio.renderers.default = "svg"
 
 
+# Import own code from other directory
+import sys
+sys.path.append("../../code/preprocessing")
+
+from storage import read_delay_store
+
+
 # ## Data Loading and Preparation
 
-delay = pd.read_pickle("../../data/processed/delay.pl")
+delay = read_delay_store("../../data/processed/delay.parquet")
 
 
 # #### Summarize all observations which do not have known or binary gender
@@ -23,9 +23,28 @@ import plotly.graph_objects as go
 import plotly.express as px
 
 
+# Import own code from other directory
+import sys
+
+sys.path.append("../../code/preprocessing")
+
+from storage import read_delay_store
+
+
 # ## Data Loading and Preparation
 
-delay = pd.read_pickle("../../data/processed/delay_2020-05-06.pl")
+delay = read_delay_store(
+    "../../data/processed/delay_2020-05-06.parquet",
+    columns=[
+        "date_onset",
+        "date_report",
+        "week_report",
+        "weekday_report",
+        "gender",
+        "age_group1",
+        "reporting_delay_hd",
+    ],
+)
 
 
 # #### Summarize all observations which do not have known or binary gender
@@ -9,9 +9,6 @@
 import pandas as pd
 import numpy as np
 
-# KL-divergence measure
-from scipy.stats import entropy
-
 
 pd.set_option("display.max_rows", 1000)
 pd.set_option("display.max_columns", 100)
@@ -25,9 +22,6 @@ import plotly.io as pio
 pio.renderers.default = "svg"
 
 
-# Preprocessors
-from sklearn.preprocessing import OneHotEncoder
-
 # Imputers
 from sklearn.experimental import enable_iterative_imputer
 from sklearn.impute import IterativeImputer
@@ -41,9 +35,7 @@ from sklearn.ensemble import RandomForestRegressor
 import statsmodels.api as sm
 
 # Cross-Validation
-from sklearn.model_selection import cross_validate, cross_val_predict, RepeatedKFold
-from sklearn.metrics import make_scorer
-from sklearn import metrics
+from sklearn.model_selection import cross_val_predict, RepeatedKFold, KFold
 from sklearn.model_selection import train_test_split
 
 
@@ -51,6 +43,7 @@ from sklearn.model_selection import train_test_split
 import sys
 
 sys.path.append("../../code/imputation")
+sys.path.append("../../code/preprocessing")
 
 from imputation_methods import (
     impute_regression,
@@ -59,11 +52,18 @@ from imputation_methods import (
     PmmImputer,
     impute_pmm_stats,
 )
+from model_cache import ModelCache
+from encoding import FeatureEncoder
+from kl_divergence import kl_table
+from benchmark import run_benchmark
+from storage import read_delay_store
+from features import date_features
+from schema import WEEKDAY_DTYPE, apply_schema
 
 
 # ## Data Loading and Preparation
 
-delay = pd.read_pickle("../../data/processed/delay.pl")
+delay = read_delay_store("../../data/processed/delay.parquet")
 
 
 # #### Summarize all observations which do not have known or binary gender
@@ -81,50 +81,7 @@ delay = delay[
 
 
 # #### One-Hot Encoding (Dummy Variables)
-
-
-def to_dummy(X):
-    enc = OneHotEncoder(handle_unknown="error", sparse=False, drop="first")
-    X_cat = X.select_dtypes(include=[object, "category"])
-    X_num = X.select_dtypes(exclude=[object, "category"])
-    X_trans = pd.DataFrame(
-        enc.fit_transform(X_cat),
-        columns=enc.get_feature_names(X_cat.columns),
-        index=X.index,
-    )
-    X_dummy = pd.concat([X_num, X_trans], axis=1)
-    return X_dummy, enc, X_cat.columns
-
-
-def from_dummy(X, enc, cat_columns):
-    X_trans = X[enc.get_feature_names(cat_columns)]
-    X_num = X.drop(enc.get_feature_names(cat_columns), axis=1)
-    X_cat = pd.DataFrame(
-        enc.inverse_transform(X_trans), columns=cat_columns, index=X.index
-    )
-    X_res = pd.concat([X_num, X_cat], axis=1)
-    return X_res
-
-
-def to_coded(X):
-    X = X.copy()
-    X_cat = X.select_dtypes(include=[object, "category"])
-
-    # define
-    def map_to_int(series):
-        """Convert non-numeric features to integer codes"""
-        series_cat = series.astype("category")
-        mapping = dict(zip(series_cat, series_cat.cat.codes))
-        return series_cat.cat.codes, mapping
-
-    mappings = {feat: map_to_int(X[feat])[1] for feat in X_cat.columns}
-
-    # apply
-    for feat, mapping in mappings.items():
-        X[feat] = X[feat].replace(mapping)
-
-    return X, mappings
-
+# One-hot columns are kept dense, since Bayesian ridge regression does not accept sparse input
 
 delay_labels = [
     "reporting_delay_hd",
@@ -137,7 +94,8 @@ delay_labels = [
 delay[delay_labels].isnull().sum()
 
 
-delay_dummy, enc, enc_cats = to_dummy(delay[delay_labels])
+encoder = FeatureEncoder(sparse=False)
+delay_dummy = encoder.fit_transform(delay[delay_labels])
 
 
 # ## Imputation of Disease Onset Date
@@ -158,15 +116,23 @@ onset_imputed = impute_pmm(delay_dummy, "reporting_delay_hd", n=3)
 # # Cross-Validation of Imputation Approaches
 # To compare the performance of different imputation models, cross-validation on observed data is performed.
 
+# Fitted regression models are cached, so that configurations which are validated repeatedly on the same folds are only fitted once
+
+model_cache = ModelCache("../../data/cache/models")
+
 regressors = {
-    "Predictive Mean Matching BR5": (PmmImputer(k_pmm=5), True),
-    "Predictive Mean Matching BR10": (PmmImputer(k_pmm=10), True),
+    "Predictive Mean Matching BR5": (PmmImputer(k_pmm=5, cache=model_cache), True),
+    "Predictive Mean Matching BR10": (PmmImputer(k_pmm=10, cache=model_cache), True),
     "Predictive Mean Matching RF2": (
-        PmmImputer(regressor=RandomForestRegressor(n_estimators=10), k_pmm=2),
+        PmmImputer(
+            regressor=RandomForestRegressor(n_estimators=10), k_pmm=2, cache=model_cache
+        ),
         True,
     ),
     "Predictive Mean Matching RF5": (
-        PmmImputer(regressor=RandomForestRegressor(n_estimators=10), k_pmm=5),
+        PmmImputer(
+            regressor=RandomForestRegressor(n_estimators=10), k_pmm=5, cache=model_cache
+        ),
         True,
     ),
     "Stochastic Regression": (RegressionImputer(), True),
@@ -183,182 +149,120 @@ def getXy(data, target):
 
 
 delay_cv = delay.loc[delay["reporting_delay_hd"] >= 0, delay_labels].dropna()
-delay_dummy_cv, enc_dummy, enc_cats_dummy = to_dummy(delay_cv)
-delay_codes_cv, enc_coded = to_coded(delay_cv)
+encoder_cv = FeatureEncoder(sparse=False).fit(delay_cv)
+delay_dummy_cv = encoder_cv.transform(delay_cv)
+delay_codes_cv = encoder_cv.transform_codes(delay_cv)
 
 
 # ## Cross-validation of imputed values based on mean / median
 # The error metrics of the following cross-validation can only assess the accuracy of measures of location, not of the full distribution.
 
-scorings = {
-    "MAE": make_scorer(metrics.mean_absolute_error),
-    "MRSE": make_scorer(
-        lambda y_true, y_pred: np.sqrt(metrics.mean_squared_error(y_true, y_pred))
-    ),
-    "r2": make_scorer(metrics.r2_score),
-}
+# All (model, repeat, fold) tasks run on one process pool. The predictions of each fold are stored, so that an interrupted run resumes with the remaining folds.
 
 n_repeats = 3
 n_splits = 5
-cv_generator = RepeatedKFold(n_splits=n_splits, n_repeats=n_repeats)
-
-log = True
-df_models = []
+cv_generator = RepeatedKFold(n_splits=n_splits, n_repeats=n_repeats, random_state=0)
 
-for modelname, (model, use_dummy) in regressors.items():
-    if log:
-        print(f"Validating {modelname}")
-
-    X, y = getXy(delay_dummy_cv if use_dummy else delay_codes_cv, "reporting_delay_hd")
-
-    cv_results = cross_validate(
-        model, X, y, scoring=scorings, cv=cv_generator, n_jobs=4
+methods = {
+    modelname: (
+        model,
+        getXy(delay_dummy_cv if use_dummy else delay_codes_cv, "reporting_delay_hd")[0],
     )
-    cv_results["model"] = modelname
-    df_models.append(cv_results)
-
-cv_results = pd.concat([pd.DataFrame(m) for m in df_models])
-cv_results = cv_results[[list(cv_results.columns)[-1]] + list(cv_results.columns)[:-1]]
-cv_results.groupby("model").mean()
+    for modelname, (model, use_dummy) in regressors.items()
+}
+y = delay_cv["reporting_delay_hd"]
+cv_results, cv_summary = run_benchmark(
+    methods, y, cv_generator, "../../data/cache/benchmark/location", n_jobs=-1
+)
+cv_summary
 
 
 # ## Cross-validation based on full posterior distribution
 
 # #### Integration of CV-data from external approaches by Michael Hoehle
 
-hoehle = pd.read_csv(
-    "../../data/imputed_hoehle_3.csv",
-    parse_dates=["rep_date", "disease_start", "disease_start_imp"],
-    encoding="ISO-8859-1",
-)
-hoehle = hoehle.assign(
-    reporting_delay_hd=lambda x: (x.rep_date - x.disease_start).dt.days,
-    reporting_delay_hd_imp=lambda x: (x.rep_date - x.disease_start_imp).dt.days,
-)  # estimated delay
-# remove observations which are too recent
-hoehle = hoehle.query("rep_date<'2020-04-14'")
-# remove observations with negative reporting delay
-hoehle = hoehle[
-    (hoehle["reporting_delay_hd"] >= 0) | (hoehle["reporting_delay_hd"].isnull())
-]
-
-# compute estimated date of onset
-hoehle = hoehle.assign(
-    date_onset_imp=lambda x: (
-        x.rep_date - pd.to_timedelta(x.reporting_delay_hd_imp, "days")
-    )
-)
 
-# rename
-hoehle = hoehle.rename(
-    columns={
-        "disease_start": "date_onset",
-        "rep_date": "date_report",
-        "sex": "gender",
-        "Id": "id",
-    }
-)
-hoehle["gender"] = hoehle["gender"].replace({"männlich": "male", "weiblich": "female"})
-hoehle.loc[
-    (hoehle["gender"] != "male") & (hoehle["gender"] != "female"), "gender"
-] = "other"
-
-datecols = [
-    x for x in hoehle.columns if "date" in x.lower()
-]  # select all columns featuring a date
-
-
-# Add calender week for all date columns
-for col in datecols:
-    hoehle[col.replace("date", "week")] = hoehle[col].dt.week
+def read_hoehle(path, delay):
+    """
+    Read imputed delays of an external approach with the features and schema of the delay data.
 
-# Add day of the week for all date columns
-def as_ordered_weekday(col):
-    return col.astype(pd.CategoricalDtype(ordered=True)).cat.reorder_categories(
-        ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"],
-        ordered=True,
+    Parameters
+    ----------
+    path : str
+        CSV file with the imputed dates of disease onset.
+    delay : DataFrame
+        Delay data, whose age groups are assigned to the cases by age.
+
+    Returns
+    -------
+    out : DataFrame
+        Cases with reporting delays, imputed reporting delays and date features.
+    """
+    hoehle = pd.read_csv(
+        path,
+        parse_dates=["rep_date", "disease_start", "disease_start_imp"],
+        encoding="ISO-8859-1",
     )
+    hoehle = hoehle.assign(
+        reporting_delay_hd=lambda x: (x.rep_date - x.disease_start).dt.days,
+        reporting_delay_hd_imp=lambda x: (x.rep_date - x.disease_start_imp).dt.days,
+    )  # estimated delay
+    # remove observations which are too recent
+    hoehle = hoehle.query("rep_date<'2020-04-14'")
+    # remove observations with negative reporting delay
+    hoehle = hoehle[
+        (hoehle["reporting_delay_hd"] >= 0) | (hoehle["reporting_delay_hd"].isnull())
+    ]
 
-
-for col in datecols:
-    hoehle[col.replace("date", "weekday")] = as_ordered_weekday(
-        hoehle[col].dt.day_name()
+    # compute estimated date of onset
+    hoehle = hoehle.assign(
+        date_onset_imp=lambda x: (
+            x.rep_date - pd.to_timedelta(x.reporting_delay_hd_imp, "days")
+        )
     )
 
-hoehle["age_group1"] = (
-    hoehle[["id", "age"]]
-    .merge(delay[["age", "age_group1"]].drop_duplicates(), how="left")["age_group1"]
-    .to_numpy()
-)
-
-
-hoehle_state = pd.read_csv(
-    "../../data/imputed_hoehle_state.csv",
-    parse_dates=["rep_date", "disease_start", "disease_start_imp"],
-    encoding="ISO-8859-1",
-)
-hoehle_state = hoehle_state.assign(
-    reporting_delay_hd=lambda x: (x.rep_date - x.disease_start).dt.days,
-    reporting_delay_hd_imp=lambda x: (x.rep_date - x.disease_start_imp).dt.days,
-)  # estimated delay
-# remove observations which are too recent
-hoehle_state = hoehle_state.query("rep_date<'2020-04-14'")
-# remove observations with negative reporting delay
-hoehle_state = hoehle_state[
-    (hoehle_state["reporting_delay_hd"] >= 0)
-    | (hoehle_state["reporting_delay_hd"].isnull())
-]
-
-# compute estimated date of onset
-hoehle_state = hoehle_state.assign(
-    date_onset_imp=lambda x: (
-        x.rep_date - pd.to_timedelta(x.reporting_delay_hd_imp, "days")
+    # rename
+    hoehle = hoehle.rename(
+        columns={
+            "disease_start": "date_onset",
+            "rep_date": "date_report",
+            "sex": "gender",
+            "Id": "id",
+        }
     )
-)
-
-# rename
-hoehle_state = hoehle_state.rename(
-    columns={
-        "disease_start": "date_onset",
-        "rep_date": "date_report",
-        "sex": "gender",
-        "Id": "id",
-    }
-)
-hoehle_state["gender"] = hoehle_state["gender"].replace(
-    {"männlich": "male", "weiblich": "female"}
-)
-hoehle_state.loc[
-    (hoehle_state["gender"] != "male") & (hoehle_state["gender"] != "female"), "gender"
-] = "other"
-
-datecols = [
-    x for x in hoehle_state.columns if "date" in x.lower()
-]  # select all columns featuring a date
-
-
-# Add calender week for all date columns
-for col in datecols:
-    hoehle_state[col.replace("date", "week")] = hoehle_state[col].dt.week
-
-# Add day of the week for all date columns
-def as_ordered_weekday(col):
-    return col.astype(pd.CategoricalDtype(ordered=True)).cat.reorder_categories(
-        ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"],
-        ordered=True,
+    hoehle["gender"] = hoehle["gender"].replace(
+        {"männlich": "male", "weiblich": "female"}
     )
-
-
-for col in datecols:
-    hoehle_state[col.replace("date", "weekday")] = as_ordered_weekday(
-        hoehle_state[col].dt.day_name()
+    hoehle.loc[
+        (hoehle["gender"] != "male") & (hoehle["gender"] != "female"), "gender"
+    ] = "other"
+
+    datecols = [
+        x for x in hoehle.columns if "date" in x.lower()
+    ]  # select all columns featuring a date
+
+    # Add calender week and day of the week for all date columns
+    derived = dict()
+    for col in datecols:
+        _, weeks, weekdays, missing = date_features(hoehle[col])
+        derived[col.replace("date", "week")] = pd.arrays.IntegerArray(
+            weeks.astype(np.int8), missing
+        )
+        derived[col.replace("date", "weekday")] = pd.Categorical.from_codes(
+            np.where(missing, -1, weekdays).astype(np.int8), dtype=WEEKDAY_DTYPE
+        )
+    hoehle = hoehle.assign(**derived)
+
+    hoehle["age_group1"] = (
+        hoehle[["id", "age"]]
+        .merge(delay[["age", "age_group1"]].drop_duplicates(), how="left")["age_group1"]
+        .to_numpy()
     )
+    return apply_schema(hoehle)
 
-hoehle_state["age_group1"] = (
-    hoehle_state[["id", "age"]]
-    .merge(delay[["age", "age_group1"]].drop_duplicates(), how="left")["age_group1"]
-    .to_numpy()
-)
+
+hoehle = read_hoehle("../../data/imputed_hoehle_3.csv", delay)
+hoehle_state = read_hoehle("../../data/imputed_hoehle_state.csv", delay)
 
 
 # Define set of imputed values
@@ -419,114 +323,30 @@ else:
 # ### Computation of Kullback-Leibler Divergence
 
 
-def compute_kl(arr1, arr2, vrange):
-    """
-    Compute Kullback-Leibler divergence between two discrete distributions, given samples from each distribution.
-    
-    Parameters
-    ----------
-    arr1, arr2 : array_like
-        Arrays of samples from two distributions to compare.
-    vrange : iterable
-        Iterable with valid values from the support of the probability distributions.
-        
-    """
-    arr1_c = (
-        pd.Series(arr1)
-        .round()
-        .value_counts()
-        .sort_index()
-        .reindex(vrange)
-        .fillna(0.00001)
-    )
-    arr2_c = (
-        pd.Series(arr2)
-        .round()
-        .value_counts()
-        .sort_index()
-        .reindex(vrange)
-        .fillna(0.00001)
-    )
-    return entropy(arr1_c, arr2_c)
-
-
-def kl_div_strata_dummy(X, y, imputed, strata, remaining):
-    """Compute Kullback-Leibler divergence on stratified dataset with one-hot encoding"""
-    kl_results = dict()
-    for k, v in strata.iterrows():
-        sub_idx = (X[list(v.index)] == v).all(axis=1).to_numpy()
-        if v.any():
-            strat_name = strata.columns[list(v.astype(bool))][0]
-        else:
-            strat_name = remaining
-
-        strat_res = {
-            k_imp: compute_kl(y[sub_idx], imp[sub_idx], range(25))
-            for k_imp, imp in imputed.items()
-        }
-
-        kl_results[strat_name] = strat_res
-    return kl_results
-
+# Observed and imputed values of all methods are binned within strata in one pass (see `kl_divergence.kl_table`). Strata of the one-hot encoded features are recovered by decoding.
 
-def kl_div_strata_cat(X, y, imputed, strata):
-    """Compute Kullback-Leibler divergence on stratified dataset without one-hot encoding"""
-    kl_results = dict()
-    for k, v in strata.iterrows():
-        sub_idx = (X[list(v.index)] == v).all(axis=1).to_numpy()
-        strat_name = v.iloc[0]
-
-        strat_res = {
-            k_imp: compute_kl(y[sub_idx], imp[sub_idx], range(25))
-            for k_imp, imp in imputed.items()
-        }
-
-        kl_results[strat_name] = strat_res
-    return kl_results
+X_nondummy = encoder_cv.inverse_transform(X)
 
 
 # #### All
 
-pd.DataFrame(
-    {
-        "All": {
-            k_imp: compute_kl(y, imp, range(25))
-            for k_imp, imp in {
-                **imputed,
-                "hoehle": hoehle_imp,
-                "hoehle_state": hoehle_state_imp,
-            }.items()
-        }
-    }
-).assign(Rank=lambda x: x.rank())
+kl_table(y, {**imputed, "hoehle": hoehle_imp, "hoehle_state": hoehle_state_imp}).assign(
+    Rank=lambda x: x.rank()
+)
 
 
 # #### Gender
 
-strata_subs = ["gender_male", "gender_other"]
-remaining = "gender_female"
-strata = X[strata_subs].drop_duplicates()
-a = pd.DataFrame(kl_div_strata_dummy(X, y, imputed, strata, remaining))
-a = a.rename(columns={col: col.replace("gender_", "") for col in a.columns})
-
-strata = hoehle[["gender"]].drop_duplicates()
-h = pd.DataFrame(
-    kl_div_strata_cat(
-        hoehle,
-        hoehle["reporting_delay_hd"],
-        {"hoehle": hoehle["reporting_delay_hd_imp"]},
-        strata,
-    )
+a = kl_table(y, imputed, strata=X_nondummy["gender"])
+h = kl_table(
+    hoehle["reporting_delay_hd"],
+    {"hoehle": hoehle["reporting_delay_hd_imp"]},
+    strata=hoehle["gender"],
 )
-
-strata = hoehle_state[["gender"]].drop_duplicates()
-hs = pd.DataFrame(
-    kl_div_strata_cat(
-        hoehle_state,
-        hoehle_state["reporting_delay_hd"],
-        {"hoehle_state": hoehle_state["reporting_delay_hd_imp"]},
-        strata,
-    )
+hs = kl_table(
+    hoehle_state["reporting_delay_hd"],
+    {"hoehle_state": hoehle_state["reporting_delay_hd_imp"]},
+    strata=hoehle_state["gender"],
 )
 
 print(
@@ -547,37 +367,17 @@ pd.merge(
 
 # #### Weekday
 
-strata_subs = [
-    "weekday_report_Monday",
-    "weekday_report_Saturday",
-    "weekday_report_Sunday",
-    "weekday_report_Thursday",
-    "weekday_report_Tuesday",
-    "weekday_report_Wednesday",
-]
-remaining = "weekday_report_Friday"
-strata = X[strata_subs].drop_duplicates()
-a = pd.DataFrame(kl_div_strata_dummy(X, y, imputed, strata, remaining))
-a = a.rename(columns={col: col.replace("weekday_report_", "") for col in a.columns})
-
-strata = hoehle[["weekday_report"]].drop_duplicates()
-h = pd.DataFrame(
-    kl_div_strata_cat(
-        hoehle,
-        hoehle["reporting_delay_hd"],
-        {"hoehle": hoehle["reporting_delay_hd_imp"]},
-        strata,
-    )
-)
+a = kl_table(y, imputed, strata=X_nondummy["weekday_report"])
 
-strata = hoehle_state[["weekday_report"]].drop_duplicates()
-hs = pd.DataFrame(
-    kl_div_strata_cat(
-        hoehle_state,
-        hoehle_state["reporting_delay_hd"],
-        {"hoehle_state": hoehle_state["reporting_delay_hd_imp"]},
-        strata,
-    )
+h = kl_table(
+    hoehle["reporting_delay_hd"],
+    {"hoehle": hoehle["reporting_delay_hd_imp"]},
+    strata=hoehle["weekday_report"],
+)
+hs = kl_table(
+    hoehle_state["reporting_delay_hd"],
+    {"hoehle_state": hoehle_state["reporting_delay_hd_imp"]},
+    strata=hoehle_state["weekday_report"],
 )
 
 print(
@@ -598,46 +398,17 @@ pd.merge(
 
 # #### State
 
-strata_subs = [
-    "state_Bayern",
-    "state_Berlin",
-    "state_Brandenburg",
-    "state_Bremen",
-    "state_Hamburg",
-    "state_Hessen",
-    "state_Mecklenburg-Vorpommern",
-    "state_Niedersachsen",
-    "state_Nordrhein-Westfalen",
-    "state_Rheinland-Pfalz",
-    "state_Saarland",
-    "state_Sachsen",
-    "state_Sachsen-Anhalt",
-    "state_Schleswig-Holstein",
-    "state_Thüringen",
-]
-remaining = "state_Baden-Württemberg"
-strata = X[strata_subs].drop_duplicates()
-a = pd.DataFrame(kl_div_strata_dummy(X, y, imputed, strata, remaining))
-a = a.rename(columns={col: col.replace("state_", "") for col in a.columns})
-
-strata = hoehle[["state"]].drop_duplicates()
-h = pd.DataFrame(
-    kl_div_strata_cat(
-        hoehle,
-        hoehle["reporting_delay_hd"],
-        {"hoehle": hoehle["reporting_delay_hd_imp"]},
-        strata,
-    )
-)
+a = kl_table(y, imputed, strata=X_nondummy["state"])
 
-strata = hoehle_state[["state"]].drop_duplicates()
-hs = pd.DataFrame(
-    kl_div_strata_cat(
-        hoehle_state,
-        hoehle_state["reporting_delay_hd"],
-        {"hoehle_state": hoehle_state["reporting_delay_hd_imp"]},
-        strata,
-    )
+h = kl_table(
+    hoehle["reporting_delay_hd"],
+    {"hoehle": hoehle["reporting_delay_hd_imp"]},
+    strata=hoehle["state"],
+)
+hs = kl_table(
+    hoehle_state["reporting_delay_hd"],
+    {"hoehle_state": hoehle_state["reporting_delay_hd_imp"]},
+    strata=hoehle_state["state"],
 )
 
 print(
@@ -658,38 +429,20 @@ pd.merge(
 
 # #### Age
 
-strata = (
-    delay.loc[delay["reporting_delay_hd"] >= 0, ["age_group1"]]
-    .dropna()
-    .drop_duplicates()
-)
-a = pd.DataFrame(
-    kl_div_strata_cat(
-        delay.loc[delay["reporting_delay_hd"] >= 0, ["age_group1"]].dropna(),
-        y,
-        imputed,
-        strata,
-    )
+a = kl_table(
+    y,
+    imputed,
+    strata=delay.loc[delay["reporting_delay_hd"] >= 0, "age_group1"].dropna(),
 )
-
-strata = hoehle[["age_group1"]].drop_duplicates()
-h = pd.DataFrame(
-    kl_div_strata_cat(
-        hoehle,
-        hoehle["reporting_delay_hd"],
-        {"hoehle": hoehle["reporting_delay_hd_imp"]},
-        strata,
-    )
+h = kl_table(
+    hoehle["reporting_delay_hd"],
+    {"hoehle": hoehle["reporting_delay_hd_imp"]},
+    strata=hoehle["age_group1"],
 )
-
-strata = hoehle_state[["age_group1"]].drop_duplicates()
-hs = pd.DataFrame(
-    kl_div_strata_cat(
-        hoehle_state,
-        hoehle_state["reporting_delay_hd"],
-        {"hoehle_state": hoehle_state["reporting_delay_hd_imp"]},
-        strata,
-    )
+hs = kl_table(
+    hoehle_state["reporting_delay_hd"],
+    {"hoehle_state": hoehle_state["reporting_delay_hd_imp"]},
+    strata=hoehle_state["age_group1"],
 )
 
 print(
@@ -710,28 +463,16 @@ pd.merge(
 
 # #### Week
 
-strata = X[["week_report"]].drop_duplicates()
-a = pd.DataFrame(kl_div_strata_cat(X[["week_report"]], y, imputed, strata))
-
-strata = hoehle[["week_report"]].drop_duplicates()
-h = pd.DataFrame(
-    kl_div_strata_cat(
-        hoehle,
-        hoehle["reporting_delay_hd"],
-        {"hoehle": hoehle["reporting_delay_hd_imp"]},
-        strata,
-    )
+a = kl_table(y, imputed, strata=X["week_report"])
+h = kl_table(
+    hoehle["reporting_delay_hd"],
+    {"hoehle": hoehle["reporting_delay_hd_imp"]},
+    strata=hoehle["week_report"],
 )
-
-
-strata = hoehle_state[["week_report"]].drop_duplicates()
-hs = pd.DataFrame(
-    kl_div_strata_cat(
-        hoehle_state,
-        hoehle_state["reporting_delay_hd"],
-        {"hoehle_state": hoehle_state["reporting_delay_hd_imp"]},
-        strata,
-    )
+hs = kl_table(
+    hoehle_state["reporting_delay_hd"],
+    {"hoehle_state": hoehle_state["reporting_delay_hd_imp"]},
+    strata=hoehle_state["week_report"],
 )
 
 print(
@@ -755,54 +496,32 @@ pd.merge(
 
 # #### KL divergence generalization error using scikit-learn's CV-scheme
 
-# Custom KL divergence scorer
-class kl_scorer:
-    """
-    Custom scikit-learn scorer for Kullback-Leibler divergence.
-    
-    Parameters
-    ----------
-    strata : DataFrame
-        Single-row dataframe with stratum feature values as columns.
-    pred_range : iterable
-        Iterable with valid values from the support of the probability distributions.
-        
-    """
-
-    def __init__(self, strata=None, pred_range=range(100)):
-        self.strata = strata
-        self.remaining = remaining
-        self.pred_range = pred_range
-
-    def __call__(self, estimator, X, y_true, sample_weight=None):
-        y_pred = estimator.predict(X)
-        if self.strata is not None:
-            X_nondummy = from_dummy(X, enc_dummy, enc_cats_dummy)
-            strat_idx = (X_nondummy[list(self.strata.index)] == self.strata).all(axis=1)
-        else:
-            strat_idx = list(range(len(y_true)))
-        return compute_kl(y_true[strat_idx], y_pred[strat_idx], self.pred_range)
-
-
 regressors = {
-    "Predictive Mean Matching BR5": (PmmImputer(), True),
-    "Predictive Mean Matching BR10": (PmmImputer(k_pmm=10), True),
+    "Predictive Mean Matching BR5": (PmmImputer(cache=model_cache), True),
+    "Predictive Mean Matching BR10": (PmmImputer(k_pmm=10, cache=model_cache), True),
     "Predictive Mean Matching RF5": (
-        PmmImputer(regressor=RandomForestRegressor(n_estimators=10), k_pmm=5),
+        PmmImputer(
+            regressor=RandomForestRegressor(n_estimators=10), k_pmm=5, cache=model_cache
+        ),
+        True,
+    ),
+    "Predictive Mean Matching RF5 stratified": (
+        PmmImputer(
+            regressor=RandomForestRegressor(n_estimators=10),
+            k_pmm=5,
+            stratify=[c for c in delay_dummy.columns if c.startswith("gender_")],
+            cache=model_cache,
+        ),
         True,
     ),
     "Stochastic Regression": (RegressionImputer(), True),
 }
 
 
-strata = (
-    delay.loc[delay["reporting_delay_hd"] >= 0, ["gender"]].dropna().drop_duplicates()
-)
-
-
 delay_cv = delay.loc[delay["reporting_delay_hd"] >= 0, delay_labels].dropna()
-delay_dummy_cv, enc_dummy, enc_cats_dummy = to_dummy(delay_cv)
-delay_codes_cv, enc_coded = to_coded(delay_cv)
+encoder_cv = FeatureEncoder(sparse=False).fit(delay_cv)
+delay_dummy_cv = encoder_cv.transform(delay_cv)
+delay_codes_cv = encoder_cv.transform_codes(delay_cv)
 
 
 def getXy(data, target):
@@ -811,38 +530,25 @@ def getXy(data, target):
     return X, y
 
 
-scorings = {
-    "MAE": make_scorer(metrics.mean_absolute_error),
-    "MRSE": make_scorer(
-        lambda y_true, y_pred: np.sqrt(metrics.mean_squared_error(y_true, y_pred))
-    ),
-    "r2": make_scorer(metrics.r2_score),
-    "KL-Divergence": kl_scorer(),
-}
-
-scorings = {
-    str(v.to_dict()): kl_scorer(strata=v, pred_range=range(25))
-    for k, v in strata.iterrows()
-}
-
-log = True
-df_models = []
-
-for modelname, (model, use_dummy) in regressors.items():
-    if log:
-        print(f"Validating {modelname}")
-
-    X, y = getXy(delay_dummy_cv if use_dummy else delay_codes_cv, "reporting_delay_hd")
+# All metrics and strata are scored from the same predictions of each fold
 
-    cv_results = cross_validate(
-        model, X, y, scoring=scorings, cv=3, n_jobs=None, verbose=0
+methods = {
+    modelname: (
+        model,
+        getXy(delay_dummy_cv if use_dummy else delay_codes_cv, "reporting_delay_hd")[0],
     )
-    cv_results["model"] = modelname
-    df_models.append(cv_results)
-
-cv_results = pd.concat([pd.DataFrame(m) for m in df_models])
-cv_results = cv_results[[list(cv_results.columns)[-1]] + list(cv_results.columns)[:-1]]
-cv_results.groupby("model").mean()
+    for modelname, (model, use_dummy) in regressors.items()
+}
+y = delay_cv["reporting_delay_hd"]
+cv_results, cv_summary = run_benchmark(
+    methods,
+    y,
+    KFold(n_splits=3),
+    "../../data/cache/benchmark/strata",
+    strata=delay_cv[["gender", "weekday_report", "state"]],
+    n_jobs=-1,
+)
+cv_summary
 
 
 # ## Visualization of the delay distribution
@@ -949,14 +655,14 @@ fig.show(width=1000, renderer="svg")
 onset = onset.assign(
     day_onset=lambda x: (x.date_onset - pd.to_datetime("2020-01-01")).dt.days
 )
-{
-    trace: compute_kl(
-        onset.query("trace=='original'")["day_onset"],
-        onset.query(f"trace=='{trace}'")["day_onset"],
-        range(100),
-    )
-    for trace in onset["trace"].unique()
-}
+kl_table(
+    onset.query("trace=='original'")["day_onset"],
+    {
+        trace: onset.query(f"trace=='{trace}'")["day_onset"]
+        for trace in onset["trace"].unique()
+    },
+    support=range(100),
+)
 
 
 # ## Deprecated Imputation Code
@@ -18,8 +18,6 @@ import plotly.io as pio
 pio.renderers.default = "svg"
 
 
-from sklearn.preprocessing import OneHotEncoder
-
 from sklearn.dummy import DummyClassifier
 from sklearn.linear_model import LogisticRegression
 from sklearn.tree import DecisionTreeClassifier
@@ -27,12 +25,21 @@ from sklearn.ensemble import RandomForestClassifier
 from sklearn.neighbors import KNeighborsClassifier
 from sklearn.svm import SVC
 
-from sklearn.model_selection import cross_validate
+
+# Import own code from other directory
+import sys
+
+sys.path.append("../../code/imputation")
+sys.path.append("../../code/preprocessing")
+
+from encoding import FeatureEncoder, to_matrix
+from mar_test import mar_test, permutation_test
+from storage import read_delay_store
 
 
 # ## Data Loading and Preparation
 
-delay = pd.read_pickle("../../data/processed/delay_2020-04-15.pl")
+delay = read_delay_store("../../data/processed/delay_2020-04-15.parquet")
 
 
 # #### Summarize all observations which do not have known or binary gender
@@ -52,34 +59,13 @@ delay = delay[
 # #### One-Hot Encoding (Dummy Variables)
 
 
-def to_dummy(X):
-    enc = OneHotEncoder(handle_unknown="error", sparse=False, drop="first")
-    X_cat = X.select_dtypes(include=[object, "category"])
-    X_num = X.select_dtypes(exclude=[object, "category"])
-    X_trans = pd.DataFrame(
-        enc.fit_transform(X_cat),
-        columns=enc.get_feature_names(X_cat.columns),
-        index=X.index,
-    )
-    X_dummy = pd.concat([X_num, X_trans], axis=1)
-    return X_dummy, enc, X_cat.columns
-
-
-def from_dummy(X, enc, cat_columns):
-    X_trans = X[enc.get_feature_names(cat_columns)]
-    X_num = X.drop(enc.get_feature_names(cat_columns), axis=1)
-    X_cat = pd.DataFrame(
-        enc.inverse_transform(X_trans), columns=cat_columns, index=X.index
-    )
-    X_res = pd.concat([X_num, X_cat], axis=1)
-    return X_res
-
-
 delay_labels = ["week_report", "weekday_report", "age", "gender", "state"]
 delay[delay_labels].isnull().sum()
 
 
-delay_dummy, enc, enc_cats = to_dummy(delay[delay_labels])
+# One-hot columns are kept sparse and passed to the classifiers as a sparse matrix
+encoder = FeatureEncoder(sparse=True)
+delay_dummy = encoder.fit_transform(delay[delay_labels])
 y = delay["reporting_delay_hd"].isnull()
 
 
@@ -94,40 +80,30 @@ models = {
         max_depth=5, n_estimators=10, max_features=1
     ),
 }
-scorings = ["accuracy", "precision", "recall", "f1"]
 
 
-# #### Test prediction of missingness using other features
+# #### Test prediction of missingness using other features and randomly permuted features (zero information)
+# The classifiers are compared on stratified subsamples of growing size, until the difference of the F1 scores with real and permuted features is significant or negligible for every classifier
 
-cv_results = pd.concat(
-    [
-        pd.DataFrame(
-            cross_validate(model, delay_dummy, y, scoring=scorings, cv=5)
-        ).assign(model=modelname)
-        for modelname, model in models.items()
-    ]
-)
-cv_results.groupby("model").mean()
+mar_results = mar_test(delay_dummy, y, models, scoring="f1", n_jobs=-1, random_state=0)
+mar_results
 
 
-# #### Test prediction of missingness using randomly permuted features (zero information)
+mar_results.groupby("model").last()
 
-delay_dummy_shuffled = delay_dummy.copy()
-for c in delay_dummy_shuffled.columns:
-    delay_dummy_shuffled[c] = delay_dummy_shuffled.loc[
-        np.random.permutation(delay_dummy_shuffled.index), c
-    ].to_numpy()
 
+# #### Permutation test of predictability of missingness
+# The rate of missingness within each cell of feature values is compared to the rates of 1000 random permutations of the missingness indicator
 
-cv_results_shuffled = pd.concat(
-    [
-        pd.DataFrame(
-            cross_validate(model, delay_dummy_shuffled, y, scoring=scorings, cv=5)
-        ).assign(model=modelname)
-        for modelname, model in models.items()
-    ]
+statistic, p_value, null = permutation_test(
+    delay[delay_labels],
+    y,
+    encoder=encoder,
+    n_permutations=1000,
+    n_jobs=-1,
+    random_state=0,
 )
-cv_results_shuffled.groupby("model").mean()
+print(f"Statistic: {statistic:5f}, p-value: {p_value:5f}")
 
 
 # ### Preliminary Conclusion
@@ -163,7 +139,7 @@ pd.DataFrame(
 
 
 clf = tree.DecisionTreeClassifier(max_depth=20, class_weight="balanced")
-clf = clf.fit(delay_dummy, y)
+clf = clf.fit(to_matrix(delay_dummy), y)
 
 
 pd.Series(clf.feature_importances_, index=delay_dummy.columns)
@@ -172,9 +148,9 @@ pd.Series(clf.feature_importances_, index=delay_dummy.columns)
 from sklearn import metrics
 
 
-print(f"Precision: {metrics.precision_score(y,clf.predict(delay_dummy)):5f}")
-print(f"Recall: {metrics.recall_score(y,clf.predict(delay_dummy)):5f}")
-print(f"F1: {metrics.f1_score(y,clf.predict(delay_dummy)):5f}")
+print(f"Precision: {metrics.precision_score(y,clf.predict(to_matrix(delay_dummy))):5f}")
+print(f"Recall: {metrics.recall_score(y,clf.predict(to_matrix(delay_dummy))):5f}")
+print(f"F1: {metrics.f1_score(y,clf.predict(to_matrix(delay_dummy))):5f}")
 
 
 import matplotlib.pyplot as plt
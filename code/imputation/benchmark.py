@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# # Benchmarking of Imputation Methods
+# Cross-validation of imputation methods on the full grid of (method, repeat, fold) tasks, scheduled on a process pool. Each task fits a method on the training instances of one fold and stores the predictions for the test instances on disk, so that an interrupted benchmark resumes with the remaining tasks and additional metrics are computed without refitting. All metrics of a fold are computed from the same predictions. The fold scores and their mean per method are written as CSV files.
+
+# ## Imports
+
+import pandas as pd
+import numpy as np
+
+import os
+import time
+import hashlib
+import tempfile
+
+from sklearn import metrics
+from sklearn.base import clone
+from joblib import Parallel, delayed
+
+
+# Import own code from other directory
+import sys
+
+sys.path.append("../../code/imputation")
+
+from model_cache import fingerprint
+from kl_divergence import kl_divergence, StratifiedKLScorer
+
+
+# ## Metrics
+
+METRICS = {
+    "MAE": metrics.mean_absolute_error,
+    "MRSE": lambda y_true, y_pred: np.sqrt(metrics.mean_squared_error(y_true, y_pred)),
+    "r2": metrics.r2_score,
+    "KL-Divergence": kl_divergence,
+}
+
+
+# ## Fold Predictions
+
+
+def _predict_fold(estimator, X, y, train, test, path):
+    """Fit an estimator on one fold and predict its test instances, or load the stored predictions."""
+    if os.path.exists(path):
+        with np.load(path) as stored:
+            return stored["pred"], float(stored["fit_time"])
+
+    estimator = clone(estimator)
+    start = time.perf_counter()
+    estimator.fit(X.iloc[train], y.iloc[train])
+    fit_time = time.perf_counter() - start
+    pred = np.asarray(estimator.predict(X.iloc[test]), dtype=np.float64)
+
+    # Write to a temporary file first, so that interrupted tasks leave no partial predictions
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        np.savez(f, pred=pred, fit_time=fit_time)
+    os.replace(tmp, path)
+    return pred, fit_time
+
+
+def _splits_digest(splits):
+    """Compute a content hash of the train and test positions of all splits."""
+    h = hashlib.sha256()
+    for train, test in splits:
+        for positions in [train, test]:
+            positions = np.asarray(positions, dtype=np.int64)
+            h.update(repr(positions.shape).encode())
+            h.update(positions.tobytes())
+    return h.hexdigest()
+
+
+# ## Benchmark
+
+
+def run_benchmark(
+    methods,
+    y,
+    cv,
+    directory,
+    scoring=METRICS,
+    strata=None,
+    support=range(25),
+    n_jobs=None,
+    verbose=0,
+):
+    """
+    Cross-validate imputation methods in parallel and summarize the scores per method.
+
+    Parameters
+    ----------
+    methods : dict
+        Pairs `(estimator, X)` of each method, where `X` is the feature frame the estimator
+        is trained on. All frames must have the index of `y`.
+    y : Series
+        Target values.
+    cv : cross-validation generator
+        Splitter whose splits are enumerated as repeat `i // n_splits` and fold
+        `i % n_splits`. Stored predictions are only reused for identical splits, so a
+        benchmark with an unseeded splitter does not resume across runs.
+    directory : str
+        Directory for the fold predictions (`predictions/`) and the score tables
+        (`results.csv` with one row per method, repeat and fold, `summary.csv` with the mean
+        scores per method).
+    scoring : dict
+        Functions `metric(y_true, y_pred)` to compute on the predictions of each fold.
+    strata : DataFrame, optional
+        Stratification variables with the index of `y`. If given, the Kullback-Leibler
+        divergence within each stratum is computed as well (see `StratifiedKLScorer`).
+    support : iterable
+        Valid values of the support of the distributions of the stratified divergences.
+    n_jobs : int, optional
+        Number of processes to run (method, repeat, fold) tasks on.
+    verbose : int
+        Verbosity of `joblib.Parallel`.
+
+    Returns
+    -------
+    results : DataFrame
+        Fit time and scores of each method, repeat and fold.
+    summary : DataFrame
+        Mean fit time and scores of each method.
+
+    """
+    os.makedirs(os.path.join(directory, "predictions"), exist_ok=True)
+    X_first = next(iter(methods.values()))[1]
+    splits = list(cv.split(X_first, y))
+    n_splits = len(splits) // getattr(cv, "n_repeats", 1)
+
+    # Predictions are stored under the content hash of method, data and realized splits
+    splits_key = _splits_digest(splits)
+    tasks = [
+        (name, i, os.path.join(directory, "predictions", f"{key}_{i:03d}.npz"))
+        for name, key in (
+            (name, fingerprint(estimator, X, y, seed=splits_key))
+            for name, (estimator, X) in methods.items()
+        )
+        for i in range(len(splits))
+    ]
+    fold_predictions = Parallel(n_jobs=n_jobs, verbose=verbose)(
+        delayed(_predict_fold)(*methods[name], y, *splits[i], path)
+        for name, i, path in tasks
+    )
+
+    # All metrics are computed from the same predictions
+    kl_strata = None if strata is None else StratifiedKLScorer(strata, support=support)
+    rows = []
+    for (name, i, _), (pred, fit_time) in zip(tasks, fold_predictions):
+        test = splits[i][1]
+        y_test = y.iloc[test]
+        row = {
+            "model": name,
+            "repeat": i // n_splits,
+            "fold": i % n_splits,
+            "fit_time": fit_time,
+        }
+        row.update({metric: f(y_test, pred) for metric, f in scoring.items()})
+        if kl_strata is not None:
+            row.update(
+                {
+                    k: v
+                    for k, v in kl_strata.score(y_test, pred, y_test.index).items()
+                    if k != "KL-Divergence"
+                }
+            )
+        rows.append(row)
+
+    results = pd.DataFrame(rows)
+    summary = results.drop(["repeat", "fold"], axis=1).groupby("model").mean()
+    results.to_csv(os.path.join(directory, "results.csv"), index=False)
+    summary.to_csv(os.path.join(directory, "summary.csv"))
+    return results, summary
+
+
+# ## Tests
+
+if __name__ == "__main__":
+    from sklearn.model_selection import RepeatedKFold, cross_validate
+    from sklearn.linear_model import LinearRegression
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.dummy import DummyRegressor
+
+    n_rows = 20000
+    X_test = pd.DataFrame(
+        {"a": np.random.randint(0, 10, n_rows), "b": np.random.normal(size=n_rows)},
+        index=np.random.permutation(n_rows),
+    )
+    y_test = (X_test["a"] + np.random.poisson(2, n_rows)).rename("delay")
+    strata_test = pd.DataFrame({"a": X_test["a"]})
+    methods_test = {
+        "Linear": (LinearRegression(), X_test),
+        "RF": (RandomForestRegressor(n_estimators=10, random_state=0), X_test),
+        "Median": (DummyRegressor(strategy="median"), X_test[["b"]]),
+    }
+    cv_test = RepeatedKFold(n_splits=5, n_repeats=2, random_state=0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for run in ["fit", "resume"]:
+            start = time.perf_counter()
+            results, summary = run_benchmark(
+                methods_test, y_test, cv_test, tmp, strata=strata_test, n_jobs=2
+            )
+            print(run, time.perf_counter() - start)
+
+        # Scores equal those of sequential cross-validation with sklearn
+        cv_linear = cross_validate(
+            LinearRegression(),
+            X_test,
+            y_test,
+            scoring="neg_mean_absolute_error",
+            cv=cv_test,
+        )
+        print(
+            np.allclose(
+                results.query("model == 'Linear'")["MAE"], -cv_linear["test_score"],
+            )
+        )
+        print(summary)
+
+        # Stored predictions are not reused for other splits of an unseeded splitter
+        n_stored = len(os.listdir(os.path.join(tmp, "predictions")))
+        run_benchmark(
+            {"Linear": methods_test["Linear"]},
+            y_test,
+            RepeatedKFold(n_splits=5, n_repeats=2),
+            tmp,
+        )
+        print(len(os.listdir(os.path.join(tmp, "predictions"))) == n_stored + 10)
@@ -9,7 +9,9 @@
 # - Custom scikit-learn imputer for Stochastic Regression with Bayesian Ridge
 # - Multiple Imputation via Predictive Mean Matching by Statsmodels (with OLS)
 # - Multiple Imputation via Predictive Mean Matching (with arbitrary regressor class)
-# - Custom scikit-learn imputer for Predictive Mean Matching (with arbitrary regressor class)
+# - Parallel Multiple Imputation via Predictive Mean Matching with reproducible seeding
+# - Multiple Imputation via Predictive Mean Matching with donors matched within strata
+# - Custom scikit-learn imputer for Predictive Mean Matching (with arbitrary regressor class and prebuilt donor index)
 
 # ## Imports
 
@@ -20,17 +22,70 @@ import numpy as np
 # ## Imputation of Disease Onset Date
 
 from sklearn.linear_model import BayesianRidge
-from sklearn.base import BaseEstimator, RegressorMixin
+from sklearn.base import BaseEstimator, RegressorMixin, clone
+from sklearn.neighbors import KDTree
+
+from joblib import Parallel, delayed
 
 import statsmodels.api as sm
 
+from encoding import to_matrix
+
 
 # ### Multiple Imputation using Bayesian Regression (DIY implementation)
 
 # Perform multiple imputation by drawing from Gaussian
 
 
-def samplePredictions_df(preds, stds, n=1, name="imputation"):
+def sample_predictions(
+    preds, stds, n=1, round_values=False, clip=None, random_state=None
+):
+    """
+    Sample from posterior normal distributions of predicted instances in a single draw.
+    
+    Parameters
+    ----------
+    preds : array_like
+        Predicted conditional means.
+    stds : array_like
+        Predicted conditional standard deviations.
+    n : int
+        Number of samples to draw.
+    round_values : bool
+        If True, samples are rounded to the nearest integer.
+    clip : tuple, optional
+        Tuple `(lower, upper)` to clip samples to (e.g. the valid support of the reporting delay).
+        Either boundary may be `None`.
+    random_state : int, SeedSequence or Generator, optional
+        Seed or random number generator used for the draws.
+        
+    Returns
+    -------
+    out : ndarray
+        Sampled values with shape (n_instances, n).
+        
+    """
+    rng = np.random.default_rng(random_state)
+    preds = np.asarray(preds, dtype=np.float64)
+    stds = np.asarray(stds, dtype=np.float64)
+    samples = rng.normal(preds[:, None], stds[:, None], size=(len(preds), n))
+    if round_values:
+        np.rint(samples, out=samples)
+    if clip is not None:
+        np.clip(samples, clip[0], clip[1], out=samples)
+    return samples
+
+
+def samplePredictions_df(
+    preds,
+    stds,
+    n=1,
+    name="imputation",
+    index=None,
+    round_values=False,
+    clip=None,
+    random_state=None,
+):
     """
     Sample from posterior normal distributions of predicted instances.
     
@@ -44,6 +99,14 @@ def samplePredictions_df(preds, stds, n=1, name="imputation"):
         Number of samples to draw.
     name : str
         Prefix for names of the sample columns.
+    index : array_like, optional
+        Index of the instances. If `None`, the index of `stds` is used (if it has one).
+    round_values : bool
+        If True, samples are rounded to the nearest integer.
+    clip : tuple, optional
+        Tuple `(lower, upper)` to clip samples to. Either boundary may be `None`.
+    random_state : int, SeedSequence or Generator, optional
+        Seed or random number generator used for the draws.
         
     Returns
     -------
@@ -51,17 +114,25 @@ def samplePredictions_df(preds, stds, n=1, name="imputation"):
         Sampled values with one column per sample, one row per instance.
         
     """
-    samples = pd.DataFrame({"pred_mean": preds, "pred_std": stds}).apply(
-        lambda x: np.random.normal(x.pred_mean, x.pred_std, size=n), axis=1
-    )
+    if index is None:
+        index = getattr(stds, "index", None)
     return pd.DataFrame(
-        list(samples),
-        index=stds.index,
+        sample_predictions(
+            preds,
+            stds,
+            n=n,
+            round_values=round_values,
+            clip=clip,
+            random_state=random_state,
+        ),
+        index=index,
         columns=[f"{name}_{(1+i):02d}" for i in np.arange(n)],
     )
 
 
-def impute_regression(data, target, n=1):
+def impute_regression(
+    data, target, n=1, round_values=False, clip=None, random_state=None
+):
     """
     Perform multiple imputation by drawing from posterior distribution of Bayesian ridge regression model.
     
@@ -73,6 +144,12 @@ def impute_regression(data, target, n=1):
         Column to impute.
     n : int
         Number of multiple imputations to perform.
+    round_values : bool
+        If True, imputed values are rounded to the nearest integer.
+    clip : tuple, optional
+        Tuple `(lower, upper)` to clip imputed values to. Either boundary may be `None`.
+    random_state : int, SeedSequence or Generator, optional
+        Seed or random number generator used for the draws.
         
     Returns
     -------
@@ -87,19 +164,38 @@ def impute_regression(data, target, n=1):
     regr.fit(X, y)
 
     # predict measures
-    preds, stds = regr.predict(
-        data[data[target].isnull()].drop(target, axis=1), return_std=True
-    )
+    missing = data[target].isnull()
+    preds, stds = regr.predict(data[missing].drop(target, axis=1), return_std=True)
 
     # sample from distribution
-    return samplePredictions_df(preds, stds, n=n, name="imputation")
+    return samplePredictions_df(
+        preds,
+        stds,
+        n=n,
+        name="imputation",
+        index=data.index[missing],
+        round_values=round_values,
+        clip=clip,
+        random_state=random_state,
+    )
 
 
 class RegressionImputer(BaseEstimator, RegressorMixin):
-    """Custom scikit-learn estimator for imputation with Bayesian regression"""
+    """
+    Custom scikit-learn estimator for imputation with Bayesian regression
+    
+    Parameters
+    ----------
+    clip : tuple, optional
+        Tuple `(lower, upper)` to clip imputed values to. Either boundary may be `None`.
+    random_state : int, SeedSequence or Generator, optional
+        Seed or random number generator used for the draws.
+        
+    """
 
-    def __init__(self):
-        pass
+    def __init__(self, clip=None, random_state=None):
+        self.clip = clip
+        self.random_state = random_state
 
     def fit(self, X, y=None):
         self.regr_ = BayesianRidge()
@@ -116,10 +212,14 @@ class RegressionImputer(BaseEstimator, RegressorMixin):
         # predict measures
         preds, stds = self.regr_.predict(X, return_std=True)
 
-        return (
-            pd.DataFrame({"pred_mean": preds, "pred_std": stds})
-            .apply(lambda x: np.random.normal(x.pred_mean, x.pred_std), axis=1)
-            .round()
+        return pd.Series(
+            sample_predictions(
+                preds,
+                stds,
+                round_values=True,
+                clip=self.clip,
+                random_state=self.random_state,
+            )[:, 0]
         )
 
 
@@ -127,11 +227,162 @@ class RegressionImputer(BaseEstimator, RegressorMixin):
 # Perform multiple imputation by drawing randomly from the k closests instances with observed value, where closesness is defined, using a regression model, as the distance between the prediction for the missing value instance and the prediction for the observed value instance.
 
 
-def draw_nearest(obs, pred_obs, pred_miss, k_pmm=5):
+class DonorIndex:
     """
-    For each of the missing values, draw from the k nearest observations.
+    Index of donors (instances with observed values) for predictive mean matching.
+    
+    The index is built once from the predictions of the donors and can be queried repeatedly.
+    For one-dimensional predictions, the donors are presorted by their predictions. For
+    multi-dimensional predictions (e.g. several predicted quantiles), a KD-tree on the
+    predictions is built. Queries are deduplicated, so that the nearest donors are only
+    looked up once per distinct prediction, which makes lookups cheap for the discretized
+    predictions of tree ensembles.
+    
+    This lookup is adapted from the statsmodels MICEData module.
+    
+    Parameters
+    ----------
+    obs : array_like
+        Observed values of instances with observed values.
+    pred_obs : array_like
+        Predicted values of instances with observed values with shape (n_obs,) or (n_obs, n_dims).
+    k_pmm : int
+        Number of nearest neighbours to find.
+        
+    """
+
+    def __init__(self, obs, pred_obs, k_pmm=5):
+        self.k_pmm = k_pmm
+        obs = np.asarray(obs)
+        pred_obs = np.asarray(pred_obs)
+
+        if pred_obs.ndim == 1:
+            # Jointly sort the observed and predicted values for the
+            # cases with observed values.
+            ii = np.argsort(pred_obs, kind="stable")
+            self.obs_ = obs[ii]
+            self.pred_obs_ = pred_obs[ii]
+            self.tree_ = None
+        else:
+            self.obs_ = obs
+            self.pred_obs_ = pred_obs
+            self.tree_ = KDTree(pred_obs)
+
+    def _nearest_sorted(self, pred_miss):
+        """Find the positions of the k nearest donors in the presorted predictions."""
+        k_pmm = self.k_pmm
+        n_obs = len(self.obs_)
+
+        # Find the closest match to the predicted values for
+        # cases with missing values.
+        ix = np.searchsorted(self.pred_obs_, pred_miss)
+
+        # Get the indices for the closest k_pmm values on
+        # either side of the closest index.
+        ixm = ix[:, None] + np.arange(-k_pmm, k_pmm)[None, :]
+
+        # Account for boundary effects
+        msk = np.nonzero((ixm < 0) | (ixm > n_obs - 1))
+        ixm = np.clip(ixm, 0, n_obs - 1)
+
+        # Get the distances
+        dx = pred_miss[:, None] - self.pred_obs_[ixm]
+        dx = np.abs(dx)
+        dx[msk] = np.inf
+
+        # Get the closest positions in ix, row-wise. Only the set of the
+        # k_pmm closest positions is needed, not their order.
+        dxi = np.argpartition(dx, k_pmm - 1, axis=1)[:, 0:k_pmm]
+
+        # Unwind the indices
+        return np.take_along_axis(ixm, dxi, axis=1)
+
+    def candidates(self, pred_miss):
+        """
+        For each of the missing values, find the k nearest observations.
+        
+        Parameters
+        ----------
+        pred_miss : array_like
+            Predicted values of instances with missing values with shape (n_miss,) or (n_miss, n_dims).
+            
+        Returns
+        -------
+        out : ndarray
+            Observed values of the k nearest neighbours with shape (n_miss, k_pmm), in arbitrary order.
+            
+        """
+        pred_miss = np.asarray(pred_miss)
+
+        # Look up each distinct prediction only once
+        if self.tree_ is None:
+            pred_unique, inverse = np.unique(pred_miss, return_inverse=True)
+            iz = self._nearest_sorted(pred_unique)
+        else:
+            pred_unique, inverse = np.unique(pred_miss, axis=0, return_inverse=True)
+            iz = self.tree_.query(
+                pred_unique, k=min(self.k_pmm, len(self.obs_)), return_distance=False
+            )
+
+        return self.obs_[iz][inverse.reshape(-1)]
+
+    def draw(self, pred_miss, n=1, random_state=None):
+        """
+        For each of the missing values, draw n times from the k nearest observations.
+        
+        Parameters
+        ----------
+        pred_miss : array_like
+            Predicted values of instances with missing values with shape (n_miss,) or (n_miss, n_dims).
+        n : int
+            Number of draws.
+        random_state : int, SeedSequence or Generator, optional
+            Seed or random number generator used for the draws.
+            
+        Returns
+        -------
+        out : ndarray
+            Imputed values of instances with missing values with shape (n_miss, n).
+            
+        """
+        rng = np.random.default_rng(random_state)
+        candidates = self.candidates(pred_miss)
+
+        # Choose a column for each row and draw
+        ir = rng.integers(0, candidates.shape[1], (candidates.shape[0], n))
+
+        return np.take_along_axis(candidates, ir, axis=1)
+
+
+def nearest_candidates(obs, pred_obs, pred_miss, k_pmm=5):
+    """
+    For each of the missing values, find the k nearest observations.
+    
+    Parameters
+    ----------
+    obs : array_like
+        Observed values of instances with observed values.
+    pred_obs : array_like
+        Predicted values of instances with observed values.
+    pred_miss : array_like
+        Predicted values of instances with missing values.
+    k_pmm : int
+        Number of nearest neighbours to find.
+        
+    Returns
+    -------
+    out : ndarray
+        Observed values of the k nearest neighbours with shape (n_miss, k_pmm), in arbitrary order.
+        
+    """
+    return DonorIndex(obs, pred_obs, k_pmm=k_pmm).candidates(pred_miss)
+
+
+def draw_nearest_multiple(obs, pred_obs, pred_miss, k_pmm=5, n=1, random_state=None):
+    """
+    For each of the missing values, draw n times from the k nearest observations.
     
-    This function is adapted from the statsmodels MICEData module.
+    The k nearest observations are determined once and all draws are sampled jointly.
     
     Parameters
     ----------
@@ -143,6 +394,38 @@ def draw_nearest(obs, pred_obs, pred_miss, k_pmm=5):
         Predicted values of instances with missing values.
     k_pmm : int
         Number of nearest neighbours to randomly draw from.
+    n : int
+        Number of draws.
+    random_state : int, SeedSequence or Generator, optional
+        Seed or random number generator used for the draws.
+        
+    Returns
+    -------
+    out : ndarray
+        Imputed values of instances with missing values with shape (n_miss, n).
+        
+    """
+    return DonorIndex(obs, pred_obs, k_pmm=k_pmm).draw(
+        pred_miss, n=n, random_state=random_state
+    )
+
+
+def draw_nearest(obs, pred_obs, pred_miss, k_pmm=5, random_state=None):
+    """
+    For each of the missing values, draw from the k nearest observations.
+    
+    Parameters
+    ----------
+    obs : array_like
+        Observed values of instances with observed values.
+    pred_obs : array_like
+        Predicted values of instances with observed values.
+    pred_miss : array_like
+        Predicted values of instances with missing values.
+    k_pmm : int
+        Number of nearest neighbours to randomly draw from.
+    random_state : int, SeedSequence or Generator, optional
+        Seed or random number generator used for the draws.
         
     Returns
     -------
@@ -150,51 +433,134 @@ def draw_nearest(obs, pred_obs, pred_miss, k_pmm=5):
         Imputed values of instances with missing values.
         
     """
-    # Jointly sort the observed and predicted values for the
-    # cases with observed values.
-    ii = np.argsort(pred_obs)
-    obs = obs[ii]
-    pred_obs = pred_obs[ii]
+    return draw_nearest_multiple(
+        obs, pred_obs, pred_miss, k_pmm=k_pmm, n=1, random_state=random_state
+    )[:, 0]
+
+
+def impute_pmm(
+    data,
+    target,
+    regressor=BayesianRidge(),
+    k_pmm=5,
+    n=1,
+    random_state=None,
+    cache=None,
+):
+    """
+    Perform multiple imputation by predictive mean matching.
+    
+    Parameters
+    ----------
+    data : DataFrame
+        Data to use for imputation.
+    target : str
+        Column to impute.
+    regressor : sklearn Regressor
+        Estimator object to use for regression.
+    k_pmm : array_like
+        Number of nearest neighbours to randomly draw from.
+    n : int
+        Number of multiple imputations to perform.
+    random_state : int, SeedSequence or Generator, optional
+        Seed or random number generator used for the draws.
+    cache : ModelCache, optional
+        Cache to load the fitted regression model from or store it in.
+        
+    Returns
+    -------
+    out : DataFrame
+        One column per imputation, indices of original rows.
+        
+    """
+    y = data.dropna()[target]
+    X = to_matrix(data.dropna().drop(target, axis=1))
+
+    obs = data[data[target].notnull()][target].to_numpy()
+
+    # Fit regression model and predict values
+    if cache is None:
+        regressor.fit(X, y)
+        pred_obs = regressor.predict(
+            to_matrix(data[data[target].notnull()].drop(target, axis=1))
+        )
+    else:
+        # The cached predictions of the training instances are those of the observed values
+        if len(y) != len(obs):
+            raise ValueError(
+                "Instances with observed target must not have missing features."
+            )
+        regressor, pred_obs = cache.fit_predict(regressor, X, y)
+    pred_miss = regressor.predict(
+        to_matrix(data[data[target].isnull()].drop(target, axis=1))
+    )
+
+    # Impute
+    imputed_values = draw_nearest_multiple(
+        obs, pred_obs, pred_miss, k_pmm=k_pmm, n=n, random_state=random_state
+    )
 
-    # Find the closest match to the predicted values for
-    # cases with missing values.
-    ix = np.searchsorted(pred_obs, pred_miss)
+    return pd.DataFrame(
+        imputed_values,
+        index=data[data[target].isnull()].index,
+        columns=[f"imputation_{(1+i):02d}" for i in np.arange(n)],
+    )
 
-    # Get the indices for the closest k_pmm values on
-    # either side of the closest index.
-    ixm = ix[:, None] + np.arange(-k_pmm, k_pmm)[None, :]
 
-    # Account for boundary effects
-    msk = np.nonzero((ixm < 0) | (ixm > len(obs) - 1))
-    ixm = np.clip(ixm, 0, len(obs) - 1)
+# ### Parallel Multiple Imputation with Predictive Mean Matching
+# By default, the regression model is fitted once and all imputations are drawn from the same candidates (as in `impute_pmm`). The instances with missing values are split into chunks of fixed size, which are predicted and imputed across processes. Optionally, each imputation fits the regression model on a bootstrap sample of the observed instances, so that the imputations also reflect the uncertainty of the regression model; these imputations are distributed across processes. Every chunk (or bootstrap imputation) uses its own random number generator spawned from a common seed sequence, which makes the results independent of how the work is distributed across processes.
 
-    # Get the distances
-    dx = pred_miss[:, None] - pred_obs[ixm]
-    dx = np.abs(dx)
-    dx[msk] = np.inf
+# Number of instances with missing values predicted and imputed per task
+CHUNK_SIZE = 50000
 
-    # Get the closest positions in ix, row-wise.
-    dxi = np.argsort(dx, 1)[:, 0:k_pmm]
 
-    def choose_imputed(obs, pred_miss, dxi, k_pmm):
-        # Choose a column for each row.
-        ir = np.random.randint(0, k_pmm, len(pred_miss))
+def _fit_pmm(X_obs, obs, regressor, rng, seed, sample, cache):
+    """Fit a clone of the regression model, seeded from `rng`, and predict the observed values."""
+    regressor = clone(regressor)
+    if "random_state" in regressor.get_params():
+        regressor.set_params(random_state=int(rng.integers(np.iinfo(np.int32).max)))
+
+    if cache is None:
+        if sample is None:
+            regressor.fit(X_obs, obs)
+        else:
+            regressor.fit(X_obs[sample], obs[sample])
+        return regressor, regressor.predict(X_obs)
+    return cache.fit_predict(
+        regressor, X_obs, obs, seed=(seed.entropy, seed.spawn_key), sample=sample
+    )
 
-        # Unwind the indices
-        jj = np.arange(dxi.shape[0])
-        ix = dxi[(jj, ir)]
-        iz = ixm[(jj, ix)]
 
-        return np.array(obs[iz]).squeeze()
+def _impute_pmm_task(X_obs, obs, X_miss, regressor, k_pmm, seed, cache):
+    """Fit the regression model on a bootstrap sample and draw one imputation using a generator seeded by `seed`."""
+    rng = np.random.default_rng(seed)
+    ib = rng.integers(0, len(obs), len(obs))
+    regressor, pred_obs = _fit_pmm(X_obs, obs, regressor, rng, seed, ib, cache)
+    pred_miss = regressor.predict(X_miss)
 
-    imputed_miss = choose_imputed(obs, pred_miss, dxi, k_pmm)
+    return draw_nearest(obs, pred_obs, pred_miss, k_pmm=k_pmm, random_state=rng)
 
-    return imputed_miss
 
+def _impute_chunk(regressor, donors, X_miss, n, seed):
+    """Predict the missing values of one chunk and draw n imputations."""
+    return donors.draw(regressor.predict(X_miss), n=n, random_state=seed)
 
-def impute_pmm(data, target, regressor=BayesianRidge(), k_pmm=5, n=1):
+
+def impute_pmm_parallel(
+    data,
+    target,
+    regressor=BayesianRidge(),
+    k_pmm=5,
+    n=1,
+    seed=None,
+    n_jobs=None,
+    bootstrap=False,
+    cache=None,
+):
     """
-    Perform multiple imputation by predictive mean matching.
+    Perform multiple imputation by predictive mean matching in parallel with reproducible seeding.
+    
+    The results only depend on `seed`, not on `n_jobs`.
     
     Parameters
     ----------
@@ -204,10 +570,21 @@ def impute_pmm(data, target, regressor=BayesianRidge(), k_pmm=5, n=1):
         Column to impute.
     regressor : sklearn Regressor
         Estimator object to use for regression.
-    k_pmm : array_like
+    k_pmm : int
         Number of nearest neighbours to randomly draw from.
     n : int
         Number of multiple imputations to perform.
+    seed : int or SeedSequence, optional
+        Seed from which an independent random number generator is spawned for each imputation.
+    n_jobs : int, optional
+        Number of processes to distribute the chunks of missing values (or the bootstrap
+        imputations) across (see joblib.Parallel).
+    bootstrap : bool, optional
+        If True, the regression model of each imputation is fitted on a bootstrap sample of the
+        observed instances. Otherwise, the model is fitted once on all observed instances and
+        all imputations are drawn from the same candidates. Default is False.
+    cache : ModelCache, optional
+        Cache to load the fitted regression models from or store them in.
         
     Returns
     -------
@@ -215,25 +592,160 @@ def impute_pmm(data, target, regressor=BayesianRidge(), k_pmm=5, n=1):
         One column per imputation, indices of original rows.
         
     """
-    y = data.dropna()[target]
-    X = data.dropna().drop(target, axis=1)
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+
+    observed = data[target].notnull().to_numpy()
+    X = to_matrix(data.drop(target, axis=1))
+    obs = data.loc[observed, target].to_numpy(dtype=np.float64)
+
+    if bootstrap:
+        imputed_values = np.column_stack(
+            Parallel(n_jobs=n_jobs)(
+                delayed(_impute_pmm_task)(
+                    X[observed], obs, X[~observed], regressor, k_pmm, child_seed, cache
+                )
+                for child_seed in seed.spawn(n)
+            )
+        )
+    else:
+        regressor, pred_obs = _fit_pmm(
+            X[observed], obs, regressor, np.random.default_rng(seed), seed, None, cache
+        )
+        donors = DonorIndex(obs, pred_obs, k_pmm=k_pmm)
+
+        X_miss = X[~observed]
+        starts = range(0, X_miss.shape[0], CHUNK_SIZE)
+        draws = Parallel(n_jobs=n_jobs)(
+            delayed(_impute_chunk)(
+                regressor, donors, X_miss[start : start + CHUNK_SIZE], n, child_seed
+            )
+            for start, child_seed in zip(starts, seed.spawn(len(starts)))
+        )
+        imputed_values = (
+            np.concatenate(draws) if draws else np.empty((0, n), dtype=obs.dtype)
+        )
 
-    obs = data[data[target].notnull()][target].to_numpy()
+    return pd.DataFrame(
+        imputed_values,
+        index=data.index[~observed],
+        columns=[f"imputation_{(1+i):02d}" for i in np.arange(n)],
+    )
 
-    # Fit regression model
-    regressor.fit(X, y)
 
-    # Predict values
-    pred_obs = regressor.predict(data[data[target].notnull()].drop(target, axis=1))
-    pred_miss = regressor.predict(data[data[target].isnull()].drop(target, axis=1))
+# ### Stratified Predictive Mean Matching
+# The regression model is fitted on all instances, but donors are only matched within strata (e.g. state and week of report), so that the imputed values reproduce the distribution within each stratum. Strata with fewer than k donors fall back to the full donor pool.
 
-    # Impute
-    imputed_values = {
-        f"imputation_{(1+i):02d}": draw_nearest(obs, pred_obs, pred_miss, k_pmm=k_pmm)
-        for i in np.arange(n)
-    }
 
-    return pd.DataFrame(imputed_values, index=data[data[target].isnull()].index)
+def _strata_partitions(keys):
+    """Return a dictionary mapping each stratum to the positions of its rows. Rows with missing keys are omitted."""
+    keys = pd.DataFrame(keys)
+    # Group by dense values of (one-hot encoded) sparse columns
+    keys = keys.assign(
+        **{
+            c: np.asarray(keys[c])
+            for c in keys.columns
+            if isinstance(keys[c].dtype, pd.SparseDtype)
+        }
+    )
+    return keys.groupby(list(keys.columns), sort=True, observed=True).indices
+
+
+def _draw_stratum(obs, pred_obs, pred_miss, k_pmm, n, seed):
+    """Draw n imputations for the missing values of one stratum."""
+    return DonorIndex(obs, pred_obs, k_pmm=k_pmm).draw(
+        pred_miss, n=n, random_state=seed
+    )
+
+
+def impute_pmm_stratified(
+    data,
+    target,
+    strata,
+    regressor=BayesianRidge(),
+    k_pmm=5,
+    n=1,
+    seed=None,
+    n_jobs=None,
+    cache=None,
+):
+    """
+    Perform multiple imputation by predictive mean matching with donors matched within strata.
+    
+    The results only depend on `seed`, not on `n_jobs`.
+    
+    Parameters
+    ----------
+    data : DataFrame
+        Data to use for imputation.
+    target : str
+        Column to impute.
+    strata : str, list or DataFrame
+        Column(s) of `data` or frame with the same index as `data` defining the strata.
+    regressor : sklearn Regressor
+        Estimator object to use for regression.
+    k_pmm : int
+        Number of nearest neighbours to randomly draw from.
+    n : int
+        Number of multiple imputations to perform.
+    seed : int or SeedSequence, optional
+        Seed from which an independent random number generator is spawned for each stratum.
+    n_jobs : int, optional
+        Number of processes to distribute the strata across (see joblib.Parallel).
+    cache : ModelCache, optional
+        Cache to load the fitted regression model from or store it in.
+        
+    Returns
+    -------
+    out : DataFrame
+        One column per imputation, indices of original rows.
+        
+    """
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    if isinstance(strata, (str, list)):
+        strata = data[strata]
+    strata = pd.DataFrame(strata).loc[data.index]
+
+    observed = data[target].notnull().to_numpy()
+    X = to_matrix(data.drop(target, axis=1))
+    obs = data.loc[observed, target].to_numpy()
+
+    # Fit regression model on all strata
+    if cache is None:
+        regressor.fit(X[observed], obs)
+        pred_obs = regressor.predict(X[observed])
+    else:
+        regressor, pred_obs = cache.fit_predict(regressor, X[observed], obs)
+    pred_miss = regressor.predict(X[~observed])
+
+    # Match within strata with enough donors, otherwise with all donors
+    donors = _strata_partitions(strata[observed])
+    tasks, fallback = [], np.ones(len(pred_miss), dtype=bool)
+    for key, imiss in _strata_partitions(strata[~observed]).items():
+        idon = donors.get(key)
+        if idon is not None and len(idon) >= k_pmm:
+            tasks.append((idon, imiss))
+            fallback[imiss] = False
+    if fallback.any():
+        tasks.append((np.arange(len(obs)), np.flatnonzero(fallback)))
+
+    draws = Parallel(n_jobs=n_jobs)(
+        delayed(_draw_stratum)(
+            obs[idon], pred_obs[idon], pred_miss[imiss], k_pmm, n, child_seed
+        )
+        for (idon, imiss), child_seed in zip(tasks, seed.spawn(len(tasks)))
+    )
+
+    imputed_values = np.empty((len(pred_miss), n), dtype=obs.dtype)
+    for (idon, imiss), values in zip(tasks, draws):
+        imputed_values[imiss] = values
+
+    return pd.DataFrame(
+        imputed_values,
+        index=data.index[~observed],
+        columns=[f"imputation_{(1+i):02d}" for i in np.arange(n)],
+    )
 
 
 class PmmImputer(BaseEstimator, RegressorMixin):
@@ -246,35 +758,76 @@ class PmmImputer(BaseEstimator, RegressorMixin):
         Estimator object to use for regression.
     k_pmm : array_like
         Number of nearest neighbours to randomly draw from.
+    random_state : int, SeedSequence or Generator, optional
+        Seed or random number generator used for the draws.
+    stratify : list, optional
+        Columns of X defining strata. Donors are only matched within the stratum of an
+        instance, unless the stratum has fewer than k_pmm donors.
+    cache : ModelCache, optional
+        Cache to load the fitted regression model from or store it in.
         
     """
 
-    def __init__(self, regressor=BayesianRidge(), k_pmm=5):
+    def __init__(
+        self,
+        regressor=BayesianRidge(),
+        k_pmm=5,
+        random_state=None,
+        stratify=None,
+        cache=None,
+    ):
         self.k_pmm = k_pmm
         self.regressor = regressor
+        self.random_state = random_state
+        self.stratify = stratify
+        self.cache = cache
 
     def fit(self, X, y=None):
-        self.obs_ = y.to_numpy()
-
-        # Fit regression model
-        self.regressor.fit(X, y)
-
-        # Predict observed values
-        self.pred_obs_ = self.regressor.predict(X)
+        # Fit regression model and predict observed values
+        X_matrix = to_matrix(X)
+        if self.cache is None:
+            self.regressor_ = clone(self.regressor).fit(X_matrix, y)
+            pred_obs = self.regressor_.predict(X_matrix)
+        else:
+            self.regressor_, pred_obs = self.cache.fit_predict(
+                clone(self.regressor), X_matrix, y
+            )
+
+        # Index donors by their predicted values
+        obs = y.to_numpy()
+        self.donors_ = DonorIndex(obs, pred_obs, k_pmm=self.k_pmm)
+
+        # Index donors of each stratum with enough donors
+        self.strata_donors_ = dict()
+        if self.stratify is not None:
+            for key, idon in _strata_partitions(X[self.stratify]).items():
+                if len(idon) >= self.k_pmm:
+                    self.strata_donors_[key] = DonorIndex(
+                        obs[idon], pred_obs[idon], k_pmm=self.k_pmm
+                    )
 
         return self
 
     def predict(self, X, y=None):
         try:
-            getattr(self, "regressor")
+            getattr(self, "donors_")
         except AttributeError:
             raise RuntimeError("Imputer must be fitted before prediction.")
 
         # Predict missing values
-        pred_miss = self.regressor.predict(X)
+        pred_miss = self.regressor_.predict(to_matrix(X))
 
         # Impute
-        imputed_values = draw_nearest(self.obs_, self.pred_obs_, pred_miss)
+        if not self.strata_donors_:
+            return self.donors_.draw(pred_miss, random_state=self.random_state)[:, 0]
+
+        rng = np.random.default_rng(self.random_state)
+        imputed_values = self.donors_.draw(pred_miss, random_state=rng)[:, 0]
+        for key, imiss in _strata_partitions(X[self.stratify]).items():
+            if key in self.strata_donors_:
+                imputed_values[imiss] = self.strata_donors_[key].draw(
+                    pred_miss[imiss], random_state=rng
+                )[:, 0]
 
         return imputed_values
 
@@ -290,3 +843,179 @@ def impute_pmm_stats(target, data, k_pmm=5, n=1):
         {f"imputation_{i:02d}": imp.next_sample()["x0"].copy() for i in range(n)},
         index=data.index,
     )
+
+
+# ## Tests
+
+if __name__ == "__main__":
+    import timeit
+
+    n_obs, n_miss, n_imputations = 400000, 250000, 20
+    pred_obs_test = np.random.normal(size=n_obs).round(2)
+    obs_test = pred_obs_test + np.random.normal(size=n_obs)
+    pred_miss_test = np.random.normal(size=n_miss).round(2)
+
+    # Compare runtimes of repeated single draws and one batched draw
+    print(
+        min(
+            timeit.repeat(
+                lambda: [
+                    draw_nearest(obs_test, pred_obs_test, pred_miss_test)
+                    for i in range(n_imputations)
+                ],
+                repeat=3,
+                number=1,
+            )
+        ),
+        min(
+            timeit.repeat(
+                lambda: draw_nearest_multiple(
+                    obs_test, pred_obs_test, pred_miss_test, n=n_imputations
+                ),
+                repeat=3,
+                number=1,
+            )
+        ),
+    )
+
+
+if __name__ == "__main__":
+    from sklearn.ensemble import RandomForestRegressor
+
+    # Parallel imputations must be identical for any number of jobs
+    X_test = np.random.normal(size=(20000, 5))
+    data_test = pd.DataFrame(X_test, columns=[f"x{i}" for i in range(5)]).assign(
+        y=X_test.sum(axis=1) + np.random.normal(size=20000)
+    )
+    data_test.loc[np.random.random(20000) < 0.4, "y"] = np.nan
+    results = {
+        n_jobs: impute_pmm_parallel(
+            data_test,
+            "y",
+            regressor=RandomForestRegressor(n_estimators=10),
+            n=8,
+            seed=0,
+            n_jobs=n_jobs,
+            bootstrap=True,
+        )
+        for n_jobs in [1, 2, 4]
+    }
+    print(all(results[1].equals(result) for result in results.values()))
+
+    # Without bootstrap, the model is fitted once and the chunks of missing values are
+    # imputed in parallel, again independently of the number of jobs
+    CHUNK_SIZE = 1000
+    results_single_fit = {
+        n_jobs: impute_pmm_parallel(
+            data_test,
+            "y",
+            regressor=RandomForestRegressor(n_estimators=10),
+            n=8,
+            seed=0,
+            n_jobs=n_jobs,
+        )
+        for n_jobs in [1, 2, 4]
+    }
+    print(
+        all(results_single_fit[1].equals(r) for r in results_single_fit.values()),
+        results_single_fit[1].shape == results[1].shape,
+    )
+
+
+if __name__ == "__main__":
+    # Compare runtimes of row-wise and vectorized sampling from the posterior
+    preds_test, stds_test = np.random.normal(size=n_miss), np.random.random(n_miss)
+    print(
+        min(
+            timeit.repeat(
+                lambda: pd.DataFrame({"pred_mean": preds_test, "pred_std": stds_test})
+                .apply(lambda x: np.random.normal(x.pred_mean, x.pred_std), axis=1)
+                .round(),
+                repeat=3,
+                number=1,
+            )
+        ),
+        min(
+            timeit.repeat(
+                lambda: sample_predictions(preds_test, stds_test, round_values=True),
+                repeat=3,
+                number=1,
+            )
+        ),
+    )
+    print(
+        samplePredictions_df(
+            preds_test, stds_test, n=3, round_values=True, clip=(-2, 2), random_state=0
+        ).describe()
+    )
+
+
+if __name__ == "__main__":
+    # Compare runtimes of repeated lookups with and without a prebuilt donor index on
+    # discretized predictions, as produced by random forests
+    pred_obs_discrete, pred_miss_discrete = (
+        pred_obs_test.round(1),
+        pred_miss_test.round(1),
+    )
+    donors_test = DonorIndex(obs_test, pred_obs_discrete)
+    print(
+        min(
+            timeit.repeat(
+                lambda: [
+                    draw_nearest(obs_test, pred_obs_discrete, pred_miss_discrete)
+                    for i in range(5)
+                ],
+                repeat=3,
+                number=1,
+            )
+        ),
+        min(
+            timeit.repeat(
+                lambda: [donors_test.draw(pred_miss_discrete) for i in range(5)],
+                repeat=3,
+                number=1,
+            )
+        ),
+    )
+
+    # Candidates of multi-dimensional matching are the nearest donors
+    pred_obs_2d = np.random.normal(size=(2000, 2))
+    pred_miss_2d = np.random.normal(size=(100, 2))
+    candidates_test = DonorIndex(np.arange(2000), pred_obs_2d).candidates(pred_miss_2d)
+    distances = np.linalg.norm(pred_miss_2d[:, None] - pred_obs_2d[None], axis=2)
+    print(
+        np.allclose(
+            np.sort(np.take_along_axis(distances, candidates_test, axis=1), axis=1),
+            np.sort(distances, axis=1)[:, :5],
+        )
+    )
+
+
+if __name__ == "__main__":
+    # Stratified matching reproduces the distribution within strata, which the regression
+    # model does not capture (the spread of the target differs between strata)
+    n_test = 200000
+    stratum_test = np.random.randint(0, 16, n_test)
+    data_test = pd.DataFrame(
+        {
+            "y": np.random.normal(size=n_test) * (1 + stratum_test),
+            "x": np.random.normal(size=n_test),
+            "stratum": stratum_test,
+        }
+    )
+    missing_test = np.random.random(n_test) < 0.4
+    y_true = data_test.loc[missing_test, "y"]
+    data_test.loc[missing_test, "y"] = np.nan
+    for name, imputed in [
+        ("global", impute_pmm(data_test, "y", n=1)),
+        ("stratified", impute_pmm_stratified(data_test, "y", "stratum", n=1, seed=0)),
+    ]:
+        spread = (
+            imputed["imputation_01"]
+            .groupby(data_test.loc[missing_test, "stratum"])
+            .std()
+        )
+        print(
+            name,
+            np.abs(spread - y_true.groupby(stratum_test[missing_test]).std()).mean(),
+        )
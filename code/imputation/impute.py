@@ -14,8 +14,13 @@ from sklearn.ensemble import RandomForestRegressor
 import sys
 
 sys.path.append("../../code/imputation")
+sys.path.append("../../code/preprocessing")
 
-from imputation_methods import impute_pmm
+from imputation_methods import impute_pmm_parallel
+from model_cache import ModelCache
+from encoding import FeatureEncoder
+from imputed_data import ImputedDelay
+from storage import read_delay_store
 
 
 # ## Logging
@@ -35,9 +40,8 @@ logger.info("Loading data.")
 filename = "delay_2020-05-06"
 
 
-delay = pd.read_pickle(f"../../data/processed/{filename}.pl")
-if "id" in delay.columns:
-    delay = delay.drop("id", axis=1)
+delay = read_delay_store(f"../../data/processed/{filename}.parquet")
+delay = delay.drop([col for col in ["id", "row_hash"] if col in delay.columns], axis=1)
 
 
 # #### Summarize all observations which do not have known or binary gender
@@ -49,7 +53,7 @@ delay.loc[
 
 # #### Remove observations with negative reporting delay
 
-delay_neg = delay[delay["reporting_delay_hd"] < 0]
+delay_all = delay
 delay = delay[
     (delay["reporting_delay_hd"] >= 0) | (delay["reporting_delay_hd"].isnull())
 ]
@@ -60,52 +64,6 @@ delay = delay[
 logger.info("Encoding as One-Hot variables.")
 
 
-from sklearn.preprocessing import OneHotEncoder
-
-
-def to_dummy(X):
-    enc = OneHotEncoder(handle_unknown="error", sparse=False, drop="first")
-    X_cat = X.select_dtypes(include=[object, "category"])
-    X_num = X.select_dtypes(exclude=[object, "category"])
-    X_trans = pd.DataFrame(
-        enc.fit_transform(X_cat),
-        columns=enc.get_feature_names(X_cat.columns),
-        index=X.index,
-    )
-    X_dummy = pd.concat([X_num, X_trans], axis=1)
-    return X_dummy, enc, X_cat.columns
-
-
-def from_dummy(X, enc, cat_columns):
-    X_trans = X[enc.get_feature_names(cat_columns)]
-    X_num = X.drop(enc.get_feature_names(cat_columns), axis=1)
-    X_cat = pd.DataFrame(
-        enc.inverse_transform(X_trans), columns=cat_columns, index=X.index
-    )
-    X_res = pd.concat([X_num, X_cat], axis=1)
-    return X_res
-
-
-def to_coded(X):
-    X = X.copy()
-    X_cat = X.select_dtypes(include=[object, "category"])
-
-    # define
-    def map_to_int(series):
-        """Convert non-numeric features to integer codes"""
-        series_cat = series.astype("category")
-        mapping = dict(zip(series_cat, series_cat.cat.codes))
-        return series_cat.cat.codes, mapping
-
-    mappings = {feat: map_to_int(X[feat])[1] for feat in X_cat.columns}
-
-    # apply
-    for feat, mapping in mappings.items():
-        X[feat] = X[feat].replace(mapping)
-
-    return X, mappings
-
-
 delay_labels = [
     "reporting_delay_hd",
     "week_report",
@@ -114,7 +72,9 @@ delay_labels = [
     "gender",
     "state",
 ]
-delay_dummy, enc, enc_cats = to_dummy(delay[delay_labels])
+# One-hot columns are kept sparse, so that the design matrix is never densified
+encoder = FeatureEncoder(sparse=True)
+delay_dummy = encoder.fit_transform(delay[delay_labels])
 
 
 # ## Perform Imputation
@@ -122,91 +82,34 @@ delay_dummy, enc, enc_cats = to_dummy(delay[delay_labels])
 logger.info("Performing imputation.")
 
 
-# impute delay
-delay_imputed = impute_pmm(
+# impute delay with a single fit of the random forest, all imputations are drawn from the same
+# candidates; the cases with missing onset are predicted and imputed in chunks across all cores
+# (results only depend on the seed, not on the number of jobs)
+delay_imputed = impute_pmm_parallel(
     delay_dummy,
     "reporting_delay_hd",
     regressor=RandomForestRegressor(n_estimators=10),
     k_pmm=5,
     n=3,
-)
-# round to next integer
-delay_imputed = delay_imputed.round()
-# compute day of onset by subtracting delay from day of report
-onset_imputed = delay_imputed.apply(
-    lambda x: delay.loc[delay_imputed.index, "day_report"] - x
+    seed=20200506,
+    n_jobs=-1,
+    cache=ModelCache("../../data/cache/models"),
 )
 
 
 # ## Factor imputed values back into original dataframe
+# The attributes of all cases are stored once together with the imputed days of onset (cases with negative reporting delay are kept as original observations). The data of each imputation is only built while it is exported.
 
 logger.info("Reintegrating as delay dataframe.")
 
 
-def as_ordered_weekday(col):
-    return col.astype(pd.CategoricalDtype(ordered=True)).cat.reorder_categories(
-        ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"],
-        ordered=True,
-    )
-
-
-# Concat columns
-delay_imp = delay.copy()
-for col in onset_imputed.columns:
-    delay_imp[col] = np.nan
-    delay_imp.loc[onset_imputed.index, col] = onset_imputed[col]
-
-# Pivot to long format
-delay_imp = delay_imp.melt(
-    id_vars=delay_imp.drop(["day_onset"] + list(onset_imputed.columns), axis=1).columns,
-    value_vars=["day_onset"] + list(onset_imputed.columns),
-    var_name="imputation",
-    value_name="day_onset",
-)
-
-# Drop empty day onset rows
-delay_imp = delay_imp.dropna(subset=["day_onset"]).sort_values("day_onset")
-
-# Compute derived values for imputed rows
-delay_imp["imputation"] = delay_imp["imputation"].replace({"day_onset": "original"})
-delay_imp["imputed"] = delay_imp["imputation"] != "original"
-delay_imp["date_onset"] = pd.to_datetime("2020-01-01") + pd.to_timedelta(
-    delay_imp["day_onset"], unit="days"
-)
-delay_imp["week_onset"] = delay_imp["date_onset"].dt.week
-delay_imp["weekday_onset"] = as_ordered_weekday(delay_imp["date_onset"].dt.day_name())
-delay_imp["reporting_delay_hd"] = delay_imp["day_report"] - delay_imp["day_onset"]
-delay_imp["reporting_delay_rki"] = delay_imp["day_report_rki"] - delay_imp["day_onset"]
-
-
-# ### Add observations with negative reporting delay
-
-delay_final = pd.concat(
-    [delay_imp, delay_neg.assign(imputation="original", imputed=False)], sort=False
-)
+delay_final = ImputedDelay.from_delays(delay_all, delay_imputed)
 
 
 # ## Export imputed dataset
+# Original observations are stored once, each imputation is stored in its own partition. Reading the imputations `original` and `imputation_01` yields the dataset with the first imputation.
 
-# As CSV
-
-logger.info("Exporting as CSV.")
-
-
-for imp in delay_final["imputation"].unique():
-    if imp != "original":
-        delay_final.query(f"imputation=='original' | imputation=='{imp}'").to_csv(
-            f"../../data/processed/{filename}_{imp}.csv", index=False
-        )
-
-
-# As pickle file
-
-logger.info("Exporting as pickle.")
+logger.info("Exporting to Parquet store.")
 
 
-for imp in delay_final["imputation"].unique():
-    if imp != "original":
-        delay_final.query(f"imputation=='original' | imputation=='{imp}'").to_pickle(
-            f"../../data/processed/{filename}_{imp}.pl"
-        )
+delay_final.write(f"../../data/processed/{filename}_imputed.parquet")
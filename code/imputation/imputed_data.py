@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# # Imputed Delay Data
+# Compact representation of multiply imputed delay data. The attributes of all cases are stored once, the imputed days of onset of the cases with missing onset are stored as a block of 16-bit integers with one column per imputation. The data of a single imputation (with derived onset features) is only built on access, so that memory usage does not grow with the number of imputations and imputations can be exported one at a time.
+
+# ## Imports
+
+import pandas as pd
+import numpy as np
+
+
+# Import own code from other directory
+import sys
+
+sys.path.append("../../code/preprocessing")
+
+from features import date_features
+from schema import WEEKDAY_DTYPE, apply_schema
+from storage import write_delay_store
+
+
+# ## Imputed Delay Data
+
+# Reference date of the day representation
+REFERENCE_DATE = np.datetime64("2020-01-01", "D")
+
+
+class ImputedDelay:
+    """
+    Delay data with multiple imputations of the day of onset.
+
+    Parameters
+    ----------
+    delay : DataFrame
+        Delay data of all cases, including cases with missing onset.
+    onset_days : DataFrame
+        Imputed days of onset (days since 2020-01-01) with the cases with missing onset as
+        index and one column per imputation.
+
+    """
+
+    def __init__(self, delay, onset_days):
+        self.delay = delay
+        self.names = list(onset_days.columns)
+        self.positions = delay.index.get_indexer(onset_days.index)
+        if (self.positions < 0).any():
+            raise ValueError("Imputed cases are missing from the delay data.")
+        self.onset_days = onset_days.to_numpy().round().astype(np.int16)
+
+    @classmethod
+    def from_delays(cls, delay, delay_imputed, column="reporting_delay_hd"):
+        """
+        Create imputed delay data from imputed reporting delays.
+
+        Parameters
+        ----------
+        delay : DataFrame
+            Delay data of all cases.
+        delay_imputed : DataFrame
+            Imputed reporting delays of the cases with missing onset, one column per imputation.
+        column : str
+            Reporting delay which has been imputed. The day of onset is computed by subtracting
+            the (rounded) delay from the corresponding day of report.
+
+        Returns
+        -------
+        out : ImputedDelay
+        """
+        day = {
+            "reporting_delay_hd": "day_report",
+            "reporting_delay_rki": "day_report_rki",
+        }[column]
+        days = delay.loc[delay_imputed.index, day].to_numpy(dtype=np.int64)
+        onset_days = pd.DataFrame(
+            days[:, None] - delay_imputed.to_numpy().round(),
+            index=delay_imputed.index,
+            columns=delay_imputed.columns,
+        )
+        return cls(delay, onset_days)
+
+    def original(self):
+        """
+        Return the cases with observed onset.
+
+        As for the imputations, the reporting delays are computed from the days of report
+        and onset. Cases with negative reporting delay keep their delays.
+        """
+        original = self.delay[self.delay["day_onset"].notnull()]
+        negative = (original["reporting_delay_hd"] < 0).to_numpy(dtype=bool)
+        original = original.assign(
+            reporting_delay_hd=original["reporting_delay_hd"].where(
+                negative, original["day_report"] - original["day_onset"]
+            ),
+            reporting_delay_rki=original["reporting_delay_rki"].where(
+                negative, original["day_report_rki"] - original["day_onset"]
+            ),
+            imputation="original",
+            imputed=False,
+        )
+        return apply_schema(original)
+
+    def imputation(self, name):
+        """Return the cases with missing onset with their values of imputation `name`."""
+        days = self.onset_days[:, self.names.index(name)]
+        dates = REFERENCE_DATE + days.astype("timedelta64[D]")
+        _, weeks, weekdays, _ = date_features(dates)
+        rows = self.delay.iloc[self.positions]
+        imputed_rows = rows.assign(
+            day_onset=days,
+            date_onset=dates.astype("datetime64[ns]"),
+            week_onset=weeks.astype(np.int8),
+            weekday_onset=pd.Categorical.from_codes(
+                weekdays.astype(np.int8), dtype=WEEKDAY_DTYPE
+            ),
+            reporting_delay_hd=rows["day_report"].to_numpy() - days,
+            reporting_delay_rki=rows["day_report_rki"].to_numpy() - days,
+            imputation=name,
+            imputed=True,
+        )
+        return apply_schema(imputed_rows)
+
+    def __getitem__(self, name):
+        return self.original() if name == "original" else self.imputation(name)
+
+    def items(self):
+        """Iterate lazily over the original cases and all imputations as `(name, frame)` pairs."""
+        for name in ["original"] + self.names:
+            yield name, self[name]
+
+    def to_long(self):
+        """Return all cases and imputations in long format (one row per case and imputation)."""
+        return pd.concat([frame for _, frame in self.items()], ignore_index=True)
+
+    def write(self, path):
+        """Write the original cases and all imputations to a partitioned store, one imputation at a time."""
+        for i, (name, frame) in enumerate(self.items()):
+            write_delay_store(frame, path, overwrite=i == 0)
+
+    def memory_usage(self):
+        """Return the memory footprint in bytes."""
+        return (
+            self.delay.memory_usage(deep=True).sum()
+            + self.onset_days.nbytes
+            + self.positions.nbytes
+        )
+
+
+# ## Tests
+
+if __name__ == "__main__":
+    from features import derive_features
+
+    n_rows, n_imputations = 1000000, 20
+    delay_test = pd.DataFrame(
+        {
+            col: pd.to_datetime("2020-02-01")
+            + pd.to_timedelta(np.random.randint(0, 90, n_rows), unit="days")
+            for col in [
+                "date_onset",
+                "date_report",
+                "date_report_rki",
+                "date_confirmation",
+            ]
+        }
+    ).assign(
+        state=pd.Categorical(np.random.choice(["Bayern", "Berlin"], n_rows)),
+        age=np.random.randint(0, 100, n_rows),
+    )
+    delay_test.loc[np.random.random(n_rows) < 0.4, "date_onset"] = pd.NaT
+    delay_test = derive_features(delay_test)
+    missing = delay_test["day_onset"].isnull()
+    delay_imputed_test = pd.DataFrame(
+        np.random.randint(0, 14, (missing.sum(), n_imputations)),
+        index=delay_test.index[missing],
+        columns=[f"imputation_{(1+i):02d}" for i in np.arange(n_imputations)],
+    )
+
+    imputed = ImputedDelay.from_delays(delay_test, delay_imputed_test)
+    long = imputed.to_long()
+    print(
+        {
+            "compact": imputed.memory_usage() / 2 ** 20,
+            "long": long.memory_usage(deep=True).sum() / 2 ** 20,
+        }
+    )
+
+    # Derived onset features of imputed cases equal those derived from the dates
+    first = imputed["imputation_01"]
+    print(
+        first[["week_onset", "weekday_onset"]].equals(
+            derive_features(first)[["week_onset", "weekday_onset"]]
+        )
+    )
+
+    # Original and imputed cases share the definition of the reporting delays, except for
+    # original cases with negative reporting delay
+    original = imputed["original"]
+    negative = (original["reporting_delay_hd"] < 0).to_numpy(dtype=bool)
+    for frame in [original[~negative], first]:
+        print(
+            all(
+                frame[delay_col].equals(
+                    (frame[day_col] - frame["day_onset"]).astype("Int16")
+                )
+                for delay_col, day_col in [
+                    ("reporting_delay_hd", "day_report"),
+                    ("reporting_delay_rki", "day_report_rki"),
+                ]
+            )
+        )
+    print(
+        original[negative][["reporting_delay_hd", "reporting_delay_rki"]].equals(
+            delay_test.loc[original.index[negative]][
+                ["reporting_delay_hd", "reporting_delay_rki"]
+            ]
+        )
+    )
@@ -0,0 +1,294 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# # Kullback-Leibler Divergence of Imputed Values
+# Histogram-based computation of the Kullback-Leibler divergence between the distribution of observed values and the distributions of imputed values, overall or within strata. The values of all methods and strata are binned in a single pass by encoding each value as a combined (method, stratum, value) code and counting the codes. A multi-metric scorer computes the divergences of all strata from a single prediction per cross-validation fold.
+
+# ## Imports
+
+import pandas as pd
+import numpy as np
+
+
+# ## Histograms
+
+
+def histograms(values, codes, n_groups, support=range(25), smoothing=0.00001):
+    """
+    Count the values of each group on a discrete support.
+
+    Parameters
+    ----------
+    values : array_like
+        Values to count. Values are rounded, values outside of the support are ignored.
+    codes : array_like
+        Group of each value as integer code in `[0, n_groups)`. Values with negative codes are ignored.
+    n_groups : int
+        Number of groups.
+    support : iterable
+        Valid values of the support of the distributions.
+    smoothing : float
+        Count used for values of the support which do not occur in a group.
+
+    Returns
+    -------
+    out : ndarray
+        Counts with shape (n_groups, len(support)).
+    """
+    support = np.sort(np.asarray(list(support), dtype=np.float64))
+    values = np.rint(np.asarray(values, dtype=np.float64))
+    codes = np.asarray(codes, dtype=np.int64)
+
+    # Position of each value in the support
+    ix = np.minimum(np.searchsorted(support, values), len(support) - 1)
+    valid = (support[ix] == values) & (codes >= 0)
+
+    counts = np.bincount(
+        codes[valid] * len(support) + ix[valid], minlength=n_groups * len(support)
+    ).reshape(n_groups, len(support))
+    return np.where(counts > 0, counts, smoothing)
+
+
+def divergence(p, q):
+    """Compute the Kullback-Leibler divergence of the rows of two (unnormalized) histograms."""
+    p = p / p.sum(axis=-1, keepdims=True)
+    q = q / q.sum(axis=-1, keepdims=True)
+    return (p * np.log(p / q)).sum(axis=-1)
+
+
+def _divergences(arrays, strata_codes, n_strata, support, smoothing):
+    """Divergences of arrays[1:] from arrays[0] with shape (len(arrays) - 1, n_strata)."""
+    counts = histograms(
+        np.concatenate([np.asarray(v, dtype=np.float64) for v in arrays]),
+        np.concatenate(
+            [np.where(c >= 0, i * n_strata + c, -1) for i, c in enumerate(strata_codes)]
+        ),
+        len(arrays) * n_strata,
+        support=support,
+        smoothing=smoothing,
+    ).reshape(len(arrays), n_strata, -1)
+    return divergence(counts[:1], counts[1:])
+
+
+# ## Divergence Tables
+
+
+def kl_table(y, imputed, strata=None, support=range(25), smoothing=0.00001):
+    """
+    Compute the Kullback-Leibler divergence between observed and imputed values of all methods and strata.
+
+    Parameters
+    ----------
+    y : array_like
+        Observed values.
+    imputed : dict
+        Imputed values of each method, with the same length as `y` if `strata` is given.
+    strata : array_like, optional
+        Stratum of each value. If `None`, the divergence over all values is computed.
+    support : iterable
+        Valid values of the support of the distributions.
+    smoothing : float
+        Count used for values of the support which do not occur in a stratum.
+
+    Returns
+    -------
+    out : DataFrame
+        Divergences with one row per method and one column per stratum.
+    """
+    if strata is None:
+        labels = ["All"]
+        strata_codes = [
+            np.zeros(len(v), dtype=np.int64) for v in [y, *imputed.values()]
+        ]
+    else:
+        codes, labels = pd.factorize(np.asarray(strata), sort=True)
+        strata_codes = [codes] * (len(imputed) + 1)
+
+    # Bin the observed values (group 0) and the values of all methods in a single pass
+    divergences = _divergences(
+        [y, *imputed.values()], strata_codes, len(labels), support, smoothing
+    )
+    return pd.DataFrame(divergences, index=list(imputed), columns=labels)
+
+
+def kl_divergence(arr1, arr2, support=range(25), smoothing=0.00001):
+    """
+    Compute Kullback-Leibler divergence between two discrete distributions, given samples from each distribution.
+
+    Parameters
+    ----------
+    arr1, arr2 : array_like
+        Arrays of samples from two distributions to compare.
+    support : iterable
+        Valid values of the support of the distributions.
+    smoothing : float
+        Count used for values of the support which do not occur in a sample.
+    """
+    return kl_table(arr1, {"": arr2}, support=support, smoothing=smoothing).iloc[0, 0]
+
+
+# ## Scorer
+
+
+class StratifiedKLScorer:
+    """
+    Multi-metric scikit-learn scorer for the Kullback-Leibler divergence overall and within strata.
+
+    The estimator predicts each test fold once and the strata of the test instances are looked
+    up by index in integer codes computed once for the full data set, so that the cost of
+    scoring does not grow with the number of strata. The scorer is passed as `scoring` to
+    `sklearn.model_selection.cross_validate` (scikit-learn >= 0.24) and returns the score
+    "KL-Divergence" and one score "KL-Divergence {variable}={stratum}" per stratum.
+
+    Parameters
+    ----------
+    strata : DataFrame, optional
+        Stratification variables (one per column) of all instances, with the index of the
+        data passed to cross-validation.
+    support : iterable
+        Valid values of the support of the distributions.
+    smoothing : float
+        Count used for values of the support which do not occur in a stratum.
+
+    """
+
+    def __init__(self, strata=None, support=range(25), smoothing=0.00001):
+        self.strata = strata
+        self.support = support
+        self.smoothing = smoothing
+
+        self.codes_, self.labels_ = dict(), dict()
+        if strata is not None:
+            self.index_ = strata.index
+            for col in strata.columns:
+                self.codes_[col], self.labels_[col] = pd.factorize(
+                    strata[col], sort=True
+                )
+
+    def __call__(self, estimator, X, y_true, sample_weight=None):
+        return self.score(y_true, estimator.predict(X), X.index)
+
+    def score(self, y_true, y_pred, index):
+        """Compute the divergences of predictions for the instances with labels `index`."""
+        arrays = [y_true, y_pred]
+        overall = np.zeros(len(index), dtype=np.int64)
+        scores = {
+            "KL-Divergence": _divergences(
+                arrays, [overall, overall], 1, self.support, self.smoothing
+            )[0, 0]
+        }
+        if not self.codes_:
+            return scores
+
+        positions = self.index_.get_indexer(index)
+        if (positions < 0).any():
+            raise ValueError("Instances are missing from the strata.")
+        for col, codes in self.codes_.items():
+            labels = self.labels_[col]
+            divergences = _divergences(
+                arrays,
+                [codes[positions]] * 2,
+                len(labels),
+                self.support,
+                self.smoothing,
+            )[0]
+            scores.update(
+                {
+                    f"KL-Divergence {col}={label}": score
+                    for label, score in zip(labels, divergences)
+                }
+            )
+        return scores
+
+
+# ## Tests
+
+if __name__ == "__main__":
+    import timeit
+    from scipy.stats import entropy
+
+    def compute_kl(arr1, arr2, vrange):
+        """Previous implementation based on value counts."""
+        arr1_c = (
+            pd.Series(arr1)
+            .round()
+            .value_counts()
+            .sort_index()
+            .reindex(vrange)
+            .fillna(0.00001)
+        )
+        arr2_c = (
+            pd.Series(arr2)
+            .round()
+            .value_counts()
+            .sort_index()
+            .reindex(vrange)
+            .fillna(0.00001)
+        )
+        return entropy(arr1_c, arr2_c)
+
+    def kl_div_strata_loop(y, imputed, strata):
+        """Previous implementation with one mask per stratum."""
+        return pd.DataFrame(
+            {
+                s: {
+                    k_imp: compute_kl(y[strata == s], imp[strata == s], range(25))
+                    for k_imp, imp in imputed.items()
+                }
+                for s in np.unique(strata)
+            }
+        )
+
+    n_rows = 500000
+    y_test = np.random.poisson(6, n_rows).astype(np.float64)
+    imputed_test = {
+        f"method_{i}": np.random.poisson(5 + i, n_rows)
+        + np.random.normal(0, 0.3, n_rows)
+        for i in range(4)
+    }
+    strata_test = np.random.choice([f"State {i:02d}" for i in range(16)], n_rows)
+
+    # Both implementations yield the same divergences
+    print(
+        np.allclose(
+            kl_table(y_test, imputed_test, strata_test).to_numpy(),
+            kl_div_strata_loop(y_test, imputed_test, strata_test).to_numpy(),
+        )
+    )
+
+    # The scorer predicts once for all strata and yields the divergences of kl_table
+    class Identity:
+        def predict(self, X):
+            return X["pred"].to_numpy()
+
+    X_score = pd.DataFrame(
+        {"pred": imputed_test["method_0"], "state": strata_test},
+        index=np.random.permutation(n_rows),
+    )
+    scores = StratifiedKLScorer(strata=X_score[["state"]])(
+        Identity(), X_score.iloc[::2], y_test[::2]
+    )
+    print(
+        np.allclose(
+            [scores[f"KL-Divergence state={s}"] for s in np.unique(strata_test)],
+            kl_table(
+                y_test[::2], {"": imputed_test["method_0"][::2]}, strata_test[::2]
+            ).to_numpy()[0],
+        )
+    )
+
+    # Compare runtimes
+    print(
+        min(
+            timeit.repeat(
+                lambda: kl_div_strata_loop(y_test, imputed_test, strata_test),
+                repeat=3,
+                number=1,
+            )
+        ),
+        min(
+            timeit.repeat(
+                lambda: kl_table(y_test, imputed_test, strata_test), repeat=3, number=1
+            )
+        ),
+    )
@@ -0,0 +1,404 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# # Test of the Missing-At-Random Hypothesis
+# The missingness of a variable is related to the other features if classifiers predict it better from the features than from randomly permuted features (zero information). Instead of cross-validating all classifiers on the full data, they are compared on stratified subsamples of growing size until the difference of the scores with real and permuted features is either significant or negligible for every classifier. The permuted baseline is generated by shuffling the columns of the subsample in place and all (classifier, features, fold) fits run in parallel.
+# A permutation test yields a p-value for the hypothesis that missingness is predictable from the (categorical) features. Its classifier predicts the rate of missingness within each cell of feature values, so that it is fitted and evaluated by counting. Permuting the missingness indicator only changes the number of missing values per cell (of the training and of the test instances), which follows a multivariate hypergeometric distribution. The null distribution is therefore drawn in batches of counts instead of permuting millions of rows.
+
+# ## Imports
+
+import pandas as pd
+import numpy as np
+
+from scipy import stats
+
+from sklearn.base import clone
+from sklearn.metrics import get_scorer
+from sklearn.model_selection import StratifiedKFold
+from joblib import Parallel, delayed
+
+
+# Import own code from other directory
+import sys
+
+sys.path.append("../../code/imputation")
+
+from encoding import to_matrix
+
+
+# ## Subsamples
+
+
+def stratified_order(y, random_state=None):
+    """
+    Draw a random order of the instances whose prefixes are stratified subsamples.
+
+    Returns
+    -------
+    out : function
+        Function mapping a sample size `n` to the sorted positions of a stratified random
+        sample of `n` instances. Samples of increasing size are nested.
+    """
+    rng = np.random.default_rng(random_state)
+    y = np.asarray(y, dtype=bool)
+    positives = rng.permutation(np.flatnonzero(y))
+    negatives = rng.permutation(np.flatnonzero(~y))
+
+    def sample(n):
+        n_positives = int(round(n * len(positives) / len(y)))
+        return np.sort(
+            np.concatenate([positives[:n_positives], negatives[: n - n_positives]])
+        )
+
+    return sample
+
+
+def permute_columns(X, random_state=None):
+    """Permute each column of a 2-D array independently and in place."""
+    rng = np.random.default_rng(random_state)
+    return rng.permuted(X, axis=0, out=X)
+
+
+# ## Test
+
+
+def _fit_score(model, X, y, train, test, scorer):
+    model = clone(model).fit(X[train], y[train])
+    return scorer(model, X[test], y[test])
+
+
+def mar_test(
+    X,
+    y,
+    models,
+    scoring="f1",
+    cv=5,
+    min_size=10000,
+    growth=3,
+    alpha=0.05,
+    tolerance=0.01,
+    n_jobs=None,
+    random_state=None,
+):
+    """
+    Compare classifiers for missingness on real and on randomly permuted features.
+
+    For each subsample size, every undecided classifier is cross-validated on the real and
+    on the column-wise permuted features of the same folds. The fold-wise score differences
+    are tested with a paired t-test. A classifier is decided once the difference is
+    significant and exceeds `tolerance` ("predictable") or its confidence interval lies
+    within `tolerance` of zero ("not predictable"). The subsample grows until all
+    classifiers are decided or the full data is used.
+
+    Parameters
+    ----------
+    X : DataFrame, ndarray or sparse matrix
+        Features, e.g. the output of `FeatureEncoder.transform`.
+    y : array_like
+        Missingness indicator.
+    models : dict
+        Classifiers to compare.
+    scoring : str
+        Scikit-learn scorer.
+    cv : int
+        Number of stratified folds.
+    min_size : int
+        Size of the first subsample.
+    growth : float
+        Factor by which the subsample grows.
+    alpha : float
+        Level of the test and of the confidence intervals.
+    tolerance : float
+        Score difference below which classifiers are considered uninformed.
+    n_jobs : int, optional
+        Number of processes to run the fits on.
+    random_state : int, optional
+        Seed of subsampling, permutations and folds.
+
+    Returns
+    -------
+    out : DataFrame
+        Mean scores with real and permuted features, their difference, the p-value and the
+        decision of each classifier and subsample size.
+
+    """
+    seeds = np.random.SeedSequence(random_state).spawn(2)
+    rng = np.random.default_rng(seeds[0])
+    X = to_matrix(X)
+    y = np.asarray(y, dtype=bool)
+    sample = stratified_order(y, seeds[1])
+    scorer = get_scorer(scoring)
+
+    results = []
+    undecided = list(models)
+    n = min(min_size, len(y))
+    while undecided:
+        rows = sample(n)
+        X_sub = X[rows]
+        X_sub = X_sub.toarray() if hasattr(X_sub, "toarray") else np.array(X_sub)
+        X_sub = X_sub.astype(np.float32)
+        X_permuted = permute_columns(X_sub.copy(), rng)
+        y_sub = y[rows]
+
+        folds = list(
+            StratifiedKFold(
+                cv, shuffle=True, random_state=int(rng.integers(2 ** 31))
+            ).split(X_sub, y_sub)
+        )
+        tasks = [
+            (name, features, train, test)
+            for name in undecided
+            for features in [X_sub, X_permuted]
+            for train, test in folds
+        ]
+        scores = Parallel(n_jobs=n_jobs)(
+            delayed(_fit_score)(models[name], features, y_sub, train, test, scorer)
+            for name, features, train, test in tasks
+        )
+        scores = np.reshape(scores, (len(undecided), 2, cv))
+
+        for name, (real, permuted) in zip(list(undecided), scores):
+            difference = real - permuted
+            se = difference.std(ddof=1) / np.sqrt(cv)
+            if se > 0:
+                p_value = stats.ttest_rel(real, permuted).pvalue
+            else:
+                p_value = 0.0 if difference.mean() != 0 else 1.0
+            bound = abs(difference.mean()) + stats.t.ppf(1 - alpha / 2, cv - 1) * se
+            if p_value < alpha and difference.mean() > tolerance:
+                decision = "predictable"
+            elif bound < tolerance:
+                decision = "not predictable"
+            else:
+                decision = "undecided"
+            if decision != "undecided" or n == len(y):
+                undecided.remove(name)
+            results.append(
+                {
+                    "size": n,
+                    "model": name,
+                    "score": real.mean(),
+                    "score_permuted": permuted.mean(),
+                    "difference": difference.mean(),
+                    "p_value": p_value,
+                    "decision": decision,
+                }
+            )
+        n = min(int(n * growth), len(y))
+
+    return pd.DataFrame(results)
+
+
+# ## Permutation Test
+
+
+def cell_codes(X, encoder=None):
+    """
+    Encode each combination of feature values as an integer cell code.
+
+    Parameters
+    ----------
+    X : DataFrame
+        Features with categorical and discrete numerical columns.
+    encoder : FeatureEncoder, optional
+        Fitted encoder to compute the codes of the categorical columns with. Other columns
+        are factorized.
+
+    Returns
+    -------
+    out : ndarray
+        Codes in `[0, n_cells)`, where `n_cells` is the number of observed cells.
+    """
+    codes = encoder.codes(X) if encoder is not None else dict()
+    columns = [
+        codes[col] if col in codes else pd.factorize(X[col], sort=True)[0]
+        for col in X.columns
+    ]
+    return np.unique(np.column_stack(columns), axis=0, return_inverse=True)[1].ravel()
+
+
+def _log_likelihood_gain(positives_train, n_train, positives_test, n_test):
+    """Mean gain in test log-likelihood of cell rates over the overall rate, per row of counts."""
+    prior = positives_train.sum(axis=-1, keepdims=True) / n_train.sum()
+    rate = (positives_train + prior) / (n_train + 1)
+    negatives_test = n_test - positives_test
+    gain = positives_test * np.log(rate / prior) + negatives_test * np.log(
+        (1 - rate) / (1 - prior)
+    )
+    return gain.sum(axis=-1) / n_test.sum()
+
+
+def _null_statistics(n_train, n_test, n_positives, n_permutations, seed):
+    """Draw the cell counts of positives of a batch of permutations and compute their statistics."""
+    positives = np.random.default_rng(seed).multivariate_hypergeometric(
+        np.concatenate([n_train, n_test]),
+        n_positives,
+        size=n_permutations,
+        method="marginals",
+    )
+    return _log_likelihood_gain(
+        positives[:, : len(n_train)], n_train, positives[:, len(n_train) :], n_test,
+    )
+
+
+def permutation_test(
+    X,
+    y,
+    encoder=None,
+    n_permutations=1000,
+    test_size=0.5,
+    batch_size=64,
+    n_jobs=None,
+    random_state=None,
+):
+    """
+    Permutation test of the hypothesis that missingness is predictable from the features.
+
+    The test statistic is the mean gain in log-likelihood of held-out instances when
+    predicting missingness by its (smoothed) rate within the cell of feature values of the
+    training instances instead of its overall rate. Its null distribution is obtained by
+    randomly permuting the missingness indicator.
+
+    Parameters
+    ----------
+    X : DataFrame
+        Features with categorical and discrete numerical columns.
+    y : array_like
+        Missingness indicator.
+    encoder : FeatureEncoder, optional
+        Fitted encoder, see `cell_codes`.
+    n_permutations : int
+        Number of permutations.
+    test_size : float
+        Fraction of held-out instances.
+    batch_size : int
+        Number of permutations drawn at once. Each batch has its own seed, so the results
+        do not depend on `n_jobs`.
+    n_jobs : int, optional
+        Number of processes to draw the batches of permutations on.
+    random_state : int, optional
+        Seed of the split and the permutations.
+
+    Returns
+    -------
+    statistic : float
+        Test statistic of the data.
+    p_value : float
+        Fraction of permutations (including the data) with a statistic at least as large.
+    null : ndarray
+        Test statistics of the permutations.
+
+    """
+    seeds = np.random.SeedSequence(random_state).spawn(2)
+    y = np.asarray(y, dtype=bool)
+    cells = cell_codes(X, encoder)
+    n_cells = cells.max() + 1
+    test = np.random.default_rng(seeds[0]).random(len(y)) < test_size
+
+    n_train = np.bincount(cells[~test], minlength=n_cells)
+    n_test = np.bincount(cells[test], minlength=n_cells)
+    statistic = _log_likelihood_gain(
+        np.bincount(cells[~test & y], minlength=n_cells),
+        n_train,
+        np.bincount(cells[test & y], minlength=n_cells),
+        n_test,
+    )
+
+    # Permutations are split into batches of fixed size with independent seeds
+    starts = range(0, n_permutations, batch_size)
+    null = np.concatenate(
+        Parallel(n_jobs=n_jobs)(
+            delayed(_null_statistics)(
+                n_train, n_test, y.sum(), min(batch_size, n_permutations - start), seed,
+            )
+            for start, seed in zip(starts, seeds[1].spawn(len(starts)))
+        )
+    )
+    p_value = (1 + (null >= statistic).sum()) / (1 + n_permutations)
+    return statistic, p_value, null
+
+
+# ## Tests
+
+if __name__ == "__main__":
+    import time
+    from sklearn.dummy import DummyClassifier
+    from sklearn.tree import DecisionTreeClassifier
+    from sklearn.neighbors import KNeighborsClassifier
+
+    n_rows = 300000
+    X_test = pd.DataFrame(
+        {
+            "age": np.random.randint(0, 100, n_rows),
+            "state": np.random.randint(0, 16, n_rows),
+        }
+    )
+    models_test = {
+        "dummy": DummyClassifier(strategy="stratified"),
+        "knn": KNeighborsClassifier(3),
+        "decision_tree": DecisionTreeClassifier(max_depth=20, class_weight="balanced"),
+    }
+
+    # Missingness related to age is detected, random missingness is not
+    for name, missing in {
+        "MNAR": np.random.random(n_rows) < 0.2 + 0.3 * (X_test["age"] > 80),
+        "MCAR": np.random.random(n_rows) < 0.25,
+    }.items():
+        start = time.perf_counter()
+        result = mar_test(X_test, missing, models_test, n_jobs=4, random_state=0)
+        print(name, time.perf_counter() - start)
+        print(result)
+
+    # Permutation test on categorical features
+    X_cat = X_test.assign(age_group=X_test["age"] // 10).drop("age", axis=1)
+    for name, missing in {
+        "MNAR": np.random.random(n_rows) < 0.2 + 0.05 * (X_test["age"] > 80),
+        "MCAR": np.random.random(n_rows) < 0.25,
+    }.items():
+        start = time.perf_counter()
+        statistic, p_value, null = permutation_test(
+            X_cat, missing, n_permutations=1000, n_jobs=4, random_state=0
+        )
+        print(name, time.perf_counter() - start, statistic, p_value)
+
+    # The null distribution does not depend on the number of jobs
+    print(
+        all(
+            np.array_equal(
+                permutation_test(
+                    X_cat, missing, n_permutations=200, n_jobs=n_jobs, random_state=0
+                )[2],
+                permutation_test(
+                    X_cat, missing, n_permutations=200, n_jobs=1, random_state=0
+                )[2],
+            )
+            for n_jobs in [-1, 2, 3]
+        )
+    )
+
+    # Drawn counts have the distribution of counts of permuted indicators
+    cells_test = cell_codes(X_cat.iloc[:1000])
+    missing_test = np.random.random(1000) < 0.3
+    counts_permuted = np.mean(
+        [
+            np.bincount(
+                cells_test, np.random.permutation(missing_test), cells_test.max() + 1
+            )
+            for _ in range(2000)
+        ],
+        axis=0,
+    )
+    counts_drawn = np.random.default_rng(0).multivariate_hypergeometric(
+        np.bincount(cells_test), missing_test.sum(), size=2000, method="marginals"
+    )
+    print(np.abs(counts_permuted - counts_drawn.mean(axis=0)).max() < 0.25)
+
+    # Column-wise permutation preserves the values of each column
+    X_perm = X_test.to_numpy().copy()
+    permute_columns(X_perm, 0)
+    print(
+        all(
+            np.array_equal(np.sort(X_perm[:, j]), np.sort(X_test.iloc[:, j]))
+            for j in range(X_perm.shape[1])
+        )
+    )
@@ -0,0 +1,259 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# # Model Cache
+# Persistent cache of fitted imputation models. Each entry holds a fitted regressor together with its predictions for the training instances (the predictions of the donors in predictive mean matching). Entries are keyed by a content hash of the training data, the parameters of the estimator and the seed, so that re-running the imputation or cross-validation on unchanged data skips all fitting. The least recently used entries are evicted once the total size of the cache exceeds a limit.
+
+# ## Imports
+
+import pandas as pd
+import numpy as np
+
+import os
+import numbers
+import hashlib
+import tempfile
+
+import joblib
+
+import scipy.sparse as sp
+
+
+# ## Fingerprints
+
+# Parameters which do not change the fitted model (including those of nested estimators)
+IGNORED_PARAMS = ["cache", "n_jobs"]
+
+
+def fingerprint(estimator, X, y, seed=None, sample=None):
+    """
+    Compute a content hash of an estimator fitted on X and y.
+
+    Parameters
+    ----------
+    estimator : sklearn Estimator
+        Unfitted estimator, only its class and parameters are used, except for the
+        parameters in `IGNORED_PARAMS`.
+    X : array_like
+        Training data.
+    y : array_like
+        Target values.
+    seed : object, optional
+        Seed used for fitting, must have a deterministic `repr`.
+    sample : array_like, optional
+        Positions of the instances the estimator is fitted on (e.g. a bootstrap sample).
+
+    Returns
+    -------
+    out : str
+        Hexadecimal SHA-256 digest.
+
+    """
+    h = hashlib.sha256()
+    h.update(type(estimator).__name__.encode())
+    # Nested estimators are represented by their class, their parameters are listed separately
+    params = {
+        name: type(value).__name__ if hasattr(value, "get_params") else value
+        for name, value in estimator.get_params(deep=True).items()
+        if name.split("__")[-1] not in IGNORED_PARAMS
+    }
+    h.update(repr(sorted(params.items())).encode())
+    h.update(repr(seed).encode())
+    for data in [X, y, sample]:
+        if data is None:
+            continue
+        if sp.issparse(data):
+            data = data.tocsr()
+            h.update(repr((data.dtype.str, data.shape)).encode())
+            for array in [data.data, data.indices, data.indptr]:
+                h.update(np.ascontiguousarray(array).tobytes())
+        elif isinstance(data, (pd.DataFrame, pd.Series)):
+            names = data.columns if isinstance(data, pd.DataFrame) else [data.name]
+            h.update(repr(list(names)).encode())
+            h.update(pd.util.hash_pandas_object(data).to_numpy().tobytes())
+        else:
+            data = np.ascontiguousarray(data)
+            h.update(repr((data.dtype.str, data.shape)).encode())
+            h.update(data.tobytes())
+    return h.hexdigest()
+
+
+def is_deterministic(estimator):
+    """
+    Check whether all random states of an estimator (including those of nested estimators) are integers.
+
+    Estimators with other random states (None, RandomState or Generator objects) yield a
+    different model on every fit, so they must not be served from a cache.
+    """
+    return all(
+        isinstance(value, numbers.Integral)
+        for name, value in estimator.get_params(deep=True).items()
+        if name.split("__")[-1] == "random_state"
+    )
+
+
+# ## Cache
+
+
+class ModelCache:
+    """
+    Persistent cache of fitted regressors and their predictions for the training instances.
+
+    Parameters
+    ----------
+    directory : str
+        Directory to store the cache entries in. It is created if it does not exist.
+    max_bytes : int
+        Maximum total size of all entries. The least recently used entries are evicted
+        once this size is exceeded.
+
+    """
+
+    def __init__(self, directory, max_bytes=2 ** 30):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, estimator, X, y, seed=None, sample=None):
+        """Compute the key of an estimator fitted on X and y (see `fingerprint`)."""
+        return fingerprint(estimator, X, y, seed=seed, sample=sample)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.joblib")
+
+    def get(self, key):
+        """Return the entry stored under `key` or `None` if there is no such entry."""
+        path = self._path(key)
+        try:
+            entry = joblib.load(path)
+        except FileNotFoundError:
+            return None
+        # Mark entry as recently used
+        os.utime(path)
+        return entry
+
+    def put(self, key, entry):
+        """Store an entry under `key` and evict least recently used entries if necessary."""
+        # Write to a temporary file first, so that concurrent readers never see partial entries
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        os.close(fd)
+        joblib.dump(entry, tmp)
+        os.replace(tmp, self._path(key))
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until the total size does not exceed `max_bytes`."""
+        entries = []
+        for filename in os.listdir(self.directory):
+            if not filename.endswith(".joblib"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, filename))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, filename))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, filename in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, filename))
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def fit_predict(self, estimator, X, y, seed=None, sample=None):
+        """
+        Fit an estimator and predict all instances of X, or load both from the cache.
+
+        Estimators whose random state is not an integer are always fitted and never stored
+        (see `is_deterministic`).
+
+        Parameters
+        ----------
+        estimator : sklearn Estimator
+            Estimator to fit. It is fitted in place if there is no cache entry.
+        X : array_like
+            Training data.
+        y : array_like
+            Target values.
+        seed : object, optional
+            Seed used for fitting, part of the key (see `key`).
+        sample : array_like, optional
+            Positions of the instances to fit the estimator on. If `None`, all instances are used.
+
+        Returns
+        -------
+        estimator : sklearn Estimator
+            Fitted estimator.
+        pred : ndarray
+            Predictions for all instances of X.
+
+        """
+        deterministic = is_deterministic(estimator)
+        key = self.key(estimator, X, y, seed=seed, sample=sample)
+        entry = self.get(key) if deterministic else None
+        if entry is None:
+            if sample is None:
+                estimator.fit(X, y)
+            elif isinstance(X, pd.DataFrame):
+                estimator.fit(X.iloc[sample], np.asarray(y)[sample])
+            else:
+                estimator.fit(X[sample], np.asarray(y)[sample])
+            entry = (estimator, estimator.predict(X))
+            if deterministic:
+                self.put(key, entry)
+        return entry
+
+
+# ## Tests
+
+if __name__ == "__main__":
+    import sys
+    import time
+    from sklearn.ensemble import RandomForestRegressor
+
+    X_test = pd.DataFrame(np.random.normal(size=(100000, 10)))
+    y_test = X_test.sum(axis=1) + np.random.normal(size=100000)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ModelCache(tmp)
+        for run in ["fit", "cached"]:
+            start = time.perf_counter()
+            regressor, pred = cache.fit_predict(
+                RandomForestRegressor(n_estimators=10, random_state=0), X_test, y_test
+            )
+            print(run, time.perf_counter() - start)
+
+        # Changed data or parameters are not served from the cache
+        print(
+            cache.key(RandomForestRegressor(n_estimators=10), X_test, y_test)
+            != cache.key(RandomForestRegressor(n_estimators=20), X_test, y_test)
+            != cache.key(RandomForestRegressor(n_estimators=20), X_test, y_test + 1)
+        )
+
+        # Separately built equal estimators have the same key, whatever their cache
+        sys.path.append("../../code/imputation")
+        from imputation_methods import PmmImputer
+
+        print(
+            fingerprint(
+                PmmImputer(RandomForestRegressor(n_jobs=2), cache=cache), X_test, y_test
+            )
+            == fingerprint(
+                PmmImputer(RandomForestRegressor(), cache=ModelCache(tmp)),
+                X_test,
+                y_test,
+            )
+        )
+
+        # Estimators without an integer random state are refitted and not stored
+        n_entries = len(os.listdir(tmp))
+        cache.fit_predict(RandomForestRegressor(n_estimators=10), X_test, y_test)
+        print(len(os.listdir(tmp)) == n_entries)
+
+        # Least recently used entries are evicted
+        cache.max_bytes = 0
+        cache.evict()
+        print(len(os.listdir(tmp)) == 0)
@@ -80,20 +80,32 @@ from sklearn.utils import indexable, check_random_state
 from sklearn.utils.validation import _num_samples
 
 
+# Import own code from other directory
+import sys
+
+sys.path.append("../../code/preprocessing")
+
+from storage import read_delay_store
+from walk_forward import WalkForwardSplit, walk_forward_predict, refit_tradeoff
+from lag_matrix import lag_matrix, lag_columns
+
+
 # ## Data Loading and Preparation
 
-delay = pd.read_pickle("../../data/processed/delay_2020-05-06_imputation_01.pl")
+delay = read_delay_store(
+    "../../data/processed/delay_2020-05-06_imputed.parquet",
+    columns=["date_onset", "imputation", "reporting_delay_rki"],
+    imputations=["original", "imputation_01"],
+)
 
 
 onset = (
-    delay.groupby(["date_onset", "imputation"])
+    delay.groupby(["date_onset", "imputation"], observed=True)
     .size()
     .reset_index()
     .rename(columns={0: "count"})
 )
-onset = onset.query("imputation=='original' | imputation=='imputation_01'").sort_values(
-    "imputation", ascending=False
-)
+onset = onset.sort_values("imputation", ascending=False)
 px.bar(
     onset,
     x="date_onset",
@@ -207,21 +219,9 @@ es_levels = pd.concat([e.level for e in es_series], axis=1, keys=nowcast_ts.colu
 
 # Functionality to formulate nowcasting as a regression task and structure training data accordingly
 
-
-def normalize_window(ts, levels, kind=None):
-    if kind == "multiplicative":
-        normalized = pd.DataFrame(
-            ts.to_numpy() / levels.to_numpy(), columns=ts.columns, index=ts.index
-        )
-        normalized[ts == 0] = 0
-    elif kind == "additive":
-        normalized = pd.DataFrame(
-            ts.to_numpy() - levels.to_numpy(), columns=ts.columns, index=ts.index
-        )
-    else:
-        normalized = ts
-
-    return normalized
+# Series and levels as arrays, converted once for all training data configurations
+nowcast_values = nowcast_ts.to_numpy(dtype=np.float64)
+level_values = es_levels.to_numpy(dtype=np.float64)
 
 
 def normalize_window_backwards(df, levels, kind=None):
@@ -235,36 +235,36 @@ def normalize_window_backwards(df, levels, kind=None):
     return renormalized
 
 
-def rename_shift(series, shift):
-    return [
-        s.replace("N(T", f"N((T-{shift})").replace(",T)", f",T-{shift})")
-        for s in series
-    ]
-
-
 def get_training_data(
-    cut_off, input_window, exogenous_series, forecast_horizon, norm_kind=None
+    cut_off,
+    input_window,
+    exogenous_series,
+    forecast_horizon,
+    norm_kind=None,
+    as_frame=True,
 ):
+    """
+    Return the training data as data frame with named columns and a "target" column or,
+    with as_frame=False, as arrays X and y (e.g. for sweeps over many configurations).
+    """
     series_names = [
         f"N(T-{t},T)" for t in range(cut_off, cut_off - exogenous_series - 1, -1)
     ]
-    ts_list = [nowcast_ts.loc[:, series_names]] + [
-        nowcast_ts.loc[:, series_names]
-        .shift(t)
-        .rename(columns=dict(zip(series_names, rename_shift(series_names, t))))
-        for t in range(1, 1 + input_window)
-    ]
-    ts_list_normalized = [
-        normalize_window(ts, es_levels.loc[:, series_names], kind=norm_kind)
-        for ts in ts_list
-    ]
-    training_data = pd.concat(ts_list_normalized, axis=1)
-    training_data["target"] = normalize_window(
-        nowcast_ts[[f"N(T-{cut_off},T)"]].shift(-forecast_horizon),
-        es_levels[[f"N(T-{cut_off},T)"]],
-        kind=norm_kind,
-    ).iloc[:, 0]
-    training_data = training_data.dropna()
+    X, y, days = lag_matrix(
+        nowcast_values[:, nowcast_ts.columns.get_indexer(series_names)],
+        level_values[:, es_levels.columns.get_indexer(series_names)],
+        input_window=input_window,
+        forecast_horizon=forecast_horizon,
+        norm_kind=norm_kind,
+    )
+    if not as_frame:
+        return X, y
+    training_data = pd.DataFrame(
+        X,
+        index=nowcast_ts.index[days],
+        columns=lag_columns(series_names, input_window),
+    )
+    training_data["target"] = y
     return training_data
 
 
@@ -278,65 +278,6 @@ training_data.head(3)
 # ## Walk-Forward Validation
 
 
-class WalkForwardSplit(TimeSeriesSplit):
-    """Customized Time Series cross-validator for scikit-learn api which allows minimum training size parameter."""
-
-    def __init__(self, n_splits=5, *, max_train_size=None, min_train_size=1):
-        super().__init__(n_splits=n_splits, max_train_size=max_train_size)
-        self.min_train_size = min_train_size
-
-    def split(self, X, y=None, groups=None):
-        """
-        Generate indices to split data into training and test set.
-        
-        Parameters
-        ----------
-        X : array-like of shape (n_samples, n_features)
-            Training data, where n_samples is the number of samples
-            and n_features is the number of features.
-        y : array-like of shape (n_samples,)
-            Always ignored, exists for compatibility.
-        groups : array-like of shape (n_samples,)
-            Always ignored, exists for compatibility.
-            
-        Yields
-        ------
-        train : ndarray
-            The training set indices for that split.
-        test : ndarray
-            The testing set indices for that split.
-        """
-        # X, y, groups = indexable(X, y, groups)
-        n_samples = _num_samples(X)
-        n_splits = self.n_splits
-        n_folds = n_splits + 1
-        if n_folds > n_samples:
-            raise ValueError(
-                (
-                    "Cannot have number of folds ={0} greater"
-                    " than the number of samples: {1}."
-                ).format(n_folds, n_samples)
-            )
-        indices = np.arange(n_samples)
-        test_size = n_samples // n_folds
-        test_starts = range(
-            max(test_size + n_samples % n_folds, self.min_train_size),
-            n_samples,
-            test_size,
-        )
-        for test_start in test_starts:
-            if self.max_train_size and self.max_train_size < test_start:
-                yield (
-                    indices[test_start - self.max_train_size : test_start],
-                    indices[test_start : test_start + test_size],
-                )
-            else:
-                yield (
-                    indices[:test_start],
-                    indices[test_start : test_start + test_size],
-                )
-
-
 def make_weighted_interval_scorer(quantiles, alphas, weights=None, component="total"):
     if component == "total":
         comp_i = 0
@@ -537,6 +478,14 @@ cv_results.groupby("model").mean()
 
 # In the normalized setting, the clear superior performance of linear quantile regression vanishes and the boosters perform roughly on par. This indicates that normalization using exponential smoothing may really be a way to overcome extrapolation problems with tree-based learners in time series prediction tasks.
 
+# #### 3) Incremental refitting of the boosters
+# Instead of refitting the boosters from scratch on each window, boosting is continued from the model of the previous window and the models are only refitted from scratch every few days. Accuracy and wall time are compared to refitting every window.
+
+for modelname in ["lightgbm", "catbqr"]:
+    print(modelname)
+    print(refit_tradeoff(models[modelname], X, y, min_train_size=min_train_size))
+
+
 # ## Visualize out-of-sample predictions
 
 model = LightGBMQuantileRegressor(quantiles=[0.05, 0.5, 0.95])
@@ -562,26 +511,6 @@ X = training_data.drop("target", axis=1)
 y = training_data["target"]
 
 
-def walk_forward_predict(estimator, X, y, max_train_size=None, min_train_size=1):
-    splitter = WalkForwardSplit(
-        n_splits=len(y) - 1,
-        max_train_size=max_train_size,
-        min_train_size=min_train_size,
-    )
-
-    X = np.array(X)
-    y = np.array(y)
-
-    def pred(estimator, train_i, test_i):
-        cv_model = clone(estimator)
-        cv_model.fit(X[train_i, :], y[train_i])
-        return np.hstack((y[test_i].reshape(-1, 1), cv_model.predict(X[test_i, :])))
-
-    return np.vstack(
-        [pred(estimator, train_i, test_i) for train_i, test_i in splitter.split(X, y)]
-    )
-
-
 walk_forward_preds = pd.DataFrame(
     walk_forward_predict(model, X, y, min_train_size=min_train_size),
     columns=["truth", "lower", "median", "upper"],
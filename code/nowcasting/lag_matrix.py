@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# # Lagged Training Data
+# Construction of the design matrix and target of nowcasting as a time series regression task: the features of each day are the (normalized) values of the reporting delay series on that day and on the `input_window` preceding days, the target is the (normalized) value of one series `forecast_horizon` days ahead. All lags are strided views of a single contiguous array of the series (`sliding_window_view`), which are normalized into the design matrix in one pass, without shifted copies of the series or intermediate data frames. Column names are only generated on request, since sweeps over many configurations only need the arrays.
+
+# ## Imports
+
+import pandas as pd
+import numpy as np
+
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+# ## Normalization
+
+
+def normalize(values, levels, kind=None):
+    """
+    Normalize values by smoothed levels into a new (C-contiguous) array.
+
+    Parameters
+    ----------
+    values : ndarray
+        Values to normalize.
+    levels : ndarray
+        Levels, broadcastable to the shape of `values`.
+    kind : {"multiplicative", "additive"}, optional
+        Divide the values by the levels (zero values stay zero) or subtract the levels.
+        If None, the values are copied unchanged.
+
+    Returns
+    -------
+    out : ndarray
+        Normalized values.
+    """
+    out = np.zeros(np.broadcast_shapes(values.shape, levels.shape))
+    if kind == "multiplicative":
+        np.divide(values, levels, out=out, where=values != 0)
+    elif kind == "additive":
+        np.subtract(values, levels, out=out)
+    else:
+        np.copyto(out, values)
+    return out
+
+
+# ## Lag Matrix
+
+
+def lag_matrix(
+    values, levels, input_window, forecast_horizon, target=0, norm_kind=None
+):
+    """
+    Build the design matrix and target of a time series regression task.
+
+    Parameters
+    ----------
+    values : ndarray
+        Time series with shape (n_days, n_series).
+    levels : ndarray
+        Smoothed levels of the time series with the shape of `values`. The values of all
+        lags and the target are normalized by the levels of the current day.
+    input_window : int
+        Number of preceding days whose values are features in addition to the current day.
+    forecast_horizon : int
+        Number of days between the current day and the target.
+    target : int
+        Series to predict.
+    norm_kind : {"multiplicative", "additive"}, optional
+        Normalization of the values, see `normalize`.
+
+    Returns
+    -------
+    X : ndarray
+        Features with shape (n_instances, (input_window + 1) * n_series): the values of all
+        series on the current day, followed by those of each preceding day.
+    y : ndarray
+        Target of each instance.
+    days : ndarray
+        Current day (row of `values`) of each instance. Days with missing features or
+        target are dropped.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    levels = np.asarray(levels, dtype=np.float64)
+    n_days, n_series = values.shape
+
+    # Windows of input_window + 1 days as view, reversed to lag order
+    windows = sliding_window_view(values, input_window + 1, axis=0)[:, :, ::-1]
+    current = levels[input_window:]
+    X = normalize(
+        windows.transpose(0, 2, 1), current[:, None, :], kind=norm_kind
+    ).reshape(n_days - input_window, -1)
+
+    y = np.full(n_days - input_window, np.nan)
+    n_targets = max(0, n_days - input_window - forecast_horizon)
+    y[:n_targets] = values[input_window + forecast_horizon :, target]
+    y = normalize(y, current[:, target], kind=norm_kind)
+
+    days = np.arange(input_window, n_days)
+    complete = ~(np.isnan(X).any(axis=1) | np.isnan(y))
+    if not complete.all():
+        X, y, days = X[complete], y[complete], days[complete]
+    return X, y, days
+
+
+def lag_columns(series_names, input_window):
+    """Names of the columns of `lag_matrix`, e.g. "N((T-1)-30,T-1)" for series "N(T-30,T)" at lag 1."""
+    return list(series_names) + [
+        s.replace("N(T", f"N((T-{t})").replace(",T)", f",T-{t})")
+        for t in range(1, input_window + 1)
+        for s in series_names
+    ]
+
+
+# ## Tests
+
+if __name__ == "__main__":
+    import timeit
+
+    def normalize_window(ts, levels, kind=None):
+        """Previous implementation on data frames."""
+        if kind == "multiplicative":
+            normalized = pd.DataFrame(
+                ts.to_numpy() / levels.to_numpy(), columns=ts.columns, index=ts.index
+            )
+            normalized[ts == 0] = 0
+        elif kind == "additive":
+            normalized = pd.DataFrame(
+                ts.to_numpy() - levels.to_numpy(), columns=ts.columns, index=ts.index
+            )
+        else:
+            normalized = ts
+
+        return normalized
+
+    def rename_shift(series, shift):
+        return [
+            s.replace("N(T", f"N((T-{shift})").replace(",T)", f",T-{shift})")
+            for s in series
+        ]
+
+    def get_training_data_frames(
+        ts, levels, input_window, forecast_horizon, norm_kind=None
+    ):
+        """Previous implementation with shifted copies of the series."""
+        series_names = list(ts.columns)
+        ts_list = [ts] + [
+            ts.shift(t).rename(
+                columns=dict(zip(series_names, rename_shift(series_names, t)))
+            )
+            for t in range(1, 1 + input_window)
+        ]
+        training_data = pd.concat(
+            [normalize_window(s, levels, kind=norm_kind) for s in ts_list], axis=1
+        )
+        training_data["target"] = normalize_window(
+            ts.iloc[:, [0]].shift(-forecast_horizon),
+            levels.iloc[:, [0]],
+            kind=norm_kind,
+        ).iloc[:, 0]
+        return training_data.dropna()
+
+    # Cumulated counts of 31 reporting delays, missing for the most recent days
+    n_days, n_series = 120, 31
+    ts_test = pd.DataFrame(
+        np.cumsum(np.random.poisson(3, (n_days, n_series)), axis=0).astype(np.float64),
+        index=pd.date_range("2020-02-01", periods=n_days, name="T"),
+        columns=[f"N(T-{d},T)" for d in range(n_series - 1, -1, -1)],
+    )
+    ts_test.iloc[:10] = 0
+    for d in range(n_series):
+        ts_test.iloc[n_days - d :, n_series - 1 - d] = np.nan
+    levels_test = ts_test.ewm(alpha=0.2).mean() + 1
+
+    for norm_kind in [None, "multiplicative", "additive"]:
+        expected = get_training_data_frames(
+            ts_test, levels_test, 5, 10, norm_kind=norm_kind
+        )
+        X, y, days = lag_matrix(
+            ts_test.to_numpy(), levels_test.to_numpy(), 5, 10, norm_kind=norm_kind
+        )
+        print(
+            norm_kind,
+            np.array_equal(expected.drop("target", axis=1).to_numpy(), X),
+            np.array_equal(expected["target"].to_numpy(), y),
+            expected.index.equals(ts_test.index[days]),
+            list(expected.columns[:-1]) == lag_columns(ts_test.columns, 5),
+        )
+
+    # Compare runtimes on a grid of input windows and forecast horizons
+    values_test, level_values_test = ts_test.to_numpy(), levels_test.to_numpy()
+    grid = [(w, h) for w in range(1, 15) for h in range(1, 15)]
+    print(
+        min(
+            timeit.repeat(
+                lambda: [
+                    get_training_data_frames(
+                        ts_test, levels_test, w, h, norm_kind="multiplicative"
+                    )
+                    for w, h in grid
+                ],
+                repeat=3,
+                number=1,
+            )
+        ),
+        min(
+            timeit.repeat(
+                lambda: [
+                    lag_matrix(
+                        values_test, level_values_test, w, h, norm_kind="multiplicative"
+                    )
+                    for w, h in grid
+                ],
+                repeat=3,
+                number=1,
+            )
+        ),
+    )
@@ -0,0 +1,378 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# # Walk-Forward Validation
+# Walk-forward validation of quantile regressors on expanding (or sliding) windows of a time series, where each window adds a single day. Instead of refitting every model from scratch, models which support incremental updates (the gradient boosting quantile regressors) can continue boosting from the model of the previous window and are only refitted from scratch every `refit_every` windows. The models of all windows are retained, so that they can be explained and evaluated without refitting, and prediction is deferred until all windows are fitted: the test instances of all windows are predicted with one batched call per model family instead of one call per window. The trade-off between accuracy and wall time of different refit cadences is reported against the refit-from-scratch baseline.
+
+# ## Imports
+
+import pandas as pd
+import numpy as np
+
+import copy
+import time
+
+from sklearn.base import clone
+from sklearn.model_selection import TimeSeriesSplit
+from sklearn.utils.validation import _num_samples
+
+
+# ## Splitter
+
+
+class WalkForwardSplit(TimeSeriesSplit):
+    """Customized Time Series cross-validator for scikit-learn api which allows minimum training size parameter."""
+
+    def __init__(self, n_splits=5, *, max_train_size=None, min_train_size=1):
+        super().__init__(n_splits=n_splits, max_train_size=max_train_size)
+        self.min_train_size = min_train_size
+
+    def split(self, X, y=None, groups=None):
+        """
+        Generate indices to split data into training and test set.
+        
+        Parameters
+        ----------
+        X : array-like of shape (n_samples, n_features)
+            Training data, where n_samples is the number of samples
+            and n_features is the number of features.
+        y : array-like of shape (n_samples,)
+            Always ignored, exists for compatibility.
+        groups : array-like of shape (n_samples,)
+            Always ignored, exists for compatibility.
+            
+        Yields
+        ------
+        train : ndarray
+            The training set indices for that split.
+        test : ndarray
+            The testing set indices for that split.
+        """
+        # X, y, groups = indexable(X, y, groups)
+        n_samples = _num_samples(X)
+        n_splits = self.n_splits
+        n_folds = n_splits + 1
+        if n_folds > n_samples:
+            raise ValueError(
+                (
+                    "Cannot have number of folds ={0} greater"
+                    " than the number of samples: {1}."
+                ).format(n_folds, n_samples)
+            )
+        indices = np.arange(n_samples)
+        test_size = n_samples // n_folds
+        test_starts = range(
+            max(test_size + n_samples % n_folds, self.min_train_size),
+            n_samples,
+            test_size,
+        )
+        for test_start in test_starts:
+            if self.max_train_size and self.max_train_size < test_start:
+                yield (
+                    indices[test_start - self.max_train_size : test_start],
+                    indices[test_start : test_start + test_size],
+                )
+            else:
+                yield (
+                    indices[:test_start],
+                    indices[test_start : test_start + test_size],
+                )
+
+
+# ## Walk-Forward Models
+
+
+class WalkForwardModels:
+    """
+    Models of walk-forward validation, each trained on all instances preceding its window.
+
+    Parameters
+    ----------
+    estimator : sklearn Estimator
+        Quantile regressor. If it has an `update` method (and no cascade), it is updated
+        incrementally between full refits. If its class has a `predict_many` method
+        (e.g. LightGBMQuantileRegressor), the windows of all models are predicted with a
+        single call.
+    max_train_size : int, optional
+        Maximum size of the training window.
+    min_train_size : int
+        Size of the first training window.
+    refit_every : int
+        Number of windows after which the model is refitted from scratch. With 1, every
+        window is refitted.
+    update_estimators : int
+        Number of boosting stages added by each incremental update.
+
+    Attributes
+    ----------
+    models_ : list
+        Fitted model of each window.
+    train_indices_ : list of ndarray
+        Training instances of each window.
+    test_indices_ : list of ndarray
+        Test instances of each window.
+
+    """
+
+    def __init__(
+        self,
+        estimator,
+        max_train_size=None,
+        min_train_size=1,
+        refit_every=1,
+        update_estimators=10,
+    ):
+        self.estimator = estimator
+        self.max_train_size = max_train_size
+        self.min_train_size = min_train_size
+        self.refit_every = refit_every
+        self.update_estimators = update_estimators
+
+    def fit(self, X, y):
+        splitter = WalkForwardSplit(
+            n_splits=len(y) - 1,
+            max_train_size=self.max_train_size,
+            min_train_size=self.min_train_size,
+        )
+        incremental = hasattr(self.estimator, "update") and not getattr(
+            self.estimator, "cascade", False
+        )
+
+        X = np.array(X)
+        y = np.array(y)
+
+        self.models_, self.train_indices_, self.test_indices_ = [], [], []
+        for i, (train_i, test_i) in enumerate(splitter.split(X, y)):
+            if not incremental or i % self.refit_every == 0:
+                cv_model = clone(self.estimator).fit(X[train_i, :], y[train_i])
+            else:
+                # Updates replace the fitted boosters, the model of the last window is kept
+                cv_model = copy.copy(cv_model).update(
+                    X[train_i, :], y[train_i], n_estimators=self.update_estimators
+                )
+            self.models_.append(cv_model)
+            self.train_indices_.append(train_i)
+            self.test_indices_.append(test_i)
+        return self
+
+    def predict(self, X):
+        """
+        Predict the test instances of each window with the model of the window.
+
+        Parameters
+        ----------
+        X : array_like
+            Data the models have been fitted on.
+
+        Returns
+        -------
+        out : ndarray
+            Predicted quantiles of the test instances of all windows in order.
+        """
+        X = np.array(X)
+        X_windows = [X[test_i, :] for test_i in self.test_indices_]
+        predict_many = getattr(type(self.models_[0]), "predict_many", None)
+        if predict_many is not None:
+            return predict_many(self.models_, X_windows)
+        return np.vstack([m.predict(X_w) for m, X_w in zip(self.models_, X_windows)])
+
+
+# ## Walk-Forward Prediction
+
+
+def walk_forward_predict(
+    estimator,
+    X,
+    y,
+    max_train_size=None,
+    min_train_size=1,
+    refit_every=1,
+    update_estimators=10,
+):
+    """
+    Predict each instance with a model trained on all preceding instances.
+
+    Parameters
+    ----------
+    estimator : sklearn Estimator
+        Quantile regressor. If it has an `update` method (and no cascade), it is updated
+        incrementally between full refits.
+    X : array_like
+        Training data in chronological order.
+    y : array_like
+        Target values.
+    max_train_size : int, optional
+        Maximum size of the training window.
+    min_train_size : int
+        Size of the first training window.
+    refit_every : int
+        Number of windows after which the model is refitted from scratch. With 1, every
+        window is refitted.
+    update_estimators : int
+        Number of boosting stages added by each incremental update.
+
+    Returns
+    -------
+    out : ndarray
+        Target value followed by the predicted quantiles of each predicted instance.
+    """
+    models = WalkForwardModels(
+        estimator,
+        max_train_size=max_train_size,
+        min_train_size=min_train_size,
+        refit_every=refit_every,
+        update_estimators=update_estimators,
+    ).fit(X, y)
+    truth = np.array(y)[np.concatenate(models.test_indices_)]
+    return np.column_stack((truth, models.predict(X)))
+
+
+# ## Refit Cadence
+
+
+def quantile_loss(y_true, y_pred, quantiles):
+    """Mean pinball loss of predicted quantiles (one column per quantile)."""
+    residuals = np.asarray(y_true).reshape(-1, 1) - np.asarray(y_pred)
+    quantiles = np.asarray(quantiles)
+    return np.maximum(quantiles * residuals, (quantiles - 1) * residuals).mean()
+
+
+def refit_tradeoff(
+    estimator,
+    X,
+    y,
+    cadences=(1, 7, 14, 28),
+    update_estimators=10,
+    max_train_size=None,
+    min_train_size=1,
+):
+    """
+    Compare accuracy and wall time of walk-forward validation at different refit cadences.
+
+    Parameters
+    ----------
+    estimator : sklearn Estimator
+        Quantile regressor with `quantiles` attribute.
+    X : array_like
+        Training data in chronological order.
+    y : array_like
+        Target values.
+    cadences : iterable
+        Values of `refit_every` to compare, the baseline refits every window (1).
+    update_estimators : int
+        Number of boosting stages added by each incremental update.
+    max_train_size : int, optional
+        Maximum size of the training window.
+    min_train_size : int
+        Size of the first training window.
+
+    Returns
+    -------
+    out : DataFrame
+        Wall time, absolute error of the median and quantile loss of each cadence, also
+        relative to the baseline.
+    """
+    quantiles = list(estimator.quantiles)
+    median = quantiles.index(0.5) if 0.5 in quantiles else len(quantiles) // 2
+
+    results = dict()
+    for refit_every in sorted(set(cadences) | {1}):
+        start = time.perf_counter()
+        predictions = walk_forward_predict(
+            estimator,
+            X,
+            y,
+            max_train_size=max_train_size,
+            min_train_size=min_train_size,
+            refit_every=refit_every,
+            update_estimators=update_estimators,
+        )
+        results[refit_every] = {
+            "time": time.perf_counter() - start,
+            "absolute_error": np.abs(
+                predictions[:, 0] - predictions[:, 1 + median]
+            ).mean(),
+            "quantile_loss": quantile_loss(
+                predictions[:, 0], predictions[:, 1:], quantiles
+            ),
+        }
+
+    report = pd.DataFrame.from_dict(results, orient="index").rename_axis("refit_every")
+    for col in ["time", "absolute_error", "quantile_loss"]:
+        report[f"{col}_relative"] = report[col] / report.loc[1, col]
+    return report
+
+
+# ## Tests
+
+if __name__ == "__main__":
+    import sys
+
+    sys.path.append("../../code/quantile regression")
+
+    from GradientBoosting import LightGBMQuantileRegressor, CatBoostQuantileRegressor
+
+    # Lagged features of a random walk with trend
+    n_days, n_lags = 150, 10
+    series = np.cumsum(1 + np.random.normal(size=n_days + n_lags))
+    X_test = np.column_stack(
+        [series[n_lags - i : n_days + n_lags - i] for i in range(1, n_lags + 1)]
+    )
+    y_test = series[n_lags:]
+
+    for regressor in [
+        LightGBMQuantileRegressor(
+            quantiles=[0.05, 0.5, 0.95], base_params=dict(n_estimators=100, verbose=-1)
+        ),
+        CatBoostQuantileRegressor(
+            quantiles=[0.05, 0.5, 0.95],
+            base_params=dict(n_estimators=100, silent=True, random_seed=0),
+            joint=True,
+        ),
+    ]:
+        print(type(regressor).__name__)
+        print(refit_tradeoff(regressor, X_test, y_test, min_train_size=20))
+
+    # The retained models predict the same as predicting each window right after fitting it
+    def walk_forward_loop(estimator, X, y, refit_every, min_train_size=20):
+        """Previous implementation with one prediction per window."""
+        splitter = WalkForwardSplit(n_splits=len(y) - 1, min_train_size=min_train_size)
+        predictions = []
+        for i, (train_i, test_i) in enumerate(splitter.split(X, y)):
+            if i % refit_every == 0:
+                cv_model = clone(estimator).fit(X[train_i, :], y[train_i])
+            else:
+                cv_model.update(X[train_i, :], y[train_i])
+            predictions.append(
+                np.hstack((y[test_i].reshape(-1, 1), cv_model.predict(X[test_i, :])))
+            )
+        return np.vstack(predictions)
+
+    regressor = LightGBMQuantileRegressor(
+        quantiles=[0.05, 0.5, 0.95], base_params=dict(n_estimators=100, verbose=-1)
+    )
+    print(
+        np.allclose(
+            walk_forward_loop(regressor, X_test, y_test, refit_every=7),
+            walk_forward_predict(
+                regressor, X_test, y_test, min_train_size=20, refit_every=7
+            ),
+        )
+    )
+
+    # Compare prediction times of the fitted models, window by window and batched
+    walk_forward_models = WalkForwardModels(regressor, min_train_size=20).fit(
+        X_test, y_test
+    )
+    for predict in [
+        lambda: [
+            m.predict(X_test[test_i, :])
+            for m, test_i in zip(
+                walk_forward_models.models_, walk_forward_models.test_indices_
+            )
+        ],
+        lambda: walk_forward_models.predict(X_test),
+    ]:
+        start = time.perf_counter()
+        predict()
+        print(time.perf_counter() - start)
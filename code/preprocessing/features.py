@@ -0,0 +1,267 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# # Features of Delay Data
+# Renaming of the raw RKI columns and derivation of day, week, weekday and reporting delay features. The functions operate row-wise, so they can be applied to the full dataset or to the new and changed cases of a snapshot only.
+
+# ## Imports
+
+import pandas as pd
+import numpy as np
+
+from schema import WEEKDAY_DTYPE, apply_schema
+
+
+# ## Renaming
+
+COLUMN_MAPPING = {
+    "Id": "id",
+    "Erkrankungsbeginn": "date_onset",
+    "Meldedatum": "date_report",
+    "DatumEingangRKI1": "date_report_rki",
+    "DatumIstFall": "date_confirmation",
+    "MeldeLandkreis": "county",
+    "MeldeLandkreisBundesland": "state",
+    "AlterBerechnet": "age",
+    "Altersgruppe1": "age_group1",
+    "Altersgruppe2": "age_group2",
+    "Geschlecht": "gender",
+}
+
+GENDER_MAPPING = {
+    "männlich": "male",
+    "weiblich": "female",
+    "divers": "diverse",
+    "-nicht ermittelbar-": "undeterminable",
+    "-nicht erhoben-": "unknown",
+}
+
+# Columns taken over from the raw data, all other columns are derived from these
+BASE_COLUMNS = list(COLUMN_MAPPING.values())
+
+DATE_COLUMNS = ["date_onset", "date_report", "date_report_rki", "date_confirmation"]
+
+
+def rename_columns(covid):
+    """
+    Rename and select the columns of the raw RKI case data and translate column values.
+
+    Parameters
+    ----------
+    covid : DataFrame
+        Raw case data with (at least) the columns in `COLUMN_MAPPING`.
+
+    Returns
+    -------
+    out : DataFrame
+        Delay data with the columns in `BASE_COLUMNS`.
+    """
+    delay = covid.rename(columns=COLUMN_MAPPING)[BASE_COLUMNS]
+    delay["gender"] = (
+        delay["gender"]
+        .astype("category")
+        .cat.rename_categories(lambda c: GENDER_MAPPING.get(c, c))
+    )
+    return apply_schema(delay)
+
+
+def row_hash(delay):
+    """
+    Compute a hash of the base columns of each case to detect changed cases between snapshots.
+
+    Values are hashed independently of categorical codes and of the precision of numeric columns.
+    """
+    base = delay[BASE_COLUMNS].copy()
+    for col in base.columns:
+        if col in DATE_COLUMNS:
+            base[col] = base[col].astype("datetime64[ns]")
+        elif isinstance(base[col].dtype, pd.CategoricalDtype):
+            base[col] = base[col].astype(object)
+        elif base[col].dtype.kind == "f":
+            base[col] = base[col].astype(np.float64)
+    return pd.util.hash_pandas_object(base, index=False).to_numpy()
+
+
+# ## Derived Values
+# All derived values are computed from the integer representation of the dates (days since 1970-01-01) using integer arithmetic. Days and reporting delays are stored as int16, calendar weeks as int8 and weekdays as codes of a shared ordered categorical. Columns with missing dates use the corresponding nullable integer types.
+
+# Reference date of the day representation in days since 1970-01-01
+REFERENCE_DAY = np.datetime64("2020-01-01", "D").astype(np.int64)
+
+
+def as_ordered_weekday(col):
+    # Categories are set explicitly, since subsets of cases may not contain all weekdays
+    return col.astype(WEEKDAY_DTYPE)
+
+
+def _as_compact_int(values, missing, dtype):
+    """Convert integer values to a compact (nullable, if values are missing) integer array."""
+    if missing.any():
+        return pd.arrays.IntegerArray(values.astype(dtype), missing)
+    return values.astype(dtype)
+
+
+def date_features(dates):
+    """
+    Compute days since 2020-01-01, ISO calendar weeks and weekdays of dates.
+
+    Parameters
+    ----------
+    dates : array_like
+        Dates (datetime64), may contain missing values.
+
+    Returns
+    -------
+    days : ndarray
+        Days since 2020-01-01 (int64).
+    weeks : ndarray
+        ISO calendar weeks (int64).
+    weekdays : ndarray
+        Weekdays with Monday as 0 (int64).
+    missing : ndarray
+        Boolean mask of missing dates. Values of missing dates are undefined.
+    """
+    values = np.asarray(dates, dtype="datetime64[D]")
+    missing = np.isnat(values)
+    epoch_days = np.where(missing, 0, values.astype(np.int64))
+
+    # 1970-01-01 was a Thursday
+    weekdays = (epoch_days + 3) % 7
+
+    # The ISO week of a date is determined by the Thursday of the same week
+    thursdays = epoch_days - weekdays + 3
+    year_starts = (
+        thursdays.astype("datetime64[D]")
+        .astype("datetime64[Y]")
+        .astype("datetime64[D]")
+        .astype(np.int64)
+    )
+    weeks = (thursdays - year_starts) // 7 + 1
+
+    return epoch_days - REFERENCE_DAY, weeks, weekdays, missing
+
+
+def derive_features(delay):
+    """
+    Add days since 2020-01-01, calendar weeks and weekdays of all date columns as well as reporting delays.
+
+    Parameters
+    ----------
+    delay : DataFrame
+        Delay data with the columns in `DATE_COLUMNS`.
+
+    Returns
+    -------
+    out : DataFrame
+        Delay data with derived columns.
+    """
+    days, weeks, weekdays, missing = dict(), dict(), dict(), dict()
+    for col in DATE_COLUMNS:
+        days[col], weeks[col], weekdays[col], missing[col] = date_features(delay[col])
+
+    derived = dict()
+
+    # Add days since 2020-01-01 for all date columns
+    for col in DATE_COLUMNS:
+        derived[col.replace("date", "day")] = _as_compact_int(
+            days[col], missing[col], np.int16
+        )
+
+    # Add calender week for all date columns
+    for col in DATE_COLUMNS:
+        derived[col.replace("date", "week")] = _as_compact_int(
+            weeks[col], missing[col], np.int8
+        )
+
+    # Add day of the week for all date columns
+    for col in DATE_COLUMNS:
+        derived[col.replace("date", "weekday")] = pd.Categorical.from_codes(
+            np.where(missing[col], -1, weekdays[col]).astype(np.int8),
+            dtype=WEEKDAY_DTYPE,
+        )
+
+    # Add reporting delays
+    derived["reporting_delay_hd"] = _as_compact_int(
+        days["date_report"] - days["date_onset"],
+        missing["date_report"] | missing["date_onset"],
+        np.int16,
+    )  # reporting delay health department
+    derived["reporting_delay_rki"] = _as_compact_int(
+        days["date_confirmation"] - days["date_onset"],
+        missing["date_confirmation"] | missing["date_onset"],
+        np.int16,
+    )  # reporting delay rki
+
+    return apply_schema(delay.assign(**derived))
+
+
+# ## Tests
+
+if __name__ == "__main__":
+    import timeit
+
+    def derive_features_loop(delay):
+        """Previous implementation of `derive_features` using pandas datetime accessors."""
+        delay = delay.copy()
+        for col in DATE_COLUMNS:
+            delay[col.replace("date", "day")] = (
+                delay[col] - pd.to_datetime("2020-01-01")
+            ).dt.days
+        for col in DATE_COLUMNS:
+            delay[col.replace("date", "week")] = delay[col].dt.isocalendar().week
+        for col in DATE_COLUMNS:
+            delay[col.replace("date", "weekday")] = as_ordered_weekday(
+                delay[col].dt.day_name()
+            )
+        delay["reporting_delay_hd"] = delay["day_report"] - delay["day_onset"]
+        delay["reporting_delay_rki"] = delay["day_confirmation"] - delay["day_onset"]
+        return delay
+
+    n_rows = 4000000
+    rng = np.random.default_rng(0)
+    delay_test = pd.DataFrame(
+        {
+            col: pd.to_datetime("2019-12-01")
+            + pd.to_timedelta(rng.integers(0, 400, n_rows), unit="days")
+            for col in DATE_COLUMNS
+        }
+    )
+    delay_test.loc[rng.random(n_rows) < 0.4, "date_onset"] = pd.NaT
+
+
+if __name__ == "__main__":
+    # Check equality of both implementations
+    vectorized = derive_features(delay_test)
+    loop = derive_features_loop(delay_test)
+    weekday_columns = [col.replace("date", "weekday") for col in DATE_COLUMNS]
+    numeric_columns = [
+        col
+        for col in vectorized.columns
+        if col not in DATE_COLUMNS and col not in weekday_columns
+    ]
+    print(
+        all(vectorized[col].equals(loop[col]) for col in weekday_columns)
+        and all(
+            vectorized[col].astype("float64").equals(loop[col].astype("float64"))
+            for col in numeric_columns
+        )
+    )
+
+
+if __name__ == "__main__":
+    # Compare runtimes and memory usage on a synthetic frame with several million rows
+    print(
+        {
+            name: min(timeit.repeat(lambda: f(delay_test), repeat=3, number=1))
+            for name, f in [
+                ("loop", derive_features_loop),
+                ("vectorized", derive_features),
+            ]
+        }
+    )
+    print(
+        {
+            name: df.drop(DATE_COLUMNS, axis=1).memory_usage(deep=True).sum() / 2 ** 20
+            for name, df in [("loop", loop), ("vectorized", vectorized)]
+        }
+    )
@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# # Loading of Raw RKI Case Data
+# Streaming loader for the raw individual case data of the RKI. Only the columns required for preprocessing are read, using explicit dtypes, and the file is processed in chunks of bounded size so that memory usage is governed by the size of the (compact) result instead of the size of the raw file.
+
+# ## Imports
+
+import pandas as pd
+import numpy as np
+
+import time
+import resource
+import logging
+
+from contextlib import contextmanager
+
+
+# ## Column Specification
+
+DATE_COLUMNS = ["Erkrankungsbeginn", "Meldedatum", "DatumEingangRKI1", "DatumIstFall"]
+
+COLUMN_DTYPES = {
+    "Id": "int64",
+    "MeldeLandkreis": "category",
+    "MeldeLandkreisBundesland": "category",
+    "AlterBerechnet": "float32",
+    "Altersgruppe1": "category",
+    "Altersgruppe2": "category",
+    "Geschlecht": "category",
+}
+
+
+# ## Resource Tracking
+
+
+def peak_rss():
+    """Return the peak resident set size of the current process in MiB."""
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+@contextmanager
+def track_resources(label, logger=None):
+    """
+    Report wall time and peak resident set size of the enclosed block.
+
+    Parameters
+    ----------
+    label : str
+        Name of the tracked step used in the report.
+    logger : logging.Logger, optional
+        Logger to report to. If `None`, the report is printed.
+
+    Yields
+    ------
+    report : dict
+        Dictionary which is filled with `wall_time` (seconds) and `peak_rss` (MiB) on exit.
+    """
+    report = dict()
+    start = time.perf_counter()
+    try:
+        yield report
+    finally:
+        report["wall_time"] = time.perf_counter() - start
+        report["peak_rss"] = peak_rss()
+        message = f"{label}: wall time {report['wall_time']:.2f}s, peak RSS {report['peak_rss']:.1f} MiB"
+        if logger is None:
+            print(message)
+        else:
+            logger.info(message)
+
+
+# ## Chunked Loading
+
+
+def harmonize_categories(frames, columns):
+    """
+    Set the union of all categories on each frame so that concatenation keeps the categorical dtype.
+
+    The order of the categories of the first frame is retained, categories only present in
+    other frames are appended.
+    """
+    for col in columns:
+        categories = frames[0][col].cat.categories
+        for f in frames[1:]:
+            categories = categories.append(f[col].cat.categories.difference(categories))
+        for f in frames:
+            if not f[col].cat.categories.equals(categories):
+                f[col] = f[col].cat.set_categories(categories)
+    return frames
+
+
+def read_rki_csv(path, chunksize=500000, corrections=None, encoding="ISO-8859-1"):
+    """
+    Read the columns of the raw RKI case data which are required for preprocessing.
+
+    The file is read in chunks of `chunksize` rows. Each chunk is reduced to the required columns
+    with compact dtypes (categoricals for string columns, datetime64 for date columns) before
+    the next chunk is read, so that the raw strings of only one chunk are held at a time. The
+    reduced chunks are concatenated at the end, so the peak memory usage is about twice the
+    size of the result (but does not grow with the size of the raw file).
+
+    Parameters
+    ----------
+    path : str
+        Path to the raw CSV file.
+    chunksize : int, optional
+        Number of rows to process at once.
+    corrections : dict, optional
+        Manual corrections of data input errors as a dictionary with case Ids as keys and
+        dictionaries mapping column names to corrected (raw) values as values. Corrections are
+        applied before date conversion.
+    encoding : str, optional
+        Encoding of the raw file.
+
+    Returns
+    -------
+    out : DataFrame
+        Case data with the columns `Id`, the date columns and the required categorical and numerical columns.
+    """
+    if corrections is None:
+        corrections = dict()
+
+    reader = pd.read_csv(
+        path,
+        sep=",",
+        encoding=encoding,
+        usecols=list(COLUMN_DTYPES) + DATE_COLUMNS,
+        dtype={**COLUMN_DTYPES, **{col: str for col in DATE_COLUMNS}},
+        chunksize=chunksize,
+    )
+
+    chunks = []
+    for chunk in reader:
+        # Manually fix data input errors
+        for case_id, values in corrections.items():
+            for col, value in values.items():
+                chunk.loc[chunk["Id"] == case_id, col] = value
+
+        for col in DATE_COLUMNS:
+            chunk[col] = pd.to_datetime(chunk[col], cache=True)
+
+        chunks.append(chunk)
+
+    categorical_columns = [
+        col for col, dtype in COLUMN_DTYPES.items() if dtype == "category"
+    ]
+    chunks = harmonize_categories(chunks, categorical_columns)
+
+    covid = pd.concat(chunks, ignore_index=True)
+    return covid[["Id"] + DATE_COLUMNS + list(COLUMN_DTYPES)[1:]]
+
+
+# ## Tests
+
+if __name__ == "__main__":
+    import os
+    import tempfile
+
+    def synthetic_rki_csv(path, n_rows, seed=0):
+        rng = np.random.default_rng(seed)
+        dates = pd.date_range("2020-01-20", "2020-05-06").strftime("%Y-%m-%d")
+        pd.DataFrame(
+            {
+                "Id": np.arange(n_rows),
+                "Erkrankungsbeginn": rng.choice(dates, n_rows),
+                "Meldedatum": rng.choice(dates, n_rows),
+                "DatumEingangRKI1": rng.choice(dates, n_rows),
+                "DatumIstFall": rng.choice(dates, n_rows),
+                "MeldeLandkreis": rng.choice([f"LK {i}" for i in range(400)], n_rows),
+                "MeldeLandkreisBundesland": rng.choice(["Bayern", "Berlin"], n_rows),
+                "AlterBerechnet": rng.integers(0, 100, n_rows),
+                "Altersgruppe1": rng.choice(["A00-A04", "A05-A14", "A15-A34"], n_rows),
+                "Altersgruppe2": rng.choice(["Nicht übermittelt"], n_rows),
+                "Geschlecht": rng.choice(["männlich", "weiblich"], n_rows),
+                "Meldeweg": rng.choice(["Labor", "Arzt"], n_rows),
+            }
+        ).to_csv(path, index=False, encoding="ISO-8859-1")
+
+    def _report_loading(path, chunksize=None):
+        """Load a file in a fresh process and return its resource report."""
+        with track_resources(f"Loading {path} (chunksize={chunksize})") as report:
+            if chunksize is None:
+                covid = pd.read_csv(path, encoding="ISO-8859-1", low_memory=False)
+            else:
+                covid = read_rki_csv(path, chunksize=chunksize)
+        report["result_size"] = covid.memory_usage(deep=True).sum() / 2 ** 20
+        return report
+
+    import multiprocessing
+
+    # Peak RSS should grow with the size of the compact result only, not with the raw file size.
+    # Each load runs in a fresh (forked) process since the peak RSS of a process cannot be reset.
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_rows in [100000, 400000, 1600000]:
+            path = os.path.join(tmp, f"covid_{n_rows}.csv")
+            synthetic_rki_csv(path, n_rows)
+            for chunksize in [None, 100000]:
+                with multiprocessing.get_context("fork").Pool(1) as pool:
+                    report = pool.apply(_report_loading, (path, chunksize))
+                print(f"Result size: {report['result_size']:.1f} MiB")
@@ -11,6 +11,22 @@ import seaborn as sns
 
 import logging
 
+# Import own code from other directory
+import sys
+
+sys.path.append("../../code/preprocessing")
+
+from loading import read_rki_csv, track_resources
+from features import rename_columns, derive_features, row_hash
+from storage import (
+    write_delay_store,
+    update_delay_store,
+    write_manifest,
+    read_manifest,
+    previous_store,
+)
+from schema import memory_per_row
+
 
 #  ## Data Loading
 
@@ -21,37 +37,26 @@ logger.setLevel(logging.INFO)
 
 suffix = "2020-05-06"
 
-logger.info("Reading file.")
-covid = pd.read_csv(
-    f"../../data/raw/covid_{suffix}.csv",
-    sep=",",
-    encoding="ISO-8859-1",
-    low_memory=False,
-)
-
-
-#  ## Preprocessing
+# Latest earlier snapshot to update incrementally, the full dataset is processed if there is none
+previous_path = previous_store("../../data/processed", suffix)
+incremental = previous_path is not None
 
 # Manually fix some errors
-logger.info("Manually fixing data input errors.")
-
-covid.loc[covid.query("Id==23107834").index, "Meldedatum"] = "2020-04-07"
+corrections = {23107834: {"Meldedatum": "2020-04-07"}}
 
+logger.info("Reading file.")
+with track_resources("Reading file", logger=logger):
+    covid = read_rki_csv(
+        f"../../data/raw/covid_{suffix}.csv", chunksize=500000, corrections=corrections
+    )
 
-logger.info("Converting all date columns to datetime format.")
-datecols = [
-    "Erkrankungsbeginn",
-    "Meldedatum",
-    "DatumEingangRKI1",
-    "DatumIstFall",
-]  # select all columns featuring a date
-for col in datecols:
-    covid[col] = pd.to_datetime(covid[col])
 
+#  ## Preprocessing
 
 logger.info("Performing subselection of columns.")
 delay = covid[
-    ["Erkrankungsbeginn", "Meldedatum", "DatumEingangRKI1", "DatumIstFall"]
+    ["Id"]
+    + ["Erkrankungsbeginn", "Meldedatum", "DatumEingangRKI1", "DatumIstFall"]
     + [
         "MeldeLandkreis",
         "MeldeLandkreisBundesland",
@@ -61,6 +66,7 @@ delay = covid[
         "Geschlecht",
     ]
 ].sort_values("DatumIstFall")
+del covid
 
 
 #  ## Checking Missing Value
@@ -92,71 +98,31 @@ print("")
 
 
 logger.info("Renaming and selecting columns.")
-mapping = {
-    "Erkrankungsbeginn": "date_onset",
-    "Meldedatum": "date_report",
-    "DatumEingangRKI1": "date_report_rki",
-    "DatumIstFall": "date_confirmation",
-    "MeldeLandkreis": "county",
-    "MeldeLandkreisBundesland": "state",
-    "AlterBerechnet": "age",
-    "Altersgruppe1": "age_group1",
-    "Altersgruppe2": "age_group2",
-    "Geschlecht": "gender",
-}
-delay = delay.rename(columns=mapping)[mapping.values()]
-
-
-logger.info("Renaming column values.")
-delay["gender"] = delay["gender"].replace(
-    {
-        "männlich": "male",
-        "weiblich": "female",
-        "divers": "diverse",
-        "-nicht ermittelbar-": "undeterminable",
-        "-nicht erhoben-": "unknown",
-    }
-)
-
-
-logger.info("Adding derived values.")
-
-datecols = [
-    x for x in delay.columns if "date" in x.lower()
-]  # select all columns featuring a date
-
-# Add days since 2020-01-01 for all date columns
-for col in datecols:
-    delay[col.replace("date", "day")] = (
-        delay[col] - pd.to_datetime("2020-01-01")
-    ).dt.days
-
-# Add calender week for all date columns
-for col in datecols:
-    delay[col.replace("date", "week")] = delay[col].dt.week
-
-# Add day of the week for all date columns
-def as_ordered_weekday(col):
-    return col.astype(pd.CategoricalDtype(ordered=True)).cat.reorder_categories(
-        ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"],
-        ordered=True,
+delay = rename_columns(delay)
+
+
+if incremental:
+    previous_suffix = read_manifest(previous_path)["snapshot"]
+    logger.info(f"Updating delay data of {previous_suffix} incrementally.")
+    with track_resources("Incremental update", logger=logger):
+        manifest = update_delay_store(
+            delay,
+            previous_path,
+            f"../../data/processed/delay_{suffix}.parquet",
+            snapshot=suffix,
+        )
+    logger.info(
+        f"{manifest['n_new']} new, {manifest['n_changed']} changed and {manifest['n_removed']} removed cases."
+    )
+else:
+    logger.info("Adding derived values.")
+    delay = derive_features(delay)
+    delay["row_hash"] = row_hash(delay)
+    logger.info(f"Memory per row: {memory_per_row(delay):.1f} bytes.")
+
+    logger.info("Exporting delay data to Parquet store.")
+    write_delay_store(delay, f"../../data/processed/delay_{suffix}.parquet")
+    write_manifest(
+        f"../../data/processed/delay_{suffix}.parquet",
+        dict(snapshot=suffix, mode="full", n_rows=int(len(delay))),
     )
-
-
-for col in datecols:
-    delay[col.replace("date", "weekday")] = as_ordered_weekday(delay[col].dt.day_name())
-
-# Add reporting delays
-delay["reporting_delay_hd"] = (
-    delay["day_report"] - delay["day_onset"]
-)  # reporting delay health department
-delay["reporting_delay_rki"] = (
-    delay["day_confirmation"] - delay["day_onset"]
-)  # reporting delay rki
-
-
-logger.info("Exporting delay data to CSV.")
-delay.to_csv(f"../../data/processed/delay_{suffix}.csv", index=False)
-
-logger.info("Exporting delay data to pickle file.")
-delay.to_pickle(f"../../data/processed/delay_{suffix}.pl")
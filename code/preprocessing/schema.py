@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# # Schema of Delay Data
+# Canonical compact dtypes for all columns of the delay data. Days and reporting delays are stored as 16-bit integers, calendar weeks as 8-bit integers and string columns as categoricals. Categoricals of columns with a known set of values use stable, pre-registered categories, so that codes are identical across snapshots, imputations and partitions. Columns which may contain missing values use nullable integer types.
+
+# ## Imports
+
+import pandas as pd
+import numpy as np
+
+
+# ## Category Sets
+
+WEEKDAYS = [
+    "Monday",
+    "Tuesday",
+    "Wednesday",
+    "Thursday",
+    "Friday",
+    "Saturday",
+    "Sunday",
+]
+
+WEEKDAY_DTYPE = pd.CategoricalDtype(WEEKDAYS, ordered=True)
+
+STATES = [
+    "Baden-Württemberg",
+    "Bayern",
+    "Berlin",
+    "Brandenburg",
+    "Bremen",
+    "Hamburg",
+    "Hessen",
+    "Mecklenburg-Vorpommern",
+    "Niedersachsen",
+    "Nordrhein-Westfalen",
+    "Rheinland-Pfalz",
+    "Saarland",
+    "Sachsen",
+    "Sachsen-Anhalt",
+    "Schleswig-Holstein",
+    "Thüringen",
+]
+
+GENDERS = ["male", "female", "diverse", "undeterminable", "unknown", "other"]
+
+AGE_GROUPS = [
+    "A00-A04",
+    "A05-A14",
+    "A15-A34",
+    "A35-A59",
+    "A60-A79",
+    "A80+",
+    "unbekannt",
+]
+
+
+# ## Schema
+
+SCHEMA = {
+    "id": np.int64,
+    "date_onset": "datetime64[ns]",
+    "date_report": "datetime64[ns]",
+    "date_report_rki": "datetime64[ns]",
+    "date_confirmation": "datetime64[ns]",
+    "county": "category",
+    "state": pd.CategoricalDtype(STATES),
+    "age": "Int16",
+    "age_group1": pd.CategoricalDtype(AGE_GROUPS),
+    "age_group2": "category",
+    "gender": pd.CategoricalDtype(GENDERS),
+    "day_onset": "Int16",
+    "day_report": np.int16,
+    "day_report_rki": np.int16,
+    "day_confirmation": np.int16,
+    "week_onset": "Int8",
+    "week_report": np.int8,
+    "week_report_rki": np.int8,
+    "week_confirmation": np.int8,
+    "weekday_onset": WEEKDAY_DTYPE,
+    "weekday_report": WEEKDAY_DTYPE,
+    "weekday_report_rki": WEEKDAY_DTYPE,
+    "weekday_confirmation": WEEKDAY_DTYPE,
+    "reporting_delay_hd": "Int16",
+    "reporting_delay_rki": "Int16",
+    "row_hash": np.uint64,
+    "imputation": "category",
+    "imputed": bool,
+}
+
+
+def apply_schema(delay):
+    """
+    Convert all columns of the delay data to their canonical dtypes.
+
+    Columns which are not part of the schema are left unchanged.
+
+    Parameters
+    ----------
+    delay : DataFrame
+        Delay data.
+
+    Returns
+    -------
+    out : DataFrame
+        Delay data with canonical dtypes.
+
+    Raises
+    ------
+    ValueError
+        If a column contains values which are not part of its pre-registered categories.
+    """
+    converted = dict()
+    for col, dtype in SCHEMA.items():
+        if col not in delay.columns or delay[col].dtype == dtype:
+            continue
+        if isinstance(dtype, pd.CategoricalDtype) and dtype.categories is not None:
+            values = delay[col].dropna().unique()
+            unknown = [v for v in values if v not in dtype.categories]
+            if unknown:
+                raise ValueError(f"Column {col} contains unknown values: {unknown}")
+        if isinstance(delay[col].dtype, pd.CategoricalDtype) and dtype != "category":
+            # Convert categories instead of all values
+            converted[col] = delay[col].astype(delay[col].cat.categories.dtype)
+            converted[col] = converted[col].astype(dtype)
+        else:
+            converted[col] = delay[col].astype(dtype)
+
+    return delay.assign(**converted) if converted else delay
+
+
+def memory_per_row(delay):
+    """Return the memory footprint of the delay data per row in bytes."""
+    return delay.memory_usage(deep=True, index=False).sum() / max(len(delay), 1)
+
+
+# ## Tests
+
+if __name__ == "__main__":
+    n_rows = 1000000
+    rng = np.random.default_rng(0)
+    delay_test = pd.DataFrame(
+        {
+            "state": rng.choice(STATES, n_rows),
+            "gender": rng.choice(GENDERS[:2], n_rows),
+            "age": rng.integers(0, 100, n_rows).astype(np.float64),
+            "age_group1": rng.choice(AGE_GROUPS, n_rows),
+            "day_onset": np.where(
+                rng.random(n_rows) < 0.4, np.nan, rng.integers(30, 120, n_rows)
+            ),
+            "day_report": rng.integers(30, 130, n_rows),
+            "week_report": rng.integers(5, 20, n_rows),
+            "weekday_report": rng.choice(WEEKDAYS, n_rows),
+        }
+    )
+    delay_test["reporting_delay_hd"] = (
+        delay_test["day_report"] - delay_test["day_onset"]
+    )
+
+    print(
+        f"Memory per row: {memory_per_row(delay_test):.1f} bytes without schema, "
+        f"{memory_per_row(apply_schema(delay_test)):.1f} bytes with schema"
+    )
@@ -0,0 +1,284 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# # Storage of Processed Delay Data
+# Partitioned columnar store (Parquet) for processed and imputed delay data. The store is partitioned by imputation (if present) and by day of report, so that loaders can read only the columns they need and skip partitions and row groups via predicates on `imputation` and `date_onset`.
+
+# ## Imports
+
+import pandas as pd
+import numpy as np
+
+import os
+import json
+import shutil
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from features import derive_features, row_hash
+from loading import harmonize_categories
+from schema import apply_schema
+
+
+# ## Writing
+
+PARTITION_COLUMNS = ["imputation", "day_report"]
+
+
+def write_delay_store(delay, path, overwrite=True):
+    """
+    Write delay data to a partitioned Parquet store.
+
+    The data is partitioned by `imputation` (if present) and by `day_report`. Within each partition,
+    rows are sorted by `date_onset` so that row group statistics allow predicate pushdown on the date of onset.
+
+    Parameters
+    ----------
+    delay : DataFrame
+        Delay data to store.
+    path : str
+        Root directory of the store.
+    overwrite : bool, optional
+        If True, an existing store at `path` is replaced. Otherwise, the data is added to the existing store.
+    """
+    if overwrite and os.path.exists(path):
+        shutil.rmtree(path)
+
+    delay = apply_schema(delay)
+    partition_cols = [col for col in PARTITION_COLUMNS if col in delay.columns]
+    table = pa.Table.from_pandas(
+        delay.sort_values(partition_cols + ["date_onset"]), preserve_index=False
+    )
+    pq.write_to_dataset(table, path, partition_cols=partition_cols)
+
+
+# ## Reading
+
+
+def read_delay_store(
+    path, columns=None, imputations=None, onset_range=None, filters=None
+):
+    """
+    Read delay data from a partitioned Parquet store.
+
+    Parameters
+    ----------
+    path : str
+        Root directory of the store.
+    columns : list, optional
+        Columns to read. If `None`, all columns are read.
+    imputations : list, optional
+        Imputations to read (e.g. ``["original", "imputation_01"]``). If `None`, all imputations are read.
+    onset_range : tuple, optional
+        Tuple `(start, end)` of dates to restrict `date_onset` to the half-open interval [start, end).
+        Either boundary may be `None`. Rows without date of onset are excluded if a range is given.
+    filters : list, optional
+        Additional filters in the disjunctive normal form of `pyarrow.parquet.read_table`.
+
+    Returns
+    -------
+    out : DataFrame
+        Delay data with canonical dtypes (see `schema.SCHEMA`).
+    """
+    filters = list(filters) if filters is not None else []
+    if imputations is not None:
+        filters.append(("imputation", "in", list(imputations)))
+    if onset_range is not None:
+        start, end = onset_range
+        if start is not None:
+            filters.append(("date_onset", ">=", pd.Timestamp(start)))
+        if end is not None:
+            filters.append(("date_onset", "<", pd.Timestamp(end)))
+
+    delay = pq.read_table(
+        path, columns=columns, filters=filters if filters else None
+    ).to_pandas()
+
+    # Partition keys are read as dictionary-encoded values and converted by the schema
+    return apply_schema(delay)
+
+
+# ## Incremental Updates
+# A new snapshot is derived from the store of the previous snapshot: cases are matched by `id` and compared by the hash of their base columns. Features are only derived for new and changed cases, and only the partitions containing new, changed or removed cases are rewritten. All other partitions are hard-linked from the previous store. The manifest of a snapshot summarizes the changes, the ids of the new, changed and removed cases are stored in a Parquet sidecar.
+
+MANIFEST = "_manifest.json"
+CHANGES = "_changes.parquet"
+
+
+def write_manifest(path, manifest):
+    """Write the manifest of a snapshot to the root directory of its store."""
+    with open(os.path.join(path, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def read_manifest(path):
+    """Read the manifest of a snapshot from the root directory of its store."""
+    with open(os.path.join(path, MANIFEST)) as f:
+        return json.load(f)
+
+
+def read_changes(path):
+    """Read the ids of the new, changed and removed cases of a snapshot (columns `id` and `change`)."""
+    return pd.read_parquet(os.path.join(path, CHANGES))
+
+
+def previous_store(directory, snapshot, prefix="delay_"):
+    """
+    Find the store of the latest snapshot preceding `snapshot` in a directory.
+
+    Only stores with a manifest are considered (i.e. no imputed data). Snapshots are compared
+    by their names, e.g. dates in ISO format.
+
+    Returns
+    -------
+    out : str or None
+        Root directory of the store, or `None` if there is no earlier snapshot.
+    """
+    stores = dict()
+    for name in os.listdir(directory) if os.path.isdir(directory) else []:
+        path = os.path.join(directory, name)
+        if name.startswith(prefix) and os.path.exists(os.path.join(path, MANIFEST)):
+            stores[read_manifest(path)["snapshot"]] = path
+    earlier = [s for s in stores if s < snapshot]
+    return stores[max(earlier)] if earlier else None
+
+
+def _link_partition(previous_path, path, partition):
+    """Hard-link (or copy, if linking is not possible) all files of a partition to a new store."""
+    source = os.path.join(previous_path, partition)
+    target = os.path.join(path, partition)
+    os.makedirs(target)
+    for filename in os.listdir(source):
+        try:
+            os.link(os.path.join(source, filename), os.path.join(target, filename))
+        except OSError:
+            shutil.copy2(os.path.join(source, filename), os.path.join(target, filename))
+
+
+def update_delay_store(delay, previous_path, path, snapshot):
+    """
+    Create the store of a new snapshot incrementally from the store of the previous snapshot.
+
+    Parameters
+    ----------
+    delay : DataFrame
+        Delay data of the new snapshot with base columns only (see `features.rename_columns`).
+    previous_path : str
+        Root directory of the store of the previous snapshot.
+    path : str
+        Root directory of the store of the new snapshot. An existing store is replaced.
+    snapshot : str
+        Name of the new snapshot.
+
+    Returns
+    -------
+    manifest : dict
+        Summary of the changes with respect to the previous snapshot, which is also written to the
+        new store. The ids of the changed cases are written to the store as well (see `read_changes`).
+    """
+    if os.path.exists(path):
+        shutil.rmtree(path)
+
+    # Match cases by id and compare by hash of base columns
+    delay = delay.assign(row_hash=row_hash(delay))
+    previous = read_delay_store(previous_path, columns=["id", "row_hash", "day_report"])
+    matched = previous.merge(
+        delay[["id", "row_hash"]],
+        on="id",
+        how="outer",
+        suffixes=("_previous", ""),
+        indicator=True,
+    )
+    removed_ids = matched.loc[matched["_merge"] == "left_only", "id"]
+    new_ids = matched.loc[matched["_merge"] == "right_only", "id"]
+    changed_ids = matched.loc[
+        (matched["_merge"] == "both")
+        & (matched["row_hash"] != matched["row_hash_previous"]),
+        "id",
+    ]
+
+    # Derive features for new and changed cases only
+    updated = derive_features(delay[delay["id"].isin(np.union1d(new_ids, changed_ids))])
+
+    # Rewrite all partitions which gain, lose or change cases
+    outdated = previous["id"].isin(np.union1d(removed_ids, changed_ids))
+    partitions = np.union1d(
+        previous.loc[outdated, "day_report"].unique(), updated["day_report"].unique()
+    ).astype(np.int64)
+    previous_partitions = np.setdiff1d(previous["day_report"].unique(), partitions)
+
+    if len(partitions) > 0:
+        retained = read_delay_store(
+            previous_path, filters=[("day_report", "in", list(partitions))]
+        )
+        retained = retained[
+            ~retained["id"].isin(np.union1d(removed_ids, changed_ids))
+        ].copy()
+        updated = updated[list(retained.columns)].copy()
+        harmonize_categories(
+            [retained, updated],
+            [c for c in retained.columns if retained[c].dtype.name == "category"],
+        )
+        rewritten = pd.concat([retained, updated], sort=False, ignore_index=True)
+        write_delay_store(rewritten, path, overwrite=False)
+    else:
+        os.makedirs(path)
+
+    for day in previous_partitions:
+        _link_partition(previous_path, path, f"day_report={day}")
+
+    manifest = dict(
+        snapshot=snapshot,
+        previous_snapshot=read_manifest(previous_path)["snapshot"],
+        mode="incremental",
+        n_rows=int(len(delay)),
+        n_new=int(len(new_ids)),
+        n_changed=int(len(changed_ids)),
+        n_removed=int(len(removed_ids)),
+        partitions_rewritten=[int(p) for p in partitions],
+    )
+    write_manifest(path, manifest)
+    changes = [("new", new_ids), ("changed", changed_ids), ("removed", removed_ids)]
+    pd.DataFrame(
+        {
+            "id": np.concatenate([ids.to_numpy() for _, ids in changes]),
+            "change": pd.Categorical(
+                np.repeat([c for c, _ in changes], [len(ids) for _, ids in changes]),
+                categories=[c for c, _ in changes],
+            ),
+        }
+    ).to_parquet(os.path.join(path, CHANGES), index=False)
+
+    return manifest
+
+
+# ## Tests
+
+if __name__ == "__main__":
+    import tempfile
+
+    n_rows = 100000
+    rng = np.random.default_rng(0)
+    delay_test = pd.DataFrame(
+        {
+            "date_onset": pd.to_datetime("2020-02-01")
+            + pd.to_timedelta(rng.integers(0, 90, n_rows), unit="days"),
+            "day_report": rng.integers(32, 127, n_rows),
+            "reporting_delay_rki": rng.integers(0, 30, n_rows),
+            "imputation": rng.choice(["original", "imputation_01"], n_rows),
+            "age": rng.integers(0, 100, n_rows),
+        }
+    )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "delay.parquet")
+        write_delay_store(delay_test, path)
+        subset = read_delay_store(
+            path,
+            columns=["date_onset", "imputation"],
+            imputations=["original"],
+            onset_range=("2020-03-01", None),
+        )
+        expected = delay_test.query("imputation=='original' & date_onset>='2020-03-01'")
+        print(subset.shape == (expected.shape[0], 2))
@@ -7,17 +7,310 @@
 
 import numpy as np
 
+import copy
 
-from sklearn.base import BaseEstimator, RegressorMixin
+from scipy.special import expit
+
+from sklearn.base import BaseEstimator, RegressorMixin, clone
+from joblib import Parallel, delayed, effective_n_jobs, cpu_count, parallel_backend
 
 
 from sklearn.ensemble import GradientBoostingRegressor
 
 
+import lightgbm as lgb
 from lightgbm import LGBMRegressor
 
 
-from catboost import CatBoostRegressor
+from catboost import CatBoostRegressor, MultiTargetCustomObjective
+
+
+from monotone import rearrange
+
+
+# ## Joint Training
+# With joint=True, the binned training data is shared by the models of all quantiles (LightGBM) or a single model with a multi-quantile loss is fitted (CatBoost). Scikit-learn gradient boosting has no binning that could be shared, so its wrapper has no joint training.
+
+
+def _lightgbm_train_params(model):
+    """Convert the parameters of an LGBMRegressor to parameters and boosting rounds of lightgbm.train."""
+    params = {k: v for k, v in model.get_params().items() if v is not None}
+    n_estimators = params.pop("n_estimators")
+    for key in ["importance_type", "class_weight", "silent"]:
+        params.pop(key, None)
+    if "random_state" in params:
+        params["seed"] = params.pop("random_state")
+    params.setdefault("verbose", -1)
+    return params, n_estimators
+
+
+# Parameters of the binned LightGBM Dataset (incl. aliases), which cannot vary by quantile in joint training
+LIGHTGBM_DATASET_PARAMS = [
+    "max_bin",
+    "max_bins",
+    "max_bin_by_feature",
+    "min_data_in_bin",
+    "subsample_for_bin",
+    "bin_construct_sample_cnt",
+    "data_random_seed",
+    "feature_pre_filter",
+    "linear_tree",
+    "use_missing",
+    "zero_as_missing",
+    "categorical_feature",
+    "cat_feature",
+    "categorical_column",
+    "cat_column",
+    "categorical_features",
+]
+
+
+def _check_dataset_params(quantile_params):
+    for q, params in quantile_params.items():
+        dataset_params = sorted(set(params) & set(LIGHTGBM_DATASET_PARAMS))
+        if dataset_params:
+            raise ValueError(
+                f"Joint training shares the Dataset of all quantiles, Dataset parameters "
+                f"{dataset_params} cannot be set for quantile {q}."
+            )
+
+
+def _lightgbm_dataset(X, y, params):
+    return lgb.Dataset(
+        np.array(X),
+        np.array(y),
+        params={**params, "feature_pre_filter": False},
+        free_raw_data=False,
+    ).construct()
+
+
+def _check_joint(joint, cascade):
+    if joint and cascade:
+        raise ValueError("Joint training cannot be combined with cascade.")
+
+
+# ## Incremental Updates
+# Fitted models can be updated on new training data (e.g. the next window of walk-forward validation) by continuing boosting from the current ensemble instead of refitting from scratch: scikit-learn with warm_start, LightGBM and CatBoost with init_model. Updates replace the fitted models instead of modifying them, so that copies of a regressor (e.g. the retained models of the previous windows) keep their state.
+
+
+def _check_update(cascade, non_crossing=False):
+    if cascade:
+        raise ValueError("Incremental updates are not supported with cascade.")
+    if non_crossing:
+        raise ValueError("Incremental updates are not supported with non_crossing.")
+
+
+def _sklearn_update(model, X, y, n_estimators):
+    """Return a copy of a fitted GradientBoostingRegressor with n_estimators stages trained on X and y added."""
+    updated = copy.deepcopy(model)
+    updated.set_params(warm_start=True, n_estimators=model.n_estimators + n_estimators)
+    return updated.fit(X, y)
+
+
+def _lightgbm_update(model, X, y, n_estimators):
+    """Return an LGBMRegressor with n_estimators trees trained on X and y added to a fitted model."""
+    updated = clone(model).set_params(n_estimators=n_estimators)
+    updated.fit(X, y, init_model=model.booster_)
+    return updated.set_params(n_estimators=model.n_estimators)
+
+
+# Defaults of all CatBoost models, which can be overridden in base_params (no training logs in catboost_info/)
+CATBOOST_DEFAULTS = dict(allow_writing_files=False)
+
+
+def _catboost_update(model, X, y, n_estimators):
+    """Return a CatBoost model with n_estimators trees trained on X and y added to a fitted model."""
+    params = model.get_params()
+    key = "iterations" if "iterations" in params else "n_estimators"
+    updated = CatBoostRegressor(**{**params, key: n_estimators})
+    return updated.fit(X, y, init_model=model)
+
+
+# ## Cascade and Monotone Quantiles
+# With cascade=True, the prediction of each quantile model is an additional feature of the models of the higher quantiles. The features are kept in a preallocated (column-major) buffer with one column per model, so that the features of each model are a view of the buffer instead of a new array per quantile. Cascading only encourages monotone quantiles; with monotone=True, the predicted quantiles of each instance are sorted (monotone rearrangement), which never increases the quantile loss.
+
+
+def _cascade_buffer(X, n_models):
+    X = np.asarray(X, dtype=np.float64)
+    X_ = np.empty((X.shape[0], X.shape[1] + n_models), order="F")
+    X_[:, : X.shape[1]] = X
+    return X_, X.shape[1]
+
+
+def _cascade_fit(models, X, y):
+    """Fit models in order, each with the predictions of the previous models as additional features."""
+    X_, n_features = _cascade_buffer(X, len(models))
+    for j, m in enumerate(models.values()):
+        m.fit(X_[:, : n_features + j], y)
+        X_[:, n_features + j] = m.predict(X_[:, : n_features + j])
+    return models
+
+
+def _cascade_predict(models, X):
+    """Predict with cascaded models, one column per model."""
+    X_, n_features = _cascade_buffer(X, len(models))
+    for j, m in enumerate(models.values()):
+        X_[:, n_features + j] = m.predict(X_[:, : n_features + j])
+    return np.ascontiguousarray(X_[:, n_features:])
+
+
+# ## Non-Crossing Joint Fit
+# With non_crossing=True, a single model with one output per quantile is fitted to the sum of the quantile losses of all quantiles. The outputs are the lowest quantile and the increments to the next higher quantiles, which pass through a softplus, so that the predicted quantiles cannot cross. The target is standardized and the outputs start from its unconditional quantiles. As for the quantile objective of the libraries, the steps follow the gradients of the quantile losses: the hessian of each output is the number of quantiles it shifts (times the slope of the softplus), so that the steps of all outputs are comparable.
+
+
+def _check_non_crossing(non_crossing, joint, cascade):
+    if non_crossing and (joint or cascade):
+        raise ValueError(
+            "Non-crossing quantiles cannot be combined with joint or cascade."
+        )
+
+
+def _non_crossing_quantiles(raw):
+    """Transform raw outputs with shape (n, n_quantiles) into quantiles which are non-decreasing in each row."""
+    return np.cumsum(np.column_stack([raw[:, 0], np.logaddexp(0, raw[:, 1:])]), axis=1)
+
+
+def _non_crossing_target(y, quantiles):
+    """Standardize the target and compute the raw outputs of its unconditional quantiles."""
+    y = np.asarray(y, dtype=np.float64)
+    center, scale = np.median(y), np.std(y)
+    if scale == 0:
+        scale = 1.0
+    y = (y - center) / scale
+    levels = np.quantile(y, quantiles)
+    increments = np.maximum(np.diff(levels), 1e-3)
+    init = np.concatenate([levels[:1], np.log(np.expm1(increments))])
+    return y, (center, scale, init)
+
+
+def _non_crossing_derivatives(raw, y, quantiles):
+    """Gradients and hessians of the summed quantile losses with respect to the raw outputs."""
+    n_quantiles = raw.shape[1]
+    slopes = expit(raw[:, 1:])
+    below = y[:, None] < _non_crossing_quantiles(raw)
+    # Each output shifts its own and all higher quantiles
+    grad = np.cumsum((below - quantiles)[:, ::-1], axis=1)[:, ::-1]
+    hess = np.tile(np.arange(n_quantiles, 0, -1, dtype=np.float64), (len(y), 1))
+    grad[:, 1:] *= slopes
+    hess[:, 1:] *= slopes
+    return grad, hess
+
+
+def _non_crossing_predict(raw, target):
+    """Predict the quantiles of the target from the raw outputs (without their start values)."""
+    center, scale, init = target
+    return center + scale * _non_crossing_quantiles(raw + init)
+
+
+def _lightgbm_non_crossing_fit(model, X, y, quantiles):
+    """Fit a LightGBM booster with one output per quantile to non-crossing quantiles."""
+    quantiles = np.asarray(quantiles, dtype=np.float64)
+    y, target = _non_crossing_target(y, quantiles)
+    init = target[2]
+
+    def objective(preds, dataset):
+        return _non_crossing_derivatives(preds + init, y, quantiles)
+
+    params, n_estimators = _lightgbm_train_params(model)
+    params.pop("alpha", None)
+    params.update(objective=objective, num_class=len(quantiles))
+    booster = lgb.train(
+        params, lgb.Dataset(np.array(X), y), num_boost_round=n_estimators
+    )
+    return booster, target
+
+
+class _CatBoostNonCrossingObjective(MultiTargetCustomObjective):
+    """Non-crossing quantile objective for CatBoost, which maximizes the negative loss."""
+
+    def __init__(self, quantiles, init):
+        self.quantiles = quantiles
+        self.init = init
+
+    def calc_ders_multi(self, approxes, target, weight):
+        grad, hess = _non_crossing_derivatives(
+            np.asarray(approxes)[None] + self.init,
+            np.asarray(target[:1]),
+            self.quantiles,
+        )
+        weight = 1.0 if weight is None else weight
+        return list(-weight * grad[0]), list(np.diag(-weight * hess[0]))
+
+
+def _catboost_non_crossing_fit(params, X, y, quantiles):
+    """Fit a CatBoost model with one output per quantile to non-crossing quantiles."""
+    quantiles = np.asarray(quantiles, dtype=np.float64)
+    y, target = _non_crossing_target(y, quantiles)
+    model = CatBoostRegressor(
+        **params,
+        loss_function=_CatBoostNonCrossingObjective(quantiles, target[2]),
+        eval_metric="MultiRMSE",
+        boost_from_average=False,
+    )
+    model.fit(np.array(X), np.tile(y[:, None], (1, len(quantiles))))
+    return model, target
+
+
+# ## Parallel Fitting
+# With n_jobs, the independent models of the quantiles are fitted concurrently: in threads for LightGBM and CatBoost, which release the GIL, and in processes for scikit-learn. The threads of the libraries (OpenMP, BLAS) are divided among the concurrent fits to avoid oversubscription. The number of library threads is set on copies of the models, so that the parameters configured by the user are not changed.
+
+
+def _fit_model(model, X, y):
+    return model.fit(X, y)
+
+
+def _explicit_params(param, quantiles, base_params, quantile_params):
+    """Quantiles whose models have a parameter set explicitly in base_params or quantile_params."""
+    return [
+        q for q in quantiles if param in {**base_params, **quantile_params.get(q, {})}
+    ]
+
+
+def _fit_models(
+    models, X, y, n_jobs=None, prefer="processes", thread_param=None, explicit=()
+):
+    """
+    Fit models concurrently.
+
+    Parameters
+    ----------
+    models : dict
+        Models to fit on the same data.
+    n_jobs : int, optional
+        Number of concurrent fits.
+    prefer : {"processes", "threads"}
+        Whether models are fitted in worker processes or in threads.
+    thread_param : str, optional
+        Parameter of the models for the number of library threads. It is set to the
+        number of CPUs per concurrent fit on copies of the models.
+    explicit : collection
+        Keys of the models whose thread parameter has been set explicitly and is kept.
+
+    Returns
+    -------
+    out : dict
+        Fitted models.
+    """
+    n_workers = min(effective_n_jobs(n_jobs), len(models))
+    threads = max(1, cpu_count() // n_workers)
+
+    if prefer == "threads":
+        if n_workers > 1 and thread_param is not None:
+            models = {
+                k: m
+                if k in explicit
+                else clone(m).set_params(**{thread_param: threads})
+                for k, m in models.items()
+            }
+        fitted = Parallel(n_jobs=n_workers, backend="threading")(
+            delayed(_fit_model)(m, X, y) for m in models.values()
+        )
+    else:
+        with parallel_backend("loky", inner_max_num_threads=threads):
+            fitted = Parallel(n_jobs=n_workers)(
+                delayed(_fit_model)(m, X, y) for m in models.values()
+            )
+    return dict(zip(models, fitted))
 
 
 # ## Scikit-Learn Gradient Boosting Regressor
@@ -42,10 +335,20 @@ class GradientBoostingQuantileRegressor(BaseEstimator, RegressorMixin):
         for corresponding specific models as values.
     cascade: bool, optional
         If True, the predicted lower quantile is used by the model for next higher quantile as well. Default is False.
+    n_jobs: int, optional
+        Number of quantile models to fit concurrently in processes (without cascade). Default is None.
+    monotone: bool, optional
+        If True, the predicted quantiles of each instance are sorted, so that they do not cross. Default is False.
     """
 
     def __init__(
-        self, quantiles, base_params=None, quantile_params=None, cascade=False
+        self,
+        quantiles,
+        base_params=None,
+        quantile_params=None,
+        cascade=False,
+        n_jobs=None,
+        monotone=False,
     ):
         if base_params is None:
             base_params = dict()
@@ -67,21 +370,39 @@ class GradientBoostingQuantileRegressor(BaseEstimator, RegressorMixin):
         self.base_params = base_params
         self.quantile_params = quantile_params
         self.cascade = cascade
+        self.n_jobs = n_jobs
+        self.monotone = monotone
 
     def fit(self, X, y):
         if not self.cascade:
             X = np.array(X)
-            for q, m in self.models_.items():
-                m.fit(X, y)
+            self.models_ = _fit_models(self.models_, X, y, self.n_jobs)
         else:
-            X_ = np.array(X)
-            for q, m in self.models_.items():
-                m.fit(X_, y)
-                y_ = m.predict(X_)
-                X_ = np.hstack((X_, y_.reshape(-1, 1)))
+            self.models_ = _cascade_fit(self.models_, X, y)
 
         return self
 
+    def update(self, X, y, n_estimators=10):
+        """
+        Continue boosting the fitted models on new training data, e.g. the next window of
+        walk-forward validation, instead of refitting them from scratch.
+
+        Parameters
+        ----------
+        X : array_like
+            Training data.
+        y : array_like
+            Target values.
+        n_estimators : int
+            Number of boosting stages to add to each model.
+        """
+        _check_update(self.cascade)
+        X = np.array(X)
+        self.models_ = {
+            q: _sklearn_update(m, X, y, n_estimators) for q, m in self.models_.items()
+        }
+        return self
+
     def predict(self, X):
         if not self.cascade:
             X = np.array(X)
@@ -89,13 +410,9 @@ class GradientBoostingQuantileRegressor(BaseEstimator, RegressorMixin):
                 [m.predict(X) for m in self.models_.values()]
             ).transpose()
         else:
-            predictions = list()
-            X_ = np.array(X)
-            for m in self.models_.values():
-                y_ = m.predict(X_)
-                predictions.append(y_)
-                X_ = np.hstack((X_, y_.reshape(-1, 1)))
-            predictions = np.array(predictions).transpose()
+            predictions = _cascade_predict(self.models_, X)
+        if self.monotone:
+            predictions = rearrange(predictions)
         return predictions
 
     def get_params(self, deep=True):
@@ -104,6 +421,8 @@ class GradientBoostingQuantileRegressor(BaseEstimator, RegressorMixin):
             base_params=self.base_params,
             quantile_params=self.quantile_params,
             cascade=self.cascade,
+            n_jobs=self.n_jobs,
+            monotone=self.monotone,
         )
 
 
@@ -129,10 +448,31 @@ class LightGBMQuantileRegressor(BaseEstimator, RegressorMixin):
         for corresponding specific models as values.
     cascade: bool, optional
         If True, the predicted lower quantile is used by the model for next higher quantile as well. Default is False.
+    joint: bool, optional
+        If True, the binned LightGBM Dataset is constructed once and shared by the boosters of all quantiles.
+        Only booster parameters may then vary by quantile, Dataset parameters (e.g. max_bin) in quantile_params
+        raise a ValueError. Cannot be combined with cascade. Default is False.
+    n_jobs: int, optional
+        Number of quantile models to fit concurrently in threads (without cascade). The LightGBM threads
+        are divided among the models, unless n_jobs is set in base_params or quantile_params. Default is None.
+    monotone: bool, optional
+        If True, the predicted quantiles of each instance are sorted, so that they do not cross. Default is False.
+    non_crossing: bool, optional
+        If True, a single booster with one output per quantile is fitted jointly to all quantiles, such that the
+        predicted quantiles cannot cross (base_params apply, quantile_params are not supported). Cannot be combined
+        with cascade or joint. Default is False.
     """
 
     def __init__(
-        self, quantiles, base_params=dict(), quantile_params=dict(), cascade=False
+        self,
+        quantiles,
+        base_params=dict(),
+        quantile_params=dict(),
+        cascade=False,
+        joint=False,
+        n_jobs=None,
+        monotone=False,
+        non_crossing=False,
     ):
         if base_params is None:
             base_params = dict()
@@ -154,43 +494,150 @@ class LightGBMQuantileRegressor(BaseEstimator, RegressorMixin):
         self.base_params = base_params
         self.quantile_params = quantile_params
         self.cascade = cascade
+        self.joint = joint
+        self.n_jobs = n_jobs
+        self.monotone = monotone
+        self.non_crossing = non_crossing
 
     def fit(self, X, y):
-        if not self.cascade:
+        _check_joint(self.joint, self.cascade)
+        _check_non_crossing(self.non_crossing, self.joint, self.cascade)
+        if self.non_crossing:
+            if self.quantile_params:
+                raise ValueError(
+                    "Non-crossing quantiles do not support quantile_params."
+                )
+            self.booster_, self.target_ = _lightgbm_non_crossing_fit(
+                next(iter(self.models_.values())), X, y, self.quantiles
+            )
+        elif self.joint:
+            # Binning is done once, all boosters are trained on the same Dataset
+            _check_dataset_params(self.quantile_params)
+            train_params = [_lightgbm_train_params(m) for m in self.models_.values()]
+            dataset = _lightgbm_dataset(X, y, train_params[0][0])
+            self.boosters_ = {
+                q: lgb.train(params, dataset, num_boost_round=n_estimators)
+                for q, (params, n_estimators) in zip(self.models_, train_params)
+            }
+        elif not self.cascade:
             X = np.array(X)
-            for q, m in self.models_.items():
-                m.fit(X, y)
+            self.models_ = _fit_models(
+                self.models_,
+                X,
+                y,
+                self.n_jobs,
+                prefer="threads",
+                thread_param="n_jobs",
+                explicit=_explicit_params(
+                    "n_jobs", self.quantiles, self.base_params, self.quantile_params
+                ),
+            )
         else:
-            X_ = np.array(X)
-            for q, m in self.models_.items():
-                m.fit(X_, y)
-                y_ = m.predict(X_)
-                X_ = np.hstack((X_, y_.reshape(-1, 1)))
+            self.models_ = _cascade_fit(self.models_, X, y)
 
         return self
 
+    def update(self, X, y, n_estimators=10):
+        """
+        Continue boosting the fitted models on new training data, e.g. the next window of
+        walk-forward validation, instead of refitting them from scratch.
+
+        Parameters
+        ----------
+        X : array_like
+            Training data.
+        y : array_like
+            Target values.
+        n_estimators : int
+            Number of boosting stages to add to each model.
+        """
+        _check_update(self.cascade, self.non_crossing)
+        if self.joint:
+            train_params = [_lightgbm_train_params(m) for m in self.models_.values()]
+            dataset = _lightgbm_dataset(X, y, train_params[0][0])
+            self.boosters_ = {
+                q: lgb.train(
+                    params,
+                    dataset,
+                    num_boost_round=n_estimators,
+                    init_model=self.boosters_[q],
+                )
+                for q, (params, _) in zip(self.models_, train_params)
+            }
+        else:
+            X = np.array(X)
+            self.models_ = {
+                q: _lightgbm_update(m, X, y, n_estimators)
+                for q, m in self.models_.items()
+            }
+        return self
+
     def predict(self, X):
-        if not self.cascade:
+        if self.non_crossing:
+            predictions = _non_crossing_predict(
+                self.booster_.predict(np.array(X), raw_score=True), self.target_
+            )
+        elif self.joint:
+            X = np.array(X)
+            predictions = np.array(
+                [b.predict(X) for b in self.boosters_.values()]
+            ).transpose()
+        elif not self.cascade:
             X = np.array(X)
             predictions = np.array(
                 [m.predict(X) for m in self.models_.values()]
             ).transpose()
         else:
-            predictions = list()
-            X_ = np.array(X)
-            for m in self.models_.values():
-                y_ = m.predict(X_)
-                predictions.append(y_)
-                X_ = np.hstack((X_, y_.reshape(-1, 1)))
-            predictions = np.array(predictions).transpose()
+            predictions = _cascade_predict(self.models_, X)
+        if self.monotone:
+            predictions = rearrange(predictions)
         return predictions
 
+    @classmethod
+    def predict_many(cls, regressors, X):
+        """
+        Predict with several fitted regressors, each on its own instances, e.g. the windows of
+        walk-forward validation with the model of each window.
+
+        The boosters predict without the input validation of the scikit-learn interface,
+        which dominates the prediction time of few instances.
+
+        Parameters
+        ----------
+        regressors : list of LightGBMQuantileRegressor
+            Fitted regressors with the same quantiles.
+        X : list of array_like
+            Instances to predict with each regressor.
+
+        Returns
+        -------
+        out : ndarray
+            Predicted quantiles of the instances of all regressors in order.
+        """
+        predictions = []
+        for r, X_r in zip(regressors, X):
+            if r.cascade or r.non_crossing:
+                predictions.append(r.predict(X_r))
+                continue
+            boosters = (
+                r.boosters_.values()
+                if r.joint
+                else [m.booster_ for m in r.models_.values()]
+            )
+            p = np.column_stack([b.predict(X_r) for b in boosters])
+            predictions.append(rearrange(p) if r.monotone else p)
+        return np.vstack(predictions)
+
     def get_params(self, deep=True):
         return dict(
             quantiles=self.quantiles,
             base_params=self.base_params,
             quantile_params=self.quantile_params,
             cascade=self.cascade,
+            joint=self.joint,
+            n_jobs=self.n_jobs,
+            monotone=self.monotone,
+            non_crossing=self.non_crossing,
         )
 
 
@@ -216,10 +663,32 @@ class CatBoostQuantileRegressor(BaseEstimator, RegressorMixin):
         for corresponding specific models as values.
     cascade: bool, optional
         If True, the predicted lower quantile is used by the model for next higher quantile as well. Default is False.
+    joint: bool, optional
+        If True, a single model with a MultiQuantile loss predicts all quantiles (base_params apply,
+        quantile_params are not supported). Cannot be combined with cascade. Default is False.
+    n_jobs: int, optional
+        Number of quantile models to fit concurrently in threads (without cascade or joint training). The
+        CatBoost threads are divided among the models, unless thread_count is set in base_params or quantile_params.
+        Default is None.
+    monotone: bool, optional
+        If True, the predicted quantiles of each instance are sorted, so that they do not cross. Default is False.
+    non_crossing: bool, optional
+        If True, a single model with one output per quantile is fitted jointly to all quantiles, such that the
+        predicted quantiles cannot cross (base_params apply, quantile_params are not supported). The objective is
+        evaluated per instance in Python, which is slow for large training sets. Cannot be combined with cascade
+        or joint. Default is False.
     """
 
     def __init__(
-        self, quantiles, base_params=dict(), quantile_params=dict(), cascade=False
+        self,
+        quantiles,
+        base_params=dict(),
+        quantile_params=dict(),
+        cascade=False,
+        joint=False,
+        n_jobs=None,
+        monotone=False,
+        non_crossing=False,
     ):
         if base_params is None:
             base_params = dict()
@@ -230,7 +699,8 @@ class CatBoostQuantileRegressor(BaseEstimator, RegressorMixin):
                 quantiles,
                 [
                     CatBoostRegressor(
-                        **base_params, loss_function=f"Quantile:alpha={q}"
+                        **{**CATBOOST_DEFAULTS, **base_params},
+                        loss_function=f"Quantile:alpha={q}",
                     )
                     for q in quantiles
                 ],
@@ -243,35 +713,96 @@ class CatBoostQuantileRegressor(BaseEstimator, RegressorMixin):
         self.base_params = base_params
         self.quantile_params = quantile_params
         self.cascade = cascade
+        self.joint = joint
+        self.n_jobs = n_jobs
+        self.monotone = monotone
+        self.non_crossing = non_crossing
 
     def fit(self, X, y):
-        if not self.cascade:
+        _check_joint(self.joint, self.cascade)
+        _check_non_crossing(self.non_crossing, self.joint, self.cascade)
+        if self.non_crossing:
+            if self.quantile_params:
+                raise ValueError(
+                    "Non-crossing quantiles do not support quantile_params."
+                )
+            self.model_, self.target_ = _catboost_non_crossing_fit(
+                {**CATBOOST_DEFAULTS, **self.base_params}, X, y, self.quantiles
+            )
+        elif self.joint:
+            if self.quantile_params:
+                raise ValueError("Joint training does not support quantile_params.")
+            alphas = ",".join(str(q) for q in self.quantiles)
+            self.model_ = CatBoostRegressor(
+                **{**CATBOOST_DEFAULTS, **self.base_params},
+                loss_function=f"MultiQuantile:alpha={alphas}",
+            )
+            self.model_.fit(np.array(X), y)
+        elif not self.cascade:
             X = np.array(X)
-            for q, m in self.models_.items():
-                m.fit(X, y)
+            self.models_ = _fit_models(
+                self.models_,
+                X,
+                y,
+                self.n_jobs,
+                prefer="threads",
+                thread_param="thread_count",
+                explicit=_explicit_params(
+                    "thread_count",
+                    self.quantiles,
+                    self.base_params,
+                    self.quantile_params,
+                ),
+            )
         else:
-            X_ = np.array(X)
-            for q, m in self.models_.items():
-                m.fit(X_, y)
-                y_ = m.predict(X_)
-                X_ = np.hstack((X_, y_.reshape(-1, 1)))
+            self.models_ = _cascade_fit(self.models_, X, y)
+
+        return self
 
+    def update(self, X, y, n_estimators=10):
+        """
+        Continue boosting the fitted models on new training data, e.g. the next window of
+        walk-forward validation, instead of refitting them from scratch.
+
+        Parameters
+        ----------
+        X : array_like
+            Training data.
+        y : array_like
+            Target values.
+        n_estimators : int
+            Number of boosting stages to add to each model.
+        """
+        _check_update(self.cascade, self.non_crossing)
+        X = np.array(X)
+        if self.joint:
+            self.model_ = _catboost_update(self.model_, X, y, n_estimators)
+        else:
+            self.models_ = {
+                q: _catboost_update(m, X, y, n_estimators)
+                for q, m in self.models_.items()
+            }
         return self
 
     def predict(self, X):
-        if not self.cascade:
+        if self.non_crossing:
+            predictions = _non_crossing_predict(
+                self.model_.predict(np.array(X), prediction_type="RawFormulaVal"),
+                self.target_,
+            )
+        elif self.joint:
+            predictions = self.model_.predict(np.array(X)).reshape(
+                len(X), len(self.quantiles)
+            )
+        elif not self.cascade:
             X = np.array(X)
             predictions = np.array(
                 [m.predict(X) for m in self.models_.values()]
             ).transpose()
         else:
-            predictions = list()
-            X_ = np.array(X)
-            for m in self.models_.values():
-                y_ = m.predict(X_)
-                predictions.append(y_)
-                X_ = np.hstack((X_, y_.reshape(-1, 1)))
-            predictions = np.array(predictions).transpose()
+            predictions = _cascade_predict(self.models_, X)
+        if self.monotone:
+            predictions = rearrange(predictions)
         return predictions
 
     def get_params(self, deep=True):
@@ -280,6 +811,10 @@ class CatBoostQuantileRegressor(BaseEstimator, RegressorMixin):
             base_params=self.base_params,
             quantile_params=self.quantile_params,
             cascade=self.cascade,
+            joint=self.joint,
+            n_jobs=self.n_jobs,
+            monotone=self.monotone,
+            non_crossing=self.non_crossing,
         )
 
 
@@ -401,3 +936,132 @@ if __name__ == "__main__":
     y_hat = cbqr_casc.predict(X)
     # Compute in-sample MAE for median
     print(np.mean(np.abs(y_hat[:, 1] - y)))
+
+
+# ### Joint Training
+
+if __name__ == "__main__":
+    import time
+
+    X_joint = np.random.normal(size=(20000, 10))
+    y_joint = X_joint[:, 0] + np.random.standard_t(3, size=20000)
+    for name, regressor in {
+        "lightgbm": lambda qs, joint: LightGBMQuantileRegressor(
+            quantiles=qs, base_params=dict(n_estimators=100), joint=joint
+        ),
+        "catboost": lambda qs, joint: CatBoostQuantileRegressor(
+            quantiles=qs, base_params=dict(n_estimators=100, silent=True), joint=joint
+        ),
+    }.items():
+        for joint in [False, True]:
+            times = dict()
+            for n_quantiles in [3, 23]:
+                qs = list(np.linspace(0.05, 0.95, n_quantiles).round(3))
+                start = time.perf_counter()
+                regressor(qs, joint).fit(X_joint, y_joint)
+                times[n_quantiles] = time.perf_counter() - start
+            print(name, "joint" if joint else "independent", times)
+
+    # Joint and independent LightGBM boosters are identical
+    qs = [0.05, 0.5, 0.95]
+    print(
+        np.allclose(
+            LightGBMQuantileRegressor(qs, dict(n_estimators=50), joint=True)
+            .fit(X_joint, y_joint)
+            .predict(X_joint),
+            LightGBMQuantileRegressor(qs, dict(n_estimators=50, verbose=-1))
+            .fit(X_joint, y_joint)
+            .predict(X_joint),
+        )
+    )
+
+
+# ### Parallel Fitting
+
+if __name__ == "__main__":
+    qs = list(np.linspace(0.05, 0.95, 23).round(3))
+    for name, regressor in {
+        "sklearn": lambda n_jobs: GradientBoostingQuantileRegressor(
+            quantiles=qs,
+            base_params=dict(n_estimators=20, random_state=0),
+            n_jobs=n_jobs,
+        ),
+        "lightgbm": lambda n_jobs: LightGBMQuantileRegressor(
+            quantiles=qs, base_params=dict(n_estimators=100), n_jobs=n_jobs
+        ),
+    }.items():
+        predictions = dict()
+        for n_jobs in [None, -1]:
+            start = time.perf_counter()
+            predictions[n_jobs] = (
+                regressor(n_jobs).fit(X_joint, y_joint).predict(X_joint)
+            )
+            print(name, n_jobs, time.perf_counter() - start)
+        # Concurrent fits yield the same models
+        print(np.allclose(predictions[None], predictions[-1]))
+
+
+# ### Monotone Quantiles
+
+if __name__ == "__main__":
+    qs = list(np.linspace(0.05, 0.95, 23).round(3))
+    for monotone in [False, True]:
+        lgbmqr = LightGBMQuantileRegressor(
+            quantiles=qs,
+            base_params=dict(n_estimators=100, verbose=-1),
+            cascade=True,
+            monotone=monotone,
+        )
+        y_hat = lgbmqr.fit(X_joint[:15000], y_joint[:15000]).predict(X_joint[15000:])
+        residuals = y_joint[15000:].reshape(-1, 1) - y_hat
+        print(
+            "crossings",
+            (np.diff(y_hat, axis=1) < 0).sum(),
+            "quantile loss",
+            np.maximum(np.array(qs) * residuals, (np.array(qs) - 1) * residuals).mean(),
+        )
+
+
+# ### Non-Crossing Joint Fit
+
+if __name__ == "__main__":
+    qs = list(np.linspace(0.05, 0.95, 9).round(3))
+    for name, regressor, n_rows in [
+        (
+            "lightgbm",
+            lambda non_crossing: LightGBMQuantileRegressor(
+                quantiles=qs,
+                base_params=dict(n_estimators=100, verbose=-1),
+                non_crossing=non_crossing,
+            ),
+            15000,
+        ),
+        (
+            "catboost",
+            lambda non_crossing: CatBoostQuantileRegressor(
+                quantiles=qs,
+                base_params=dict(n_estimators=100, silent=True),
+                non_crossing=non_crossing,
+            ),
+            1500,
+        ),
+    ]:
+        for non_crossing in [False, True]:
+            start = time.perf_counter()
+            y_hat = (
+                regressor(non_crossing)
+                .fit(X_joint[:n_rows], y_joint[:n_rows])
+                .predict(X_joint[15000:])
+            )
+            residuals = y_joint[15000:].reshape(-1, 1) - y_hat
+            print(
+                name,
+                "non-crossing" if non_crossing else "independent",
+                time.perf_counter() - start,
+                "crossings",
+                (np.diff(y_hat, axis=1) < 0).sum(),
+                "quantile loss",
+                np.maximum(
+                    np.array(qs) * residuals, (np.array(qs) - 1) * residuals
+                ).mean(),
+            )
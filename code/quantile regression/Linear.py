@@ -5,51 +5,196 @@
 
 import numpy as np
 
+import scipy.sparse as sp
+from scipy.optimize import linprog
+
 
 from sklearn.base import BaseEstimator, RegressorMixin
+from joblib import Parallel, delayed, effective_n_jobs, cpu_count, parallel_backend
 
 
 import statsmodels.formula.api as smf
 import statsmodels.api as sm
 
 
+from monotone import rearrange
+
+
+# ## Linear Program
+# Quantile regression is the linear program min sum_i q u_i + (1 - q) v_i subject to X beta + u - v = y and u, v >= 0. The programs of all quantiles are solved as one block-diagonal program with the HiGHS dual simplex solver. Without further constraints, the much smaller dual program max y'd subject to X'd = 0 and q - 1 <= d <= q is solved, whose constraint multipliers are the coefficients. Constraints which prevent the quantiles from crossing at the training instances are added to the primal program.
+
+
+def quantile_regression_lp(X, y, quantiles, non_crossing=False):
+    """
+    Fit linear quantile regressions for several quantiles by linear programming.
+
+    Parameters
+    ----------
+    X : ndarray
+        Design matrix (including the constant column).
+    y : ndarray
+        Target values.
+    quantiles : iterable
+        Quantiles to fit, in ascending order.
+    non_crossing : bool
+        If True, the fitted quantiles of each training instance are constrained to be
+        non-decreasing in the quantile level.
+
+    Returns
+    -------
+    out : ndarray
+        Coefficients with shape (len(quantiles), n_features).
+    """
+    n, p = X.shape
+    quantiles = np.asarray(quantiles, dtype=np.float64)
+    k = len(quantiles)
+    # Presolve does not pay off for these small, dense programs
+    options = dict(presolve=False)
+
+    if not non_crossing or k == 1:
+        result = linprog(
+            -np.tile(y, k),
+            A_eq=sp.block_diag([sp.csr_matrix(X.T)] * k, format="csr"),
+            b_eq=np.zeros(k * p),
+            bounds=np.column_stack(
+                [np.repeat(quantiles - 1, n), np.repeat(quantiles, n)]
+            ),
+            method="highs-ds",
+            options=options,
+        )
+        if not result.success:
+            raise ValueError(f"Quantile regression failed: {result.message}")
+        return -result.eqlin.marginals.reshape(k, p)
+
+    # Variables of each quantile: coefficients, positive and negative residuals
+    m = p + 2 * n
+    c = np.concatenate(
+        [
+            np.concatenate([np.zeros(p), np.full(n, q), np.full(n, 1 - q)])
+            for q in quantiles
+        ]
+    )
+    block = sp.hstack([sp.csr_matrix(X), sp.identity(n), -sp.identity(n)])
+    lower = np.tile(np.concatenate([np.full(p, -np.inf), np.zeros(2 * n)]), k)
+
+    # X beta_j - X beta_(j+1) <= 0 for consecutive quantiles j, j+1
+    differences = sp.diags([1.0, -1.0], [0, 1], shape=(k - 1, k))
+    A_ub = sp.kron(
+        differences, sp.hstack([sp.csr_matrix(X), sp.csr_matrix((n, 2 * n))])
+    ).tocsr()
+
+    result = linprog(
+        c,
+        A_ub=A_ub,
+        b_ub=np.zeros((k - 1) * n),
+        A_eq=sp.block_diag([block] * k, format="csr"),
+        b_eq=np.tile(y, k),
+        bounds=np.column_stack([lower, np.full(k * m, np.inf)]),
+        method="highs-ds",
+        options=options,
+    )
+    if not result.success:
+        raise ValueError(f"Quantile regression failed: {result.message}")
+    return result.x.reshape(k, m)[:, :p]
+
+
+# ## Regressor
+
+
+def _add_constant(X, n_columns=None):
+    """
+    Prepend a constant column to X, unless it already has one (see statsmodels add_constant).
+
+    If `n_columns` (the number of columns of the design matrix of the fitted models) is given,
+    the constant column is added if X has fewer columns, so that the design matrix of
+    instances to predict does not depend on whether their features happen to be constant.
+    """
+    X = np.array(X, dtype=np.float64)
+    if n_columns is None and X.shape[0] > 1:
+        return sm.add_constant(X)
+    if X.shape[1] == n_columns:
+        return X
+    return np.hstack((np.ones((X.shape[0], 1)), X))
+
+
 class LinearQuantileRegressor(BaseEstimator, RegressorMixin):
     """
     Wrapper for statsmodels Quantile Regression which provides functionality to jointly predict several quantiles.
     
-    An independent model is used for each quantile.
+    An independent model is used for each quantile, unless non-crossing quantiles are
+    enforced with the "highs" solver.
     
     Parameters
     ----------
     quantiles : iterable
         Quantiles to predict, should be in ascending order.
+    n_jobs : int, optional
+        Number of quantile models to fit concurrently in processes. The BLAS threads are
+        divided among the processes. Default is None.
+    solver : {"statsmodels", "highs"}, optional
+        Fit the models with statsmodels QuantReg (iteratively reweighted least squares) or
+        by solving the linear program of all quantiles at once with HiGHS. Both solvers
+        add a constant column, unless X already has one. Default is "statsmodels".
+    non_crossing : bool, optional
+        If True, all quantiles are fitted jointly under the constraint that they do not
+        cross at the training instances. Only supported by the "highs" solver. Default is
+        False.
+    monotone : bool, optional
+        If True, the predicted quantiles of each instance are sorted (rearranged), so that
+        they are non-decreasing in the quantile level. Default is False.
     """
 
-    def __init__(self, quantiles):
+    def __init__(
+        self,
+        quantiles,
+        n_jobs=None,
+        solver="statsmodels",
+        non_crossing=False,
+        monotone=False,
+    ):
         self.quantiles = quantiles
+        self.n_jobs = n_jobs
+        self.solver = solver
+        self.non_crossing = non_crossing
+        self.monotone = monotone
 
     def fit(self, X, y):
         y = np.array(y)
-        X = (
-            sm.add_constant(np.array(X))
-            if X.shape[0] > 1
-            else np.hstack((np.ones((1, 1)), X))
-        )
+        X = _add_constant(X)
+        self.n_columns_ = X.shape[1]
+        if self.solver == "highs":
+            self.coef_ = quantile_regression_lp(
+                X, y, self.quantiles, non_crossing=self.non_crossing
+            )
+            return self
+        elif self.solver != "statsmodels":
+            raise ValueError(f"Unknown solver: {self.solver}")
+        elif self.non_crossing:
+            raise ValueError("Non-crossing quantiles require the highs solver.")
+
         mdl = sm.regression.quantile_regression.QuantReg(y, X)
-        self.models_ = {q: mdl.fit(q) for q in self.quantiles}
+        n_workers = min(effective_n_jobs(self.n_jobs), len(self.quantiles))
+        with parallel_backend(
+            "loky", inner_max_num_threads=max(1, cpu_count() // n_workers)
+        ):
+            fitted = Parallel(n_jobs=n_workers)(
+                delayed(mdl.fit)(q) for q in self.quantiles
+            )
+        self.models_ = dict(zip(self.quantiles, fitted))
 
         return self
 
     def predict(self, X):
-        X = (
-            sm.add_constant(np.array(X))
-            if X.shape[0] > 1
-            else np.hstack((np.ones((1, 1)), X))
-        )
-        predictions = np.array(
-            [m.predict(X) for m in self.models_.values()]
-        ).transpose()
+        X = _add_constant(X, self.n_columns_)
+        if self.solver == "highs":
+            predictions = X @ self.coef_.T
+        else:
+            predictions = np.array(
+                [m.predict(X) for m in self.models_.values()]
+            ).transpose()
 
+        if self.monotone:
+            predictions = rearrange(predictions)
         return predictions
 
 
@@ -83,3 +228,37 @@ if __name__ == "__main__":
     y_hat = lqr.predict(X)
     # Compute in-sample MAE for median
     print(np.mean(np.abs(y_hat[:, 1] - y)))
+
+
+# ### Solvers
+
+if __name__ == "__main__":
+    import time
+
+    def pinball_loss(y_true, y_pred, quantiles):
+        residuals = np.asarray(y_true).reshape(-1, 1) - y_pred
+        return np.maximum(
+            np.asarray(quantiles) * residuals, (np.asarray(quantiles) - 1) * residuals
+        ).mean()
+
+    n_rows = 200
+    X_solver = np.random.normal(size=(n_rows, 5))
+    y_solver = X_solver @ np.arange(5) + np.random.standard_t(3, size=n_rows)
+    qs = list(np.linspace(0.05, 0.95, 23).round(3))
+    for solver, non_crossing in [
+        ("statsmodels", False),
+        ("highs", False),
+        ("highs", True),
+    ]:
+        lqr = LinearQuantileRegressor(qs, solver=solver, non_crossing=non_crossing)
+        start = time.perf_counter()
+        for _ in range(10):
+            lqr.fit(X_solver, y_solver)
+        y_hat = lqr.predict(X_solver)
+        print(
+            solver,
+            non_crossing,
+            (time.perf_counter() - start) / 10,
+            pinball_loss(y_solver, y_hat, qs),
+            (np.diff(y_hat, axis=1) < -1e-9).sum(),
+        )
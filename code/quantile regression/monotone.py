@@ -0,0 +1,29 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# # Monotone Quantiles
+# Predicted quantiles of separately fitted models may cross. Sorting the predicted quantiles of each instance (monotone rearrangement) makes them non-decreasing in the quantile level and never increases the quantile loss. Shared by the linear and the gradient boosting quantile regressors.
+
+# ## Imports
+
+import numpy as np
+
+
+# ## Rearrangement
+
+
+def rearrange(predictions):
+    """Sort the predicted quantiles of each instance (one row per instance)."""
+    return np.sort(predictions, axis=1)
+
+
+# ## Tests
+
+if __name__ == "__main__":
+    predictions = np.random.normal(size=(1000, 23))
+    rearranged = rearrange(predictions)
+    # Quantiles of each instance are non-decreasing and the same values as predicted
+    assert (np.diff(rearranged, axis=1) >= 0).all()
+    assert np.array_equal(np.sort(predictions, axis=1), np.sort(rearranged, axis=1))
+    # Rows without crossings are unchanged
+    assert np.array_equal(rearrange(rearranged), rearranged)